@@ -12,11 +12,14 @@
 """
 import os
 import sys
+import time
 import multiprocessing
 import traceback
 from pathlib import Path
 from datetime import datetime
 
+_startup_time = time.perf_counter()
+
 # --- 极速日志记录逻辑 ---
 def log_debug(msg):
     try:
@@ -32,23 +35,49 @@ log_debug(f"程序启动 (main.py) - 参数: {sys.argv}")
 src_dir = Path(__file__).parent
 sys.path.insert(0, str(src_dir))
 
+from src.config_loader import Config
 from src.state_machine import GameAutomation
+from src.async_automation import AsyncGameAutomation
+from src.pipeline import PipelinedGameAutomation
 from src.gui import GameAssistantGUI
 
+_imports_done = time.perf_counter()
+
 
 def main():
     """主函数"""
     # 切换工作目录到程序所在目录
     os.chdir(src_dir)
     
-    # 创建自动化实例
-    automation = GameAutomation(
+    # 创建自动化实例（按配置选择同步/异步/流水线主循环）
+    config = Config("config")
+    if config.async_loop:
+        automation_class = AsyncGameAutomation
+    elif config.pipeline_loop:
+        automation_class = PipelinedGameAutomation
+    else:
+        automation_class = GameAutomation
+    automation_started = time.perf_counter()
+    automation = automation_class(
         config_dir="config",
-        templates_dir="templates"
+        templates_dir="templates",
+        config=config
     )
+    automation_done = time.perf_counter()
     
     # 创建并运行GUI
     gui = GameAssistantGUI(automation)
+    gui_done = time.perf_counter()
+    
+    # 启动耗时分解（识别器在后台加载时单独输出其耗时）
+    timing = (
+        f"启动耗时 {(gui_done - _startup_time) * 1000:.0f} ms: 导入 {(_imports_done - _startup_time) * 1000:.0f} ms, "
+        f"创建控制器 {(automation_done - automation_started) * 1000:.0f} ms, "
+        f"创建界面 {(gui_done - automation_done) * 1000:.0f} ms"
+    )
+    log_debug(timing)
+    automation.log(timing)
+    
     gui.run()
 
 
@@ -0,0 +1,135 @@
+"""
+异步ADB控制模块
+基于 asyncio.create_subprocess_exec，截图不阻塞事件循环，
+截图等待可以被取消（取消时结束对应的 adb 子进程）
+"""
+import asyncio
+import time
+from typing import Optional, Tuple
+
+from .adb_controller import ADBController, CREATE_NO_WINDOW
+from .frame import Frame
+
+# --- 极速日志记录逻辑 ---
+def log_debug(msg):
+    try:
+        import os
+        from datetime import datetime
+        with open("error.log", "a", encoding="utf-8") as f:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{timestamp}] [PID:{os.getpid()}] [ADB-Async] {msg}\n")
+    except:
+        pass
+
+
+class AsyncADBController(ADBController):
+    """
+    异步ADB控制器
+
+    在 ADBController 的基础上增加异步截图等 *_async 协程方法。
+    点击不提供协程版本：所有点击都要经过输入仲裁线程去重、限速，
+    处理逻辑在线程池中执行，通过仲裁调用同步方法。
+    """
+
+    async def _communicate(self, cmd: list, timeout: float) -> Tuple[int, bytes, bytes]:
+        """
+        执行命令并读取全部输出
+
+        超时或被取消时结束子进程，避免残留的 adb 进程。
+        """
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            creationflags=CREATE_NO_WINDOW
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await asyncio.shield(process.wait())
+            raise
+        return process.returncode, stdout, stderr
+
+    async def _run_adb_async(self, args: list, timeout: float = 30) -> Tuple[bool, str]:
+        """
+        异步执行ADB命令
+
+        Args:
+            args: ADB命令参数列表
+            timeout: 超时时间（秒）
+
+        Returns:
+            (成功标志, 输出内容)
+        """
+        cmd = [self.adb_path, "-s", self.device_id] + args
+        try:
+            log_debug(f"执行命令: {' '.join(cmd)}")
+            returncode, stdout, stderr = await self._communicate(cmd, timeout)
+            output = (stdout + stderr).decode("utf-8", errors="ignore")
+            return returncode == 0, output
+        except asyncio.TimeoutError:
+            return False, "命令执行超时"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return False, str(e)
+
+    async def _exec_out_async(self, args: list, timeout: float = 10) -> Optional[bytes]:
+        """异步执行 exec-out 命令并返回原始字节输出"""
+        cmd = [self.adb_path, "-s", self.device_id, "exec-out"] + args
+        returncode, stdout, _ = await self._communicate(cmd, timeout)
+        if returncode == 0 and stdout:
+            return stdout
+        return None
+
+    async def _capture_async(self, capture_format: str) -> Optional[Frame]:
+        """按指定格式异步截图"""
+        timestamp = time.time()
+        data = await self._exec_out_async(self._capture_args(capture_format))
+        return self._decode_capture(capture_format, data, timestamp)
+
+    async def capture_frame_async(self, lazy: bool = False):
+        """
+        异步截图，行为与 capture_frame 一致（原始帧失败时当帧回退到PNG）
+
+        Args:
+            lazy: 为True时返回 Frame
+
+        Returns:
+            BGR图像（lazy时为Frame），失败返回None
+        """
+        frame = None
+        if self.capture_format != "png":
+            capture_format = self.capture_format
+            data = None
+            try:
+                timestamp = time.time()
+                data = await self._exec_out_async(self._capture_args(capture_format))
+                frame = self._decode_capture(capture_format, data, timestamp)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_debug(f"{capture_format} 截图失败: {e}")
+            if frame is not None:
+                self._raw_failures = 0
+            else:
+                self._raw_capture_failed(unparsable=data is not None)
+
+        if frame is None:
+            try:
+                frame = await self._capture_async("png")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"截图失败: {e}")
+
+        if frame is None or lazy:
+            return frame
+        return frame.bgr()
+
+    async def is_connected_async(self) -> bool:
+        """异步检查是否已连接"""
+        success, output = await self._run_adb_async(["get-state"], timeout=5)
+        return success and "device" in output
@@ -2,15 +2,35 @@
 ADB控制模块
 用于连接雷电模拟器并执行屏幕操作
 """
+from __future__ import annotations
+
 import subprocess
+import threading
+import queue
 import time
 import os
-from typing import Optional, Tuple
-from PIL import Image
+import gzip
+from typing import Optional, Tuple, Dict, List
 import io
 
-# Windows 下隐藏子进程控制台窗口的标志
-CREATE_NO_WINDOW = 0x08000000
+from .frame import Frame
+from .lazy_import import lazy_module
+from .startup_cache import startup_cache
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+
+# Windows 下隐藏子进程控制台窗口的标志（其他系统不支持 creationflags，取0）
+CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# 截图格式
+# raw: screencap 原始帧（头部 + RGBA），无需编解码 PNG
+# raw_gzip: 设备端 gzip -1 压缩原始帧，减少传输量
+# png: screencap -p（兼容性最好，作为兜底）
+CAPTURE_FORMATS = ("raw", "raw_gzip", "png")
+# 原始帧格式连续失败该次数后固定改用 png（偶发的超时、无输出只对当帧回退）
+RAW_CAPTURE_MAX_FAILURES = 3
 
 # --- 极速日志记录逻辑 ---
 def log_debug(msg):
@@ -24,10 +44,254 @@ def log_debug(msg):
         pass
 
 
+class ShellSession:
+    """
+    长驻 adb shell 会话
+    
+    保持一个 `adb -s <device> shell` 进程常开，通过 stdin 写入命令，
+    避免每次点击都重新创建进程、握手并启动 shell。
+    每条命令后追加结束标记并回显退出码，用于判断命令完成和成功与否。
+    """
+    
+    END_MARKER = "__OK_SHELL_END__"
+    
+    def __init__(self, adb_path: str, device_id: str):
+        """
+        初始化shell会话（不会立即启动进程）
+        
+        Args:
+            adb_path: ADB可执行文件路径
+            device_id: 设备序列号
+        """
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self._process: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.respawn_count = 0
+    
+    def _spawn(self):
+        """启动 adb shell 进程及输出读取线程"""
+        cmd = [self.adb_path, "-s", self.device_id, "shell"]
+        log_debug(f"启动长驻shell: {' '.join(cmd)}")
+        self._lines = queue.Queue()
+        self._process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='ignore',
+            bufsize=1,
+            creationflags=CREATE_NO_WINDOW
+        )
+        reader = threading.Thread(
+            target=self._read_output,
+            args=(self._process, self._lines),
+            daemon=True
+        )
+        reader.start()
+    
+    @staticmethod
+    def _read_output(process: subprocess.Popen, lines: "queue.Queue[Optional[str]]"):
+        """后台读取shell输出，进程结束时放入 None"""
+        try:
+            for line in process.stdout:
+                lines.put(line.rstrip("\r\n"))
+        except Exception:
+            pass
+        lines.put(None)
+    
+    def is_alive(self) -> bool:
+        """shell进程是否仍在运行"""
+        return self._process is not None and self._process.poll() is None
+    
+    def _execute(self, command: str, timeout: float) -> Tuple[bool, str]:
+        """在当前进程中执行一条命令并等待结束标记"""
+        self._process.stdin.write(f"{command}; echo {self.END_MARKER}$?\n")
+        self._process.stdin.flush()
+        
+        output = []
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError
+            if line is None:
+                raise BrokenPipeError("shell进程已退出")
+            if line.startswith(self.END_MARKER):
+                return line[len(self.END_MARKER):].strip() == "0", "\n".join(output)
+            output.append(line)
+    
+    def run(self, command: str, timeout: float = 5) -> Tuple[bool, str]:
+        """
+        执行shell命令，进程失效时自动重启一次
+        
+        Args:
+            command: shell命令行
+            timeout: 超时时间（秒）
+            
+        Returns:
+            (成功标志, 输出内容)
+        """
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if not self.is_alive():
+                        if self._process is not None:
+                            self.respawn_count += 1
+                            log_debug(f"长驻shell已退出，重新启动 (第{self.respawn_count}次)")
+                        self._spawn()
+                    return self._execute(command, timeout)
+                except TimeoutError:
+                    # 输出流已不可信，丢弃该进程，下次调用时重建
+                    self._kill()
+                    return False, "命令执行超时"
+                except (OSError, ValueError, BrokenPipeError) as e:
+                    log_debug(f"长驻shell执行失败: {e}")
+                    self._kill()
+            return False, "shell会话不可用"
+    
+    def _kill(self):
+        """结束当前shell进程"""
+        if self._process is None:
+            return
+        try:
+            self._process.kill()
+            self._process.wait(timeout=2)
+        except Exception:
+            pass
+    
+    def close(self):
+        """关闭shell会话"""
+        with self._lock:
+            if self._process is not None and self.is_alive():
+                try:
+                    self._process.stdin.write("exit\n")
+                    self._process.stdin.flush()
+                    self._process.wait(timeout=2)
+                except Exception:
+                    pass
+            self._kill()
+            self._process = None
+
+
+class InputBatch:
+    """
+    输入命令批次
+    
+    收集若干点击/滑动/按键命令及其间隔，提交时拼接成一条shell命令行，
+    间隔由设备端 sleep 执行，整组只需一次往返。
+    """
+    
+    def __init__(self, controller: "ADBController"):
+        self._controller = controller
+        self._commands: List[str] = []
+    
+    def tap(self, x: int, y: int) -> "InputBatch":
+        """追加点击"""
+        self._commands.append(f"input tap {x} {y}")
+        return self
+    
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> "InputBatch":
+        """追加滑动"""
+        self._commands.append(f"input swipe {x1} {y1} {x2} {y2} {duration_ms}")
+        return self
+    
+    def key_event(self, keycode: int) -> "InputBatch":
+        """追加按键"""
+        self._commands.append(f"input keyevent {keycode}")
+        return self
+    
+    def sleep(self, seconds: float) -> "InputBatch":
+        """追加设备端等待"""
+        self._commands.append(f"sleep {seconds:g}")
+        return self
+    
+    def commit(self) -> bool:
+        """发送批次中的所有命令"""
+        commands, self._commands = self._commands, []
+        if not commands:
+            return True
+        return self._controller._send_input_commands(commands)
+    
+    def __enter__(self) -> "InputBatch":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+
+
+class InputQueue:
+    """
+    输入合并队列
+    
+    第一个提交命令的线程等待一个窗口期，期间其他线程提交的命令合并为一次shell往返发送，
+    相邻命令之间插入设备端 sleep（连续点击不同位置时游戏可能丢弃后一次点击），
+    所有提交者共享执行结果。
+    只有多个线程直接调用控制器时才可能合并；经输入仲裁线程串行发出的点击不经过该队列。
+    """
+    
+    def __init__(self, controller: "ADBController", window_ms: int, gap_ms: int = 100):
+        self._controller = controller
+        self.window = window_ms / 1000.0
+        self.gap = gap_ms / 1000.0
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._done: Optional[threading.Event] = None
+        self._result = {"success": False}
+    
+    def submit(self, command: str) -> bool:
+        """提交一条命令，阻塞到所在批次执行完毕"""
+        with self._lock:
+            self._pending.append(command)
+            if self._done is not None:
+                done, result = self._done, self._result
+                is_leader = False
+            else:
+                done, result = threading.Event(), {"success": False}
+                self._done, self._result = done, result
+                is_leader = True
+        
+        if not is_leader:
+            done.wait()
+            return result["success"]
+        
+        time.sleep(self.window)
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._done = None
+        commands = [pending[0]]
+        for command in pending[1:]:
+            if self.gap > 0:
+                commands.append(f"sleep {self.gap:g}")
+            commands.append(command)
+        try:
+            result["success"] = self._controller._send_input_commands(commands)
+        finally:
+            done.set()
+        return result["success"]
+
+
 class ADBController:
     """ADB控制器，负责与模拟器交互"""
     
-    def __init__(self, host: str = "127.0.0.1", port: int = 5555, adb_path: str = "adb"):
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 5555,
+        adb_path: str = "adb",
+        persistent_shell: bool = False,
+        capture_format: str = "png",
+        input_batch_window_ms: int = 0,
+        input_batch_gap_ms: int = 100
+    ):
         """
         初始化ADB控制器
         
@@ -35,6 +299,10 @@ class ADBController:
             host: 模拟器ADB主机地址
             port: 模拟器ADB端口（雷电模拟器9默认5555）
             adb_path: 手动指定的ADB路径
+            persistent_shell: 是否使用长驻shell会话发送点击/滑动/按键命令
+            capture_format: 截图格式（raw / raw_gzip / png）
+            input_batch_window_ms: 输入合并窗口（毫秒），窗口内多个线程发出的点击合并为一次shell往返，0=不合并
+            input_batch_gap_ms: 合并后相邻点击之间的设备端等待（毫秒）
         """
         self.host = host
         self.port = port
@@ -44,13 +312,47 @@ class ADBController:
         # 保存并查找ADB路径
         self.config_adb_path = adb_path
         self.adb_path = self._find_adb()
+        
+        # 长驻shell会话（按需创建）
+        self.persistent_shell = persistent_shell
+        self._shell_session: Optional[ShellSession] = None
+        self._shell_lock = threading.Lock()  # 主循环与点击线程都会创建/关闭会话
+        
+        # 截图格式（非法值回退到png）
+        if capture_format not in CAPTURE_FORMATS:
+            log_debug(f"未知截图格式 {capture_format}，使用 png")
+            capture_format = "png"
+        self.capture_format = capture_format
+        self._raw_failures = 0  # 原始帧格式连续失败次数
+        
+        # 输入命令统计与合并队列（窗口为0时不合并）
+        self._stats_lock = threading.Lock()
+        self.input_stats = {"commands": 0, "round_trips": 0, "total_ms": 0.0, "last_ms": 0.0}
+        self._input_queue: Optional[InputQueue] = None
+        if input_batch_window_ms > 0:
+            self._input_queue = InputQueue(self, input_batch_window_ms, input_batch_gap_ms)
     
     def _find_adb(self) -> str:
         """查找ADB可执行文件路径"""
         # 1. 首先尝试配置文件中指定的路径
         if self.config_adb_path and os.path.exists(self.config_adb_path):
             return self.config_adb_path
-            
+        
+        # 上次运行探测到的路径（跳过启动 adb version / PowerShell 进程）
+        cached = startup_cache.get("adb_path")
+        if cached and (cached == "adb" or os.path.exists(cached)):
+            return cached
+        
+        adb_path = self._probe_adb()
+        if adb_path is not None:
+            startup_cache.set("adb_path", adb_path)
+            return adb_path
+        
+        # 默认使用系统adb（即使不存在，作为最后方案）
+        return "adb"
+    
+    def _probe_adb(self) -> Optional[str]:
+        """探测ADB路径（系统PATH、运行中的雷电模拟器、常见安装目录），未找到返回None"""
         # 2. 尝试系统PATH中的adb
         try:
             result = subprocess.run(
@@ -92,8 +394,7 @@ class ADBController:
             if os.path.exists(path):
                 return path
         
-        # 默认使用系统adb（即使不存在，作为最后方案）
-        return "adb"
+        return None
     
     def _run_adb(self, args: list, timeout: int = 30) -> Tuple[bool, str]:
         """
@@ -125,6 +426,103 @@ class ADBController:
         except Exception as e:
             return False, str(e)
     
+    def _get_shell_session(self) -> ShellSession:
+        """获取长驻shell会话，设备变化时重建"""
+        with self._shell_lock:
+            session = self._shell_session
+            if session is None or session.device_id != self.device_id:
+                if session is not None:
+                    session.close()
+                session = ShellSession(self.adb_path, self.device_id)
+                self._shell_session = session
+            return session
+    
+    def _run_shell_command(self, command: str) -> bool:
+        """
+        在设备上执行一条shell命令行（可包含 `;` 分隔的多条命令）
+        
+        Args:
+            command: shell命令行
+            
+        Returns:
+            是否成功
+        """
+        if self.persistent_shell:
+            success, _ = self._get_shell_session().run(command)
+            return success
+        success, _ = self._run_adb(["shell", command])
+        return success
+    
+    def _send_input_commands(self, commands: List[str]) -> bool:
+        """
+        将一组命令合并为一次shell往返发送，并记录耗时统计
+        
+        Args:
+            commands: shell命令列表（input ... / sleep ...）
+            
+        Returns:
+            是否成功
+        """
+        start = time.perf_counter()
+        success = self._run_shell_command("; ".join(commands))
+        self._record_input_stats(commands, (time.perf_counter() - start) * 1000)
+        return success
+    
+    def _record_input_stats(self, commands: List[str], elapsed_ms: float):
+        """记录一次shell往返的统计"""
+        input_count = sum(1 for c in commands if c.startswith("input "))
+        with self._stats_lock:
+            self.input_stats["commands"] += input_count
+            self.input_stats["round_trips"] += 1
+            self.input_stats["total_ms"] += elapsed_ms
+            self.input_stats["last_ms"] = elapsed_ms
+    
+    def _run_input(self, args: list) -> bool:
+        """
+        执行 `input` 命令（tap/swipe/keyevent）
+        
+        Args:
+            args: input 子命令参数列表
+            
+        Returns:
+            是否成功
+        """
+        command = "input " + " ".join(str(a) for a in args)
+        if self._input_queue is not None:
+            return self._input_queue.submit(command)
+        return self._send_input_commands([command])
+    
+    def batch(self) -> "InputBatch":
+        """
+        创建输入批次，批次内的命令（含设备端延时）在一次shell往返中执行
+        
+        用法:
+            with adb.batch() as b:
+                b.tap(100, 200).sleep(0.3).tap(300, 200)
+        """
+        return InputBatch(self)
+    
+    def get_input_stats(self) -> Dict[str, float]:
+        """
+        获取输入命令统计
+        
+        Returns:
+            commands: 输入命令数, round_trips: 实际shell往返次数,
+            saved: 合并节省的往返次数, avg_ms: 每次往返平均耗时, last_ms: 最近一次往返耗时
+        """
+        with self._stats_lock:
+            stats = dict(self.input_stats)
+        stats["saved"] = stats["commands"] - stats["round_trips"]
+        stats["avg_ms"] = stats["total_ms"] / stats["round_trips"] if stats["round_trips"] else 0.0
+        return stats
+    
+    def close_shell(self):
+        """关闭长驻shell会话"""
+        with self._shell_lock:
+            if self._shell_session is not None:
+                self._shell_session.close()
+                self._shell_session = None
+    
     def connect(self) -> bool:
         """
         连接到模拟器
@@ -191,6 +589,7 @@ class ADBController:
     
     def disconnect(self) -> bool:
         """断开连接"""
+        self.close_shell()
         cmd = [self.adb_path, "disconnect", self.device_id]
         try:
             subprocess.run(cmd, capture_output=True, timeout=5, creationflags=CREATE_NO_WINDOW)
@@ -212,18 +611,11 @@ class ADBController:
             PIL Image对象，失败返回None
         """
         # 使用screencap命令截图并直接输出到stdout
-        cmd = [self.adb_path, "-s", self.device_id, "exec-out", "screencap", "-p"]
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                timeout=10,
-                creationflags=CREATE_NO_WINDOW
-            )
-            
-            if result.returncode == 0 and result.stdout:
+            data = self._exec_out(["screencap", "-p"])
+            if data:
                 # 将PNG数据转换为PIL Image
-                image = Image.open(io.BytesIO(result.stdout))
+                image = Image.open(io.BytesIO(data))
                 return image
             
             return None
@@ -231,6 +623,158 @@ class ADBController:
             print(f"截图失败: {e}")
             return None
     
+    def _exec_out(self, args: list, timeout: int = 10) -> Optional[bytes]:
+        """执行 exec-out 命令并返回原始字节输出"""
+        cmd = [self.adb_path, "-s", self.device_id, "exec-out"] + args
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            timeout=timeout,
+            creationflags=CREATE_NO_WINDOW
+        )
+        if result.returncode == 0 and result.stdout:
+            return result.stdout
+        return None
+    
+    @staticmethod
+    def parse_raw_frame(data: bytes) -> Optional[np.ndarray]:
+        """
+        解析 screencap 原始帧
+        
+        头部为 width、height、format 三个 uint32（Android 9+ 额外多一个 dataspace），
+        其后为 RGBA 像素数据。
+        
+        Args:
+            data: screencap 原始输出
+            
+        Returns:
+            BGR 图像（OpenCV格式），解析失败返回None
+        """
+        frame = Frame.from_raw(data)
+        return frame.bgr() if frame is not None else None
+    
+    @staticmethod
+    def _capture_args(capture_format: str) -> list:
+        """各截图格式对应的 exec-out 命令"""
+        if capture_format == "raw":
+            return ["screencap"]
+        if capture_format == "raw_gzip":
+            return ["screencap | gzip -1"]
+        return ["screencap", "-p"]
+    
+    @staticmethod
+    def _decode_capture(capture_format: str, data: Optional[bytes], timestamp: float) -> Optional[Frame]:
+        """将截图命令输出解码为惰性画面帧"""
+        if not data:
+            return None
+        if capture_format == "raw":
+            return Frame.from_raw(data, timestamp)
+        if capture_format == "raw_gzip":
+            return Frame.from_raw(gzip.decompress(data), timestamp)
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return Frame.from_bgr(image, timestamp) if image is not None else None
+    
+    def _capture(self, capture_format: str) -> Optional[Frame]:
+        """按指定格式截图，返回惰性画面帧"""
+        timestamp = time.time()
+        data = self._exec_out(self._capture_args(capture_format))
+        return self._decode_capture(capture_format, data, timestamp)
+    
+    def capture_frame(self, lazy: bool = False):
+        """
+        按配置的格式截图，直接返回OpenCV格式（BGR）图像
+        
+        原始帧格式失败时当帧回退到PNG；输出无法解析或连续失败
+        RAW_CAPTURE_MAX_FAILURES 次后固定使用PNG。
+        
+        Args:
+            lazy: 为True时返回 Frame，颜色转换推迟到识别逻辑读取具体区域时
+            
+        Returns:
+            BGR图像（lazy时为Frame），失败返回None
+        """
+        frame = self._capture_with_fallback()
+        if frame is None or lazy:
+            return frame
+        return frame.bgr()
+    
+    def _capture_with_fallback(self) -> Optional[Frame]:
+        """按配置格式截图，原始帧失败时当帧回退到PNG"""
+        if self.capture_format != "png":
+            capture_format = self.capture_format
+            data = None
+            frame = None
+            try:
+                timestamp = time.time()
+                data = self._exec_out(self._capture_args(capture_format))
+                frame = self._decode_capture(capture_format, data, timestamp)
+            except Exception as e:
+                log_debug(f"{capture_format} 截图失败: {e}")
+            if frame is not None:
+                self._raw_failures = 0
+                return frame
+            self._raw_capture_failed(unparsable=data is not None)
+        
+        try:
+            return self._capture("png")
+        except Exception as e:
+            print(f"截图失败: {e}")
+            return None
+    
+    def _raw_capture_failed(self, unparsable: bool):
+        """
+        记录一次原始帧截图失败
+        
+        命令超时或无输出多为 adb 偶发异常，只对当帧回退；输出无法解析说明设备不支持该格式，
+        与连续失败 RAW_CAPTURE_MAX_FAILURES 次一样，之后固定使用 png
+        
+        Args:
+            unparsable: 命令有输出但无法解析为原始帧
+        """
+        self._raw_failures += 1
+        if unparsable:
+            reason = "输出无法解析"
+        elif self._raw_failures >= RAW_CAPTURE_MAX_FAILURES:
+            reason = f"连续失败 {self._raw_failures} 次"
+        else:
+            log_debug(f"{self.capture_format} 截图失败 (连续第{self._raw_failures}次)，本帧回退到 png")
+            return
+        print(f"⚠ {self.capture_format} 截图{reason}，改用 png 格式")
+        log_debug(f"{self.capture_format} 截图{reason}，改用 png")
+        self.capture_format = "png"
+    
+    def benchmark_capture(self, frames: int = 10) -> Dict[str, Dict[str, float]]:
+        """
+        测试各截图格式的速度
+        
+        Args:
+            frames: 每种格式截图次数
+            
+        Returns:
+            {格式: {"fps": 帧率, "ms_per_frame": 每帧毫秒, "failures": 失败次数}}
+        """
+        report = {}
+        for capture_format in CAPTURE_FORMATS:
+            failures = 0
+            start = time.perf_counter()
+            for _ in range(frames):
+                try:
+                    frame = self._capture(capture_format)
+                    if frame is None:
+                        failures += 1
+                    else:
+                        frame.bgr()
+                except Exception:
+                    failures += 1
+            elapsed = time.perf_counter() - start
+            ms_per_frame = elapsed * 1000 / frames
+            report[capture_format] = {
+                "fps": frames / elapsed if elapsed > 0 else 0.0,
+                "ms_per_frame": ms_per_frame,
+                "failures": failures,
+            }
+        return report
+    
     def tap(self, x: int, y: int) -> bool:
         """
         点击屏幕指定位置
@@ -242,8 +786,7 @@ class ADBController:
         Returns:
             是否成功
         """
-        success, output = self._run_adb(["shell", "input", "tap", str(x), str(y)])
-        return success
+        return self._run_input(["tap", x, y])
     
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> bool:
         """
@@ -257,11 +800,7 @@ class ADBController:
         Returns:
             是否成功
         """
-        success, _ = self._run_adb([
-            "shell", "input", "swipe",
-            str(x1), str(y1), str(x2), str(y2), str(duration_ms)
-        ])
-        return success
+        return self._run_input(["swipe", x1, y1, x2, y2, duration_ms])
     
     def key_event(self, keycode: int) -> bool:
         """
@@ -273,8 +812,7 @@ class ADBController:
         Returns:
             是否成功
         """
-        success, _ = self._run_adb(["shell", "input", "keyevent", str(keycode)])
-        return success
+        return self._run_input(["keyevent", keycode])
     
     def back(self) -> bool:
         """按返回键"""
@@ -301,6 +839,10 @@ if __name__ == "__main__":
         else:
             print("截图失败")
         
+        print("测试截图格式速度...")
+        for fmt, stats in controller.benchmark_capture(frames=5).items():
+            print(f"  {fmt:9s} {stats['fps']:6.2f} fps  {stats['ms_per_frame']:7.1f} ms/帧  失败 {stats['failures']}")
+        
         print("测试点击 (100, 100)...")
         if controller.tap(100, 100):
             print("点击成功")
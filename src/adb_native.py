@@ -0,0 +1,317 @@
+"""
+原生ADB协议控制模块
+通过 pure-python-adb 直接与 adb server (默认端口5037) 通信，
+不再为每次点击/截图启动 adb 子进程
+"""
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+from ppadb.client import Client as AdbClient
+from ppadb.connection import Connection
+
+from .adb_controller import ADBController, ShellSession, CREATE_NO_WINDOW
+
+# --- 极速日志记录逻辑 ---
+def log_debug(msg):
+    try:
+        import os
+        from datetime import datetime
+        with open("error.log", "a", encoding="utf-8") as f:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{timestamp}] [PID:{os.getpid()}] [ADB-Native] {msg}\n")
+    except:
+        pass
+
+
+class TransportConnectionPool:
+    """
+    设备传输连接池
+
+    adb 协议中每个服务（shell:/exec:）会独占一条连接并在结束后关闭，
+    因此连接池预先建立好若干条已切换到目标设备（host:transport:<serial>）的连接，
+    取用时省去 TCP 建连和传输切换的往返，并在后台补充新的连接。
+    """
+
+    # 空闲连接最长保留时间（秒），超过后丢弃重建
+    MAX_IDLE_SECONDS = 30.0
+
+    def __init__(self, host: str, port: int, serial: str, size: int = 2, timeout: float = 10):
+        """
+        初始化连接池
+
+        Args:
+            host: adb server 地址
+            port: adb server 端口
+            serial: 设备序列号
+            size: 预建连接数量
+            timeout: socket 超时时间（秒）
+        """
+        self.host = host
+        self.port = port
+        self.serial = serial
+        self.size = size
+        self.timeout = timeout
+
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._refill_event = threading.Event()
+        self._closed = False
+        self._refill_thread = threading.Thread(target=self._refill_loop, daemon=True)
+        self._refill_thread.start()
+        self._refill_event.set()
+
+        # 统计：命中预建连接 / 现场建连
+        self.hits = 0
+        self.misses = 0
+
+    def _open(self) -> Connection:
+        """建立一条已切换到设备传输的连接"""
+        conn = Connection(self.host, self.port, self.timeout)
+        conn.connect()
+        try:
+            conn.send(f"host:transport:{self.serial}")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _refill_loop(self):
+        """后台补充空闲连接"""
+        while not self._closed:
+            self._refill_event.wait()
+            self._refill_event.clear()
+            while not self._closed:
+                with self._lock:
+                    if len(self._idle) >= self.size:
+                        break
+                try:
+                    conn = self._open()
+                except Exception as e:
+                    log_debug(f"预建adb连接失败: {e}")
+                    break
+                with self._lock:
+                    if self._closed:
+                        conn.close()
+                        return
+                    self._idle.append((conn, time.time()))
+
+    def acquire(self) -> Connection:
+        """取出一条可用连接（无预建连接时现场建立）"""
+        now = time.time()
+        with self._lock:
+            while self._idle:
+                conn, created = self._idle.popleft()
+                if now - created < self.MAX_IDLE_SECONDS:
+                    self.hits += 1
+                    self._refill_event.set()
+                    return conn
+                conn.close()
+            self.misses += 1
+        self._refill_event.set()
+        return self._open()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        self._closed = True
+        self._refill_event.set()
+        with self._lock:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                conn.close()
+
+
+class NativeADBController(ADBController):
+    """
+    基于 adb 协议的控制器
+
+    与 ADBController 接口一致，但所有命令都通过 socket 发送给 adb server。
+    点击/滑动/按键与截图均走连接池，adb 可执行文件只在 adb server 未运行时用于启动它。
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 5555,
+        adb_path: str = "adb",
+        capture_format: str = "png",
+        server_host: str = "127.0.0.1",
+        server_port: int = 5037,
+        pool_size: int = 2,
+        **kwargs
+    ):
+        """
+        初始化原生ADB控制器
+
+        Args:
+            host: 模拟器ADB主机地址
+            port: 模拟器ADB端口
+            adb_path: ADB路径（仅用于启动 adb server）
+            capture_format: 截图格式（raw / raw_gzip / png）
+            server_host: adb server 地址
+            server_port: adb server 端口
+            pool_size: 预建连接数量
+            **kwargs: 其余 ADBController 参数（persistent_shell 在此后端无效，命令本身已不启动进程）
+        """
+        super().__init__(host=host, port=port, adb_path=adb_path, capture_format=capture_format, **kwargs)
+        self.client = AdbClient(host=server_host, port=server_port)
+        self.pool_size = pool_size
+        self._pool: Optional[TransportConnectionPool] = None
+
+    def _get_pool(self) -> TransportConnectionPool:
+        """获取当前设备的连接池，设备变化时重建"""
+        pool = self._pool
+        if pool is None or pool.serial != self.device_id:
+            if pool is not None:
+                pool.close()
+            pool = TransportConnectionPool(
+                self.client.host, self.client.port, self.device_id, size=self.pool_size
+            )
+            self._pool = pool
+        return pool
+
+    def _service(self, service: str, timeout: float = 10) -> bytes:
+        """
+        在设备上执行一个服务并读取全部输出
+
+        预建连接可能已被 server 关闭，失败时换新连接重试一次。
+        """
+        for attempt in range(2):
+            conn = self._get_pool().acquire()
+            try:
+                conn.socket.settimeout(timeout)
+                conn.send(service)
+                return bytes(conn.read_all())
+            except (OSError, RuntimeError) as e:
+                log_debug(f"adb服务执行失败 ({service}): {e}")
+                if attempt:
+                    raise
+            finally:
+                conn.close()
+        return b""
+
+    def _ensure_server(self) -> bool:
+        """确认 adb server 在运行，未运行时用 adb 可执行文件启动"""
+        try:
+            self.client.version()
+            return True
+        except RuntimeError:
+            log_debug("adb server 未运行，尝试启动")
+        success, output = self._run_adb_host(["start-server"])
+        return success
+
+    def _run_adb_host(self, args: list) -> Tuple[bool, str]:
+        """执行不指定设备的 adb 命令"""
+        try:
+            result = subprocess.run(
+                [self.adb_path] + args,
+                capture_output=True,
+                text=True,
+                timeout=10,
+                creationflags=CREATE_NO_WINDOW
+            )
+            return result.returncode == 0, result.stdout + result.stderr
+        except Exception as e:
+            return False, str(e)
+
+    def _run_adb(self, args: list, timeout: int = 30) -> Tuple[bool, str]:
+        """执行 `shell` 命令（其他 adb 子命令由各方法单独实现）"""
+        if args and args[0] == "shell":
+            try:
+                output = self._service("shell:" + " ".join(str(a) for a in args[1:]), timeout)
+                return True, output.decode("utf-8", errors="ignore")
+            except Exception as e:
+                return False, str(e)
+        return super()._run_adb(args, timeout)
+
+    def connect(self) -> bool:
+        """
+        连接到模拟器
+
+        Returns:
+            是否连接成功
+        """
+        try:
+            if not self._ensure_server():
+                print("adb server 启动失败")
+                return False
+
+            # 首先检查是否有已连接的设备
+            for device in self.client.devices(state="device"):
+                self.device_id = device.serial
+                self._connected = True
+                print(f"找到已连接设备: {self.device_id}")
+                return True
+
+            # 如果没有找到设备，尝试 connect
+            connect_targets = [
+                (self.host, self.port),
+                ("127.0.0.1", 5555),
+                ("127.0.0.1", 5554),
+            ]
+            for target_host, target_port in connect_targets:
+                if self.client.remote_connect(target_host, target_port):
+                    self.device_id = f"{target_host}:{target_port}"
+                    self._connected = True
+                    print(f"已连接到: {self.device_id}")
+                    return True
+
+            return False
+        except Exception as e:
+            print(f"连接失败: {e}")
+            return False
+
+    def disconnect(self) -> bool:
+        """断开连接"""
+        self.close_shell()
+        try:
+            if ":" in self.device_id:
+                target_host, target_port = self.device_id.rsplit(":", 1)
+                self.client.remote_disconnect(target_host, int(target_port))
+            self._connected = False
+            return True
+        except Exception:
+            return False
+
+    def is_connected(self) -> bool:
+        """检查是否已连接"""
+        try:
+            return any(d.serial == self.device_id for d in self.client.devices(state="device"))
+        except Exception:
+            return False
+
+    def _exec_out(self, args: list, timeout: int = 10) -> Optional[bytes]:
+        """通过 exec: 服务执行命令，返回未经换行转换的原始输出"""
+        data = self._service("exec:" + " ".join(args), timeout)
+        return data or None
+
+    def _run_shell_command(self, command: str) -> bool:
+        """
+        通过连接池执行shell命令行
+
+        与长驻shell相同，在命令行末尾输出结束标记和退出码，退出码非0时视为失败
+        """
+        try:
+            output = self._service(f"shell:{command}; echo {ShellSession.END_MARKER}$?", timeout=10)
+        except Exception as e:
+            log_debug(f"shell 命令失败: {e}")
+            return False
+        text = output.decode("utf-8", errors="ignore")
+        marker = text.rfind(ShellSession.END_MARKER)
+        if marker < 0:
+            log_debug(f"shell 命令未返回结束标记: {command}")
+            return False
+        status = text[marker + len(ShellSession.END_MARKER):].strip()
+        if status != "0":
+            log_debug(f"shell 命令退出码 {status}: {command}")
+            return False
+        return True
+
+    def close_shell(self):
+        """关闭连接池"""
+        super().close_shell()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
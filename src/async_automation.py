@@ -0,0 +1,178 @@
+"""
+异步自动化模块
+asyncio 版本的主循环：截图、识别（线程池）与点击（输入仲裁线程）相互重叠，
+慢速 adb 调用不会冻结状态检测和继续按钮点击；停止时截图协程立即取消，
+处理逻辑中的等待随停止事件立即返回
+"""
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .adb_async import AsyncADBController
+from .adb_controller import ADBController
+from .config_loader import Config
+from .frame import Frame
+from .state_machine import GameAutomation, log_debug
+
+
+class AsyncGameAutomation(GameAutomation):
+    """
+    异步游戏自动化控制器
+
+    - 截图使用异步子进程，下一帧的截图与当前帧的识别并行
+    - 状态识别与处理逻辑在线程池中执行，不阻塞事件循环
+    - 点击（含继续按钮的周期点击）由输入仲裁线程统一执行
+    """
+
+    def __init__(
+        self,
+        config_dir: str = "config",
+        templates_dir: str = "templates",
+        adb: Optional[ADBController] = None,
+        config: Optional[Config] = None
+    ):
+        super().__init__(config_dir, templates_dir, adb, config)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = []
+        # 识别与处理各用一个线程，保证处理逻辑按顺序执行
+        self._recognize_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recognize")
+        self._handler_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="handler")
+
+    def _create_adb(self) -> ADBController:
+        """native 后端本身已无子进程开销，沿用同步实现；否则使用异步控制器"""
+        if self.config.adb_backend == "native":
+            return super()._create_adb()
+        return AsyncADBController(
+            host=self.config.adb_host,
+            port=self.config.adb_port,
+            adb_path=self.config.adb_path,
+            persistent_shell=self.config.adb_persistent_shell,
+            capture_format=self.config.capture_format,
+            input_batch_window_ms=self.config.input_batch_window_ms,
+            input_batch_gap_ms=self.config.input_batch_gap_ms
+        )
+
+    def start(self):
+        """开始自动化（在调用线程中运行事件循环，直到 stop()）"""
+        self._running = True
+        self._paused = False
+        self._stop_event.clear()
+        if self._poll_scheduler is not None:
+            self._poll_scheduler.reset()
+        self._tap_targets.clear()
+        self._log("▶ 开始自动化 (异步模式)")
+        self._notify_state("运行中")
+
+        self._start_input_arbiter()
+
+        if self.config.capture_stream:
+            self._start_frame_stream()
+
+        try:
+            asyncio.run(self._run())
+        finally:
+            self._loop = None
+
+    def stop(self):
+        """停止自动化，取消所有协程任务"""
+        super().stop()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            for task in list(self._tasks):
+                loop.call_soon_threadsafe(task.cancel)
+
+    async def _run(self):
+        """启动主循环任务"""
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._main_loop_async())]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._tasks = []
+
+    async def _grab_frame_async(self) -> Optional[Frame]:
+        """异步获取当前画面"""
+        frame = self._stream_frame()
+        if frame is not None:
+            return frame
+        if isinstance(self.adb, AsyncADBController):
+            return await self.adb.capture_frame_async(lazy=True)
+        return await asyncio.get_running_loop().run_in_executor(None, self.adb.capture_frame, True)
+
+    async def _capture_after(self, delay: float) -> Optional[Frame]:
+        """等待 delay 秒后截图"""
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return await self._grab_frame_async()
+
+    async def _main_loop_async(self):
+        """
+        异步主循环
+
+        截图间隔按截图开始时间计算：拿到当前帧后立即排定下一帧的截图，
+        使其与当前帧的识别并行（间隔取上一帧排定的轮询间隔）；若当前帧触发了点击，则丢弃预取的帧，
+        在处理结束后重新截图，保证不会用点击前的画面做判断。
+        """
+        loop = asyncio.get_running_loop()
+        delay = self.config.loop_delay_ms / 1000.0
+        next_capture = None
+        capture_started = loop.time()
+
+        try:
+            while self._running:
+                if self._paused:
+                    if next_capture is not None:
+                        next_capture.cancel()
+                        next_capture = None
+                    await asyncio.sleep(0.1)
+                    continue
+
+                try:
+                    if next_capture is None:
+                        capture_started = loop.time()
+                        next_capture = asyncio.create_task(self._grab_frame_async())
+                    log_debug("正在请求截图...")
+                    screen = await next_capture
+                    next_capture = None
+                    if screen is None:
+                        log_debug("警告: 截图失败")
+                        if self.config.debug:
+                            self._log("警告: 截图失败，重试中...")
+                        await asyncio.sleep(1)
+                        continue
+
+                    # 预取下一帧，与识别并行
+                    wait = max(0.0, capture_started + delay - loop.time())
+                    capture_started = loop.time() + wait
+                    next_capture = asyncio.create_task(self._capture_after(wait))
+
+                    state = await loop.run_in_executor(
+                        self._recognize_executor, self.recognizer.detect_state, screen
+                    )
+                    log_debug(f"检测到状态: {state.name}")
+
+                    handled = await loop.run_in_executor(
+                        self._handler_executor, self._process_state, state, screen
+                    )
+                    delay = self._next_poll_delay(state, handled)
+                    if handled:
+                        # 画面已因点击变化，预取的帧作废
+                        next_capture.cancel()
+                        next_capture = None
+                        await asyncio.sleep(delay)
+
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._log(f"错误: {e}")
+                    self._log(traceback.format_exc())
+                    if next_capture is not None:
+                        next_capture.cancel()
+                        next_capture = None
+                    await asyncio.sleep(1)
+        finally:
+            if next_capture is not None:
+                next_capture.cancel()
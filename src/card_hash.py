@@ -0,0 +1,251 @@
+"""
+卡牌图案感知哈希索引模块
+对卡牌图案区域计算感知哈希（dHash / pHash），在多索引哈希表中按汉明距离查找最相近的卡牌，
+查找耗时与卡牌数量基本无关；索引保存为紧凑的 JSON 文件（每张卡一个16位十六进制哈希）
+"""
+from __future__ import annotations
+
+import json
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .lazy_import import lazy_module
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+
+
+# 卡牌图案区域（1600x900）：相对卡牌中心的水平范围, 绝对的垂直范围
+ART_HALF_WIDTH = 140
+ART_ROW = (125, 410)
+# 索引文件格式版本
+INDEX_VERSION = 1
+
+
+def card_art_region(screen: np.ndarray, center_x: int) -> np.ndarray:
+    """截取卡牌图案区域"""
+    top, bottom = ART_ROW
+    h, w = screen.shape[:2]
+    return screen[max(0, top):min(h, bottom), max(0, center_x - ART_HALF_WIDTH):min(w, center_x + ART_HALF_WIDTH)]
+
+
+def _gray(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """差值哈希：缩小到 (hash_size+1) x hash_size，比较水平相邻像素"""
+    small = cv2.resize(_gray(image), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def phash(image: np.ndarray, hash_size: int = 8) -> int:
+    """DCT哈希：缩小到 32x32 做DCT，取左上角低频系数与中位数比较"""
+    small = cv2.resize(_gray(image), (hash_size * 4, hash_size * 4), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(small.astype(np.float32))[:hash_size, :hash_size].ravel()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+HASH_FUNCTIONS = {"dhash": dhash, "phash": phash}
+
+
+def hamming(a: int, b: int) -> int:
+    """汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+class MultiIndexHash:
+    """
+    多索引哈希表（按汉明距离查找）
+
+    哈希分成 chunks 段，每段各建一个 段值 -> 条目 的字典。两个哈希的距离不超过 r 时，
+    至少有一段的距离不超过 r // chunks（抽屉原理），所以只需在每个字典中查找与查询段
+    相差不超过 r // chunks 位的段值，再对候选计算完整距离。结果与逐个比较完全一致。
+    """
+
+    def __init__(self, bits: int = 64, chunks: int = 4):
+        self.bits = bits
+        self.chunks = chunks
+        self._chunk_bits = [bits // chunks + (1 if i < bits % chunks else 0) for i in range(chunks)]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(chunks)]
+        self._values: List[int] = []
+        self._ids: List[List[str]] = []
+        self._positions: Dict[int, int] = {}
+        self._flip_masks: Dict[Tuple[int, int], List[int]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._ids)
+
+    def _split(self, value: int) -> List[int]:
+        """按段拆分哈希（低位在前）"""
+        parts = []
+        for width in self._chunk_bits:
+            parts.append(value & ((1 << width) - 1))
+            value >>= width
+        return parts
+
+    def _masks(self, width: int, radius: int) -> List[int]:
+        """width 位中翻转不超过 radius 位的所有掩码"""
+        key = (width, radius)
+        masks = self._flip_masks.get(key)
+        if masks is None:
+            masks = [0]
+            for count in range(1, radius + 1):
+                masks.extend(sum(1 << b for b in combo) for combo in combinations(range(width), count))
+            self._flip_masks[key] = masks
+        return masks
+
+    def add(self, value: int, card_id: str):
+        """加入一个哈希（相同哈希的多个卡牌ID合并为一个条目）"""
+        position = self._positions.get(value)
+        if position is not None:
+            if card_id not in self._ids[position]:
+                self._ids[position].append(card_id)
+            return
+        position = len(self._values)
+        self._positions[value] = position
+        self._values.append(value)
+        self._ids.append([card_id])
+        for table, part in zip(self._tables, self._split(value)):
+            table.setdefault(part, []).append(position)
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, int, List[str]]]:
+        """
+        查找距离不超过 radius 的所有条目
+
+        Returns:
+            [(距离, 哈希, 卡牌ID列表), ...]，按距离升序
+        """
+        chunk_radius = radius // self.chunks
+        candidates = set()
+        for table, part, width in zip(self._tables, self._split(value), self._chunk_bits):
+            for mask in self._masks(width, chunk_radius):
+                bucket = table.get(part ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+
+        results = []
+        for position in candidates:
+            distance = hamming(value, self._values[position])
+            if distance <= radius:
+                results.append((distance, self._values[position], self._ids[position]))
+        results.sort(key=lambda item: item[0])
+        return results
+
+
+class CardHashIndex:
+    """
+    卡牌图案哈希索引
+
+    - 索引文件：{"version": 1, "kind": "dhash", "hash_size": 8, "entries": [[卡牌ID, 十六进制哈希], ...]}
+    - lookup() 返回距离最近的卡牌ID和汉明距离，没有足够接近的哈希时返回 (None, 距离)
+    - 同一张卡可以有多个哈希（不同截图、不同位置），都指向同一个ID
+    """
+
+    def __init__(self, path: Path, kind: str = "dhash", hash_size: int = 8):
+        """
+        加载索引（文件不存在时为空索引）
+
+        Args:
+            path: 索引文件路径
+            kind: 哈希算法（dhash / phash），已有索引文件时以文件为准
+            hash_size: 哈希边长（位数为其平方），已有索引文件时以文件为准
+        """
+        self.path = Path(path)
+        self.kind = kind
+        self.hash_size = hash_size
+        self._entries: List[Tuple[str, int]] = []
+        self._keys = set()
+
+        data = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.kind = data.get("kind", kind)
+            self.hash_size = int(data.get("hash_size", hash_size))
+        self._table = MultiIndexHash(bits=self.hash_size * self.hash_size)
+        for card_id, value in data.get("entries", []):
+            self._insert(str(card_id), int(value, 16))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def entries(self) -> List[Tuple[str, int]]:
+        """[(卡牌ID, 哈希), ...]"""
+        return list(self._entries)
+
+    @property
+    def card_ids(self) -> List[str]:
+        """索引中的卡牌ID（去重）"""
+        return sorted(set(card_id for card_id, _ in self._entries), key=lambda v: (len(v), v))
+
+    def hash(self, image: np.ndarray) -> int:
+        """用索引的哈希算法计算图像哈希"""
+        return HASH_FUNCTIONS[self.kind](image, self.hash_size)
+
+    def _insert(self, card_id: str, value: int):
+        if (card_id, value) in self._keys:
+            return
+        self._keys.add((card_id, value))
+        self._entries.append((card_id, value))
+        self._table.add(value, card_id)
+
+    def add(self, card_id: str, image: np.ndarray) -> int:
+        """加入一张卡牌图案，返回其哈希"""
+        value = self.hash(image)
+        self._insert(str(card_id), value)
+        return value
+
+    def lookup(self, image: np.ndarray, max_distance: int = 10) -> Tuple[Optional[str], int]:
+        """
+        查找卡牌
+
+        Args:
+            image: 卡牌图案区域
+            max_distance: 最大汉明距离
+
+        Returns:
+            (卡牌ID或None, 汉明距离)
+        """
+        return self.lookup_hash(self.hash(image), max_distance)
+
+    def lookup_hash(self, value: int, max_distance: int = 10) -> Tuple[Optional[str], int]:
+        """
+        按哈希查找卡牌
+
+        Returns:
+            (卡牌ID或None, 汉明距离)；没有距离不超过 max_distance 的哈希，
+            或最近的哈希对应多个不同ID（无法区分）时返回None
+        """
+        matches = self._table.search(value, max_distance)
+        if not matches:
+            return None, self.hash_size * self.hash_size
+        distance, _, card_ids = matches[0]
+        nearest = set(card_ids)
+        for other_distance, _, other_ids in matches[1:]:
+            if other_distance != distance:
+                break
+            nearest.update(other_ids)
+        if len(nearest) != 1:
+            return None, distance
+        return card_ids[0], distance
+
+    def save(self):
+        """保存索引文件"""
+        digits = (self.hash_size * self.hash_size + 3) // 4
+        header = {"version": INDEX_VERSION, "kind": self.kind, "hash_size": self.hash_size}
+        lines = [json.dumps([card_id, f"{value:0{digits}x}"], ensure_ascii=False) for card_id, value in self._entries]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            # 每个哈希一行，便于查看和合并
+            f.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "entries": [\n')
+            f.write(",\n".join(lines))
+            f.write("\n]}\n")
+
+    def stats(self) -> Dict[str, int]:
+        """索引统计"""
+        return {"entries": len(self._entries), "cards": len(self.card_ids)}
@@ -0,0 +1,172 @@
+"""
+卡牌ID模板索引模块
+启动后一次性解码 templates/cards 下的卡牌ID模板并常驻内存，
+目录中增删/修改文件时增量刷新；先在缩小的灰度图上粗筛，只对少数候选做原尺寸匹配
+"""
+from __future__ import annotations
+
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .lazy_import import lazy_module
+from .startup_cache import file_fingerprint
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+
+
+# 粗筛阶段的缩小倍数；每个区域至少取得分最高的几个模板，
+# 与最高分相差不超过 COARSE_MARGIN 的模板也一起进入精确匹配（数字只差一位的ID粗筛得分接近）
+COARSE_SCALE = 4
+COARSE_CANDIDATES = 3
+COARSE_MARGIN = 0.1
+
+
+def _coarse(image: np.ndarray) -> np.ndarray:
+    """粗筛用的缩小灰度图"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    size = (max(1, w // COARSE_SCALE), max(1, h // COARSE_SCALE))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+class CardTemplateIndex:
+    """
+    卡牌ID模板索引
+
+    - 模板解码一次后常驻内存，同时预先计算粗筛用的缩小灰度版本
+    - refresh() 比较文件指纹，只解码新增或修改过的模板，删除的文件从索引移除
+    - match() 先用缩小灰度图为所有区域、所有模板打分（开销很小），
+      每个区域只对得分接近最高分的模板做原尺寸彩色匹配；最终结果仍由原尺寸匹配的
+      阈值判定，与逐个模板匹配相比只会在正确模板的粗筛得分明显落后时漏检
+    """
+
+    def __init__(
+        self,
+        cards_dir: Path,
+        threshold: float = 0.85,
+        refresh_interval: float = 2.0,
+        candidates: int = COARSE_CANDIDATES
+    ):
+        """
+        初始化索引（不会立即加载）
+
+        Args:
+            cards_dir: 卡牌ID模板目录
+            threshold: 匹配阈值（TM_CCOEFF_NORMED）
+            refresh_interval: 两次检查目录变化的最小间隔（秒）
+            candidates: 每个区域至少进入原尺寸匹配的候选数，0 表示对所有模板做原尺寸匹配
+        """
+        self.cards_dir = Path(cards_dir)
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[list, np.ndarray, np.ndarray]] = {}  # id -> (指纹, BGR模板, 粗筛模板)
+        self._dir_state = None
+        self._checked_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def ids(self) -> List[str]:
+        """已索引的卡牌ID"""
+        return list(self._entries)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        增量刷新索引
+
+        目录本身的修改时间未变化时跳过扫描（增删文件会改变目录修改时间），
+        force=True 时逐个比较文件指纹（覆盖同名文件只改变文件本身）。
+
+        Returns:
+            索引是否发生变化
+        """
+        now = time.perf_counter()
+        if not force and self._dir_state is not None and now - self._checked_at < self.refresh_interval:
+            return False
+        self._checked_at = now
+
+        dir_state = file_fingerprint(self.cards_dir)
+        if not force and dir_state is not None and dir_state == self._dir_state:
+            return False
+
+        with self._lock:
+            changed = False
+            seen = set()
+            for template_file in sorted(self.cards_dir.glob("*.png")) if dir_state is not None else []:
+                card_id = template_file.stem
+                seen.add(card_id)
+                fingerprint = file_fingerprint(template_file)
+                entry = self._entries.get(card_id)
+                if entry is not None and entry[0] == fingerprint:
+                    continue
+                template = cv2.imread(str(template_file), cv2.IMREAD_COLOR)
+                if template is None:
+                    continue
+                self._entries[card_id] = (fingerprint, template, _coarse(template))
+                changed = True
+
+            for card_id in [k for k in self._entries if k not in seen]:
+                del self._entries[card_id]
+                changed = True
+
+            self._dir_state = dir_state
+            return changed
+
+    def match(self, regions: List[np.ndarray]) -> List[Tuple[Optional[str], float]]:
+        """
+        批量识别多个ID区域
+
+        Args:
+            regions: 各卡牌的ID区域（BGR）
+
+        Returns:
+            [(卡牌ID或None, 置信度), ...]，与 regions 一一对应
+        """
+        self.refresh()
+        with self._lock:
+            entries = list(self._entries.items())
+
+        results: List[Tuple[Optional[str], float]] = []
+        coarse_regions = [_coarse(region) if region.size else None for region in regions]
+        for region, coarse_region in zip(regions, coarse_regions):
+            rh, rw = region.shape[:2]
+            fitting = [
+                (card_id, template, coarse_template)
+                for card_id, (_, template, coarse_template) in entries
+                if template.shape[0] <= rh and template.shape[1] <= rw
+            ]
+
+            # 粗筛：缩小灰度图上的最高得分
+            if self.candidates and len(fitting) > self.candidates:
+                scored = []
+                for card_id, template, coarse_template in fitting:
+                    ch, cw = coarse_template.shape[:2]
+                    if ch > coarse_region.shape[0] or cw > coarse_region.shape[1]:
+                        score = 1.0  # 缩小后放不下，直接进入精确匹配
+                    else:
+                        scores = cv2.matchTemplate(coarse_region, coarse_template, cv2.TM_CCOEFF_NORMED)
+                        score = float(np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0).max())
+                    scored.append((score, card_id, template))
+                scored.sort(key=lambda item: item[0], reverse=True)
+                floor = scored[0][0] - COARSE_MARGIN
+                fitting = [
+                    (card_id, template, None)
+                    for rank, (score, card_id, template) in enumerate(scored)
+                    if rank < self.candidates or score >= floor
+                ]
+
+            # 精确匹配：原尺寸彩色模板
+            found_id, max_val = None, 0.0
+            for card_id, template, _ in fitting:
+                _, val, _, _ = cv2.minMaxLoc(cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED))
+                if val > self.threshold and val > max_val:
+                    max_val = val
+                    found_id = card_id
+            results.append((found_id, max_val))
+        return results
@@ -0,0 +1,100 @@
+"""
+颜色类别模块
+状态识别规则中用到的颜色范围统一命名为颜色类别；
+按通道查找表一次把整帧像素标记为类别位掩码，再用各类别的积分图在 O(1) 时间内统计任意矩形中的像素数
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .lazy_import import lazy_module
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+
+
+# 颜色类别：名称 -> (颜色空间, [(下限, 上限), ...])，多个范围互不相交，像素数为各范围之和
+# HSV 范围与 cv2.inRange 一致（含边界）；gray 为灰度阈值
+COLOR_CLASSES: Dict[str, Tuple[str, List[Tuple[Sequence[int], Sequence[int]]]]] = {
+    "orange":        ("hsv", [([10, 150, 150], [25, 255, 255])]),   # 橙色按钮（底部、升级、购买失败确认）
+    "orange_soft":   ("hsv", [([10, 120, 120], [25, 255, 255])]),   # 购买失败按钮的橙色密度
+    "orange_light":  ("hsv", [([10, 100, 100], [25, 255, 255])]),   # 左上角英文按钮
+    "warm":          ("hsv", [([0, 100, 100], [25, 255, 255])]),    # 障碍物继续按钮（红到橙）
+    "red":           ("hsv", [([0, 100, 100], [10, 255, 255]), ([160, 100, 100], [180, 255, 255])]),  # 红色关闭按钮（色相跨越0）
+    "yellow":        ("hsv", [([15, 100, 100], [40, 255, 255])]),   # 开始按钮
+    "gold":          ("hsv", [([15, 80, 80], [40, 255, 255])]),     # 顶部金色UI
+    "beige":         ("hsv", [([15, 5, 180], [35, 80, 255])]),      # 卡牌描述米色背景
+    "green":         ("hsv", [([35, 80, 80], [85, 255, 255])]),     # 胜利横幅
+    "blue":          ("hsv", [([100, 100, 100], [130, 255, 255])]), # "选择2个"图标
+    "silver":        ("hsv", [([0, 0, 150], [180, 50, 255])]),      # 顶部银色UI
+    "grayish":       ("hsv", [([0, 0, 50], [180, 50, 200])]),       # 右侧灰色边缘
+    "dark":          ("hsv", [([0, 0, 0], [180, 255, 80])]),        # 暗色面板
+    "white_text":    ("gray", [([201], [255])]),                    # 白色文字（灰度 > 200）
+    "shadow":        ("gray", [([0], [79])]),                       # 深色背景（灰度 < 80）
+    "black":         ("gray", [([0], [59])]),                       # 更深的背景（灰度 < 60）
+}
+
+
+class ColorClassifier:
+    """
+    颜色类别标记
+
+    每个颜色范围占标记图的一位。HSV 范围是三个通道各自区间的合取，所以每个通道只需一张
+    256 项的查找表（该通道取值落在哪些范围的区间内），像素的类别位 = 各通道查找结果按位与，
+    与逐个 cv2.inRange 的结果完全一致。灰度范围另用一张灰度查找表，与 HSV 表互不影响。
+    """
+
+    def __init__(self, classes: Optional[Dict[str, tuple]] = None):
+        classes = COLOR_CLASSES if classes is None else classes
+        self.bits: Dict[str, List[int]] = {}
+        # 各通道查找表：h, s, v, gray；不参与某通道的范围在该通道表中恒为1
+        tables = np.zeros((4, 256), dtype=np.int64)
+        bit = 0
+        for name, (space, ranges) in classes.items():
+            self.bits[name] = []
+            for lower, upper in ranges:
+                mask = 1 << bit
+                channels = (0, 1, 2) if space == "hsv" else (3,)
+                for channel in range(4):
+                    if channel in channels:
+                        i = channels.index(channel)
+                        tables[channel, int(lower[i]):int(upper[i]) + 1] |= mask
+                    else:
+                        tables[channel] |= mask
+                self.bits[name].append(mask)
+                bit += 1
+        if bit > 31:
+            raise ValueError(f"颜色范围过多: {bit} (最多31个)")
+        self._tables = [table.astype(np.int32) for table in tables]
+
+    def labels(self, hsv: np.ndarray, gray: np.ndarray) -> np.ndarray:
+        """
+        整帧类别标记图
+
+        Args:
+            hsv: HSV 图像
+            gray: 灰度图像（与 hsv 同尺寸）
+
+        Returns:
+            int32 标记图，每位对应一个颜色范围
+        """
+        h, s, v = cv2.split(hsv)
+        label = cv2.bitwise_and(cv2.LUT(h, self._tables[0]), cv2.LUT(s, self._tables[1]))
+        label = cv2.bitwise_and(label, cv2.LUT(v, self._tables[2]))
+        return cv2.bitwise_and(label, cv2.LUT(gray, self._tables[3]))
+
+    @staticmethod
+    def integral(labels: np.ndarray, bit: int) -> np.ndarray:
+        """单个颜色范围的积分图（尺寸为标记图 +1）"""
+        return cv2.integral(((labels & bit) != 0).view(np.uint8))
+
+
+_classifier: Optional[ColorClassifier] = None
+
+
+def default_classifier() -> ColorClassifier:
+    """按 COLOR_CLASSES 构建的共享实例"""
+    global _classifier
+    if _classifier is None:
+        _classifier = ColorClassifier()
+    return _classifier
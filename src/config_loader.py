@@ -179,6 +179,121 @@ class Config:
         """ADB端口"""
         return self._config.get("adb_port", 5555)
     
+    @property
+    def adb_backend(self) -> str:
+        """ADB后端：subprocess（调用adb可执行文件）/ native（直接与adb server通信）"""
+        return self._config.get("adb_backend", "subprocess")
+    
+    @property
+    def adb_persistent_shell(self) -> bool:
+        """是否使用长驻adb shell会话发送点击命令（降低点击延迟）"""
+        return self._config.get("adb_persistent_shell", False)
+    
+    @property
+    def input_batch_window_ms(self) -> int:
+        """点击合并窗口（毫秒），窗口内多个线程直接发出的点击合并为一次adb往返，0=不合并（输入仲裁的点击不受影响）"""
+        return self._config.get("input_batch_window_ms", 0)
+    
+    @property
+    def input_batch_gap_ms(self) -> int:
+        """合并发送的相邻点击之间的设备端等待（毫秒）"""
+        return self._config.get("input_batch_gap_ms", 100)
+    
+    @property
+    def capture_format(self) -> str:
+        """截图格式：raw（原始帧）/ raw_gzip（设备端压缩原始帧）/ png"""
+        return self._config.get("capture_format", "png")
+    
+    @property
+    def capture_stream(self) -> bool:
+        """是否使用 screenrecord 流式截图（需要安装 PyAV）"""
+        return self._config.get("capture_stream", False)
+    
+    @property
+    def async_loop(self) -> bool:
+        """是否使用 asyncio 版本的主循环（截图/识别/点击并行）"""
+        return self._config.get("async_loop", False)
+    
+    @property
+    def pipeline_loop(self) -> bool:
+        """是否使用流水线主循环（截图/识别/处理各一个线程）"""
+        return self._config.get("pipeline_loop", False)
+    
+    @property
+    def frame_gate_threshold(self) -> float:
+        """画面变化门限（缩略图平均灰度差），低于该值视为画面未变化并跳过识别，0=关闭"""
+        return self._config.get("frame_gate_threshold", 0)
+    
+    @property
+    def input_min_interval_ms(self) -> int:
+        """同一位置两次点击的最小间隔（毫秒），间隔内的重复点击被丢弃"""
+        return self._config.get("input_min_interval_ms", 300)
+    
+    @property
+    def input_quiet_ms(self) -> int:
+        """处理逻辑点击后，继续按钮周期点击让路的时间（毫秒）"""
+        return self._config.get("input_quiet_ms", 800)
+    
+    @property
+    def transition_wait(self) -> bool:
+        """点击后是否等到界面切换为止（替代固定等待时间）"""
+        return self._config.get("transition_wait", True)
+    
+    @property
+    def transition_threshold(self) -> float:
+        """判断点击后画面已变化的缩略图平均灰度差"""
+        return self._config.get("transition_threshold", 4.0)
+    
+    @property
+    def template_cache_mb(self) -> float:
+        """已解码模板的内存预算（MB），超出时淘汰最久未使用的模板"""
+        return self._config.get("template_cache_mb", 32)
+    
+    @property
+    def template_pyramid(self) -> Dict[str, dict]:
+        """各模板的金字塔匹配参数 {模板名称: {"levels", "candidates", "slack"}}，"*" 为默认"""
+        return self._config.get("template_pyramid", {})
+    
+    @property
+    def color_class_map(self) -> bool:
+        """状态识别的颜色像素数是否用整帧颜色类别标记图 + 积分图统计（识别结果相同）"""
+        return self._config.get("color_class_map", False)
+    
+    @property
+    def detection_scale(self) -> int:
+        """降分辨率识别的抽样步长（1=原尺寸，2=1/2，4=1/4），像素数阈值自动换算"""
+        return int(self._config.get("detection_scale", 1))
+    
+    @property
+    def fast_start(self) -> bool:
+        """快速启动：在后台线程加载模板和识别器，界面先显示"""
+        return self._config.get("fast_start", True)
+    
+    @property
+    def adaptive_polling(self) -> bool:
+        """是否按状态自适应调整截图间隔（战斗中退避，点击后快速连拍）"""
+        return self._config.get("adaptive_polling", False)
+    
+    @property
+    def poll_max_delay_ms(self) -> int:
+        """自适应轮询：战斗/静止画面时退避的最大间隔（毫秒）"""
+        return self._config.get("poll_max_delay_ms", 1500)
+    
+    @property
+    def poll_backoff_factor(self) -> float:
+        """自适应轮询：每次未知/静止画面后间隔的放大倍数"""
+        return self._config.get("poll_backoff_factor", 1.5)
+    
+    @property
+    def poll_burst_count(self) -> int:
+        """自适应轮询：点击后快速连拍的次数"""
+        return self._config.get("poll_burst_count", 3)
+    
+    @property
+    def poll_burst_delay_ms(self) -> int:
+        """自适应轮询：快速连拍的间隔（毫秒）"""
+        return self._config.get("poll_burst_delay_ms", 50)
+    
     @property
     def max_log_lines(self) -> int:
         """日志最大行数"""
@@ -254,6 +369,11 @@ class Config:
         pos = self._config.get("btn_open_chest_pos", [800, 500])
         return tuple(pos)
 
+    @property
+    def card_weight_selection(self) -> bool:
+        """是否识别卡牌ID并按权重选择卡牌（关闭时随机选择）"""
+        return self._config.get("card_weight_selection", False)
+    
     @property
     def card_positions(self) -> list:
         """卡牌位置列表"""
@@ -0,0 +1,240 @@
+"""
+画面帧模块
+包装截图原始缓冲区，按区域惰性转换 BGR / HSV / 灰度，
+识别逻辑只为实际读取的像素付出转换成本；同一帧内的颜色掩码、像素计数和特征点也只计算一次
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from .lazy_import import lazy_module
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+
+
+class Frame:
+    """
+    惰性画面帧
+
+    底层像素以零拷贝方式引用截图缓冲区（BGR 或 screencap 原始 RGBA），
+    bgr()/hsv()/gray() 只转换请求的行列区域，并按区域缓存结果；
+    已转换过的更大区域包含请求区域时直接从中切片。
+    in_range()/count_in_range() 缓存颜色掩码和像素计数，count_class() 按命名的颜色类别统计，
+    features() 缓存区域的特征点，
+    同一帧交给多个检测和处理逻辑时，相同的计算只做一次。
+    """
+
+    def __init__(self, pixels: np.ndarray, rgba: bool = False, timestamp: Optional[float] = None):
+        """
+        初始化画面帧
+
+        Args:
+            pixels: HxWx3 的 BGR 数组，或 HxWx4 的 RGBA 数组
+            rgba: pixels 是否为 RGBA 顺序
+            timestamp: 采集时间戳
+        """
+        self._pixels = pixels
+        self._rgba = rgba
+        self.timestamp = timestamp
+        self._cache: Dict[Tuple[str, int, int, int, int], np.ndarray] = {}
+        self._derived: Dict[tuple, Any] = {}  # 掩码、计数、特征点
+
+    @classmethod
+    def from_bgr(cls, image: np.ndarray, timestamp: Optional[float] = None) -> "Frame":
+        """从 BGR 图像创建（不复制）"""
+        return cls(image, rgba=False, timestamp=timestamp)
+
+    @classmethod
+    def from_raw(cls, data: bytes, timestamp: Optional[float] = None) -> Optional["Frame"]:
+        """
+        从 screencap 原始输出创建（头部 + RGBA），像素数据不复制
+
+        Returns:
+            Frame，格式不符返回None
+        """
+        if len(data) < 12:
+            return None
+        width, height = (int(v) for v in np.frombuffer(data, dtype="<u4", count=2))
+        pixel_bytes = width * height * 4
+        header_size = len(data) - pixel_bytes
+        if pixel_bytes == 0 or header_size not in (12, 16):
+            return None
+        rgba = np.frombuffer(memoryview(data)[header_size:], dtype=np.uint8).reshape(height, width, 4)
+        return cls(rgba, rgba=True, timestamp=timestamp)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """与 BGR 数组一致的形状 (h, w, 3)"""
+        h, w = self._pixels.shape[:2]
+        return h, w, 3
+
+    def _bounds(self, rows: slice, cols: slice) -> Tuple[int, int, int, int]:
+        """将切片规范化为 (y0, y1, x0, x1)"""
+        h, w = self._pixels.shape[:2]
+        y0, y1, _ = rows.indices(h)
+        x0, x1, _ = cols.indices(w)
+        return y0, max(y0, y1), x0, max(x0, x1)
+
+    def bgr(self, rows: slice = slice(None), cols: slice = slice(None)) -> np.ndarray:
+        """
+        获取区域的 BGR 像素
+
+        源为 BGR 时直接返回视图（零拷贝），源为 RGBA 时只转换该区域。
+        """
+        y0, y1, x0, x1 = self._bounds(rows, cols)
+        if not self._rgba:
+            return self._pixels[y0:y1, x0:x1]
+        key = ("bgr", y0, y1, x0, x1)
+        region = self._cache.get(key)
+        if region is None:
+            full = self._cache.get(("bgr",) + self._bounds(slice(None), slice(None)))
+            if full is not None:
+                return full[y0:y1, x0:x1]
+            region = cv2.cvtColor(self._pixels[y0:y1, x0:x1], cv2.COLOR_RGBA2BGR)
+            self._cache[key] = region
+        return region
+
+    def _converted(self, space: str, code: int, rows: slice, cols: slice) -> np.ndarray:
+        """获取区域在指定颜色空间下的像素（按区域缓存）"""
+        y0, y1, x0, x1 = self._bounds(rows, cols)
+        key = (space, y0, y1, x0, x1)
+        region = self._cache.get(key)
+        if region is None:
+            # 颜色转换逐像素进行，从包含该区域的已转换结果切片与重新转换一致
+            for (cached_space, cy0, cy1, cx0, cx1), cached in self._cache.items():
+                if cached_space == space and cy0 <= y0 and y1 <= cy1 and cx0 <= x0 and x1 <= cx1:
+                    return cached[y0 - cy0:y1 - cy0, x0 - cx0:x1 - cx0]
+            region = cv2.cvtColor(self.bgr(rows, cols), code)
+            self._cache[key] = region
+        return region
+
+    def hsv(self, rows: slice = slice(None), cols: slice = slice(None)) -> np.ndarray:
+        """获取区域的 HSV 像素"""
+        return self._converted("hsv", cv2.COLOR_BGR2HSV, rows, cols)
+
+    def gray(self, rows: slice = slice(None), cols: slice = slice(None)) -> np.ndarray:
+        """获取区域的灰度像素"""
+        return self._converted("gray", cv2.COLOR_BGR2GRAY, rows, cols)
+
+    def in_range(
+        self,
+        rows: slice,
+        cols: slice,
+        lower: Sequence[int],
+        upper: Sequence[int],
+        space: str = "hsv"
+    ) -> np.ndarray:
+        """
+        区域的颜色范围掩码（cv2.inRange，按区域和范围缓存）
+
+        Args:
+            rows, cols: 区域
+            lower, upper: 颜色范围（含边界）
+            space: 颜色空间（hsv / bgr / gray）
+        """
+        key = ("mask", space, self._bounds(rows, cols), tuple(lower), tuple(upper))
+        mask = self._derived.get(key)
+        if mask is None:
+            region = getattr(self, space)(rows, cols)
+            mask = cv2.inRange(region, np.array(lower), np.array(upper))
+            self._derived[key] = mask
+        return mask
+
+    def count_in_range(
+        self,
+        rows: slice,
+        cols: slice,
+        lower: Sequence[int],
+        upper: Sequence[int],
+        space: str = "hsv"
+    ) -> int:
+        """区域内落在颜色范围中的像素数（按区域和范围缓存）"""
+        key = ("count", space, self._bounds(rows, cols), tuple(lower), tuple(upper))
+        count = self._derived.get(key)
+        if count is None:
+            count = cv2.countNonZero(self.in_range(rows, cols, lower, upper, space))
+            self._derived[key] = count
+        return count
+
+    def count_class(self, name: str, rows: slice, cols: slice, integral: bool = False) -> int:
+        """
+        区域内属于颜色类别的像素数（颜色类别见 color_classes.COLOR_CLASSES）
+
+        Args:
+            name: 颜色类别名称
+            rows, cols: 区域
+            integral: 是否使用整帧类别标记图和积分图统计（每帧第一次使用某类别时计算整帧积分图，
+                      之后任意矩形 O(1)；区域少时逐区域 inRange 更快）
+        """
+        from .color_classes import COLOR_CLASSES, default_classifier
+
+        if not integral:
+            space, ranges = COLOR_CLASSES[name]
+            return sum(self.count_in_range(rows, cols, lower, upper, space) for lower, upper in ranges)
+
+        classifier = default_classifier()
+        y0, y1, x0, x1 = self._bounds(rows, cols)
+        total = 0
+        for bit in classifier.bits[name]:
+            key = ("integral", bit)
+            table = self._derived.get(key)
+            if table is None:
+                labels = self._derived.get("labels")
+                if labels is None:
+                    labels = classifier.labels(self.hsv(), self.gray())
+                    self._derived["labels"] = labels
+                table = classifier.integral(labels, bit)
+                self._derived[key] = table
+            total += int(table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0])
+        return total
+
+    def features(self, name: str, rows: slice, cols: slice, compute: Callable[[np.ndarray], Any]) -> Any:
+        """
+        区域的特征点（按算法名称和区域缓存）
+
+        Args:
+            name: 算法名称（缓存键，如 "sift"）
+            rows, cols: 区域
+            compute: 由 BGR 区域计算结果的函数，如 lambda roi: sift.detectAndCompute(roi, None)
+        """
+        key = ("features", name, self._bounds(rows, cols))
+        if key not in self._derived:
+            self._derived[key] = compute(self.bgr(rows, cols))
+        return self._derived[key]
+
+    def subsample(self, step: int) -> "Frame":
+        """
+        按步长抽样的画面帧（只读取抽样到的像素，保留原始像素值，不做插值）
+
+        抽样帧第 k 行/列对应原帧第 k*step 行/列；step 为1时返回自身
+        """
+        if step <= 1:
+            return self
+        pixels = np.ascontiguousarray(self._pixels[::step, ::step])
+        return Frame(pixels, rgba=self._rgba, timestamp=self.timestamp)
+
+    def thumbnail(self, step: int = 8) -> np.ndarray:
+        """
+        按步长抽样的灰度缩略图
+
+        只读取抽样到的像素，用于廉价的画面变化判断。
+        """
+        sampled = np.ascontiguousarray(self._pixels[::step, ::step])
+        code = cv2.COLOR_RGBA2GRAY if self._rgba else cv2.COLOR_BGR2GRAY
+        return cv2.cvtColor(sampled, code)
+
+    def __getitem__(self, key) -> np.ndarray:
+        """支持 frame[y0:y1, x0:x1] 写法，返回 BGR 区域"""
+        if not isinstance(key, tuple):
+            key = (key,)
+        rows = key[0] if len(key) > 0 else slice(None)
+        cols = key[1] if len(key) > 1 else slice(None)
+        return self.bgr(rows, cols)
+
+
+def as_bgr(screen) -> np.ndarray:
+    """把 Frame 或 BGR 数组统一为完整的 BGR 数组"""
+    if isinstance(screen, Frame):
+        return screen.bgr()
+    return screen
@@ -0,0 +1,249 @@
+"""
+流式截图模块
+通过 screenrecord 持续输出 H.264 视频流，后台解码并只保留最新画面，
+主循环读取最新帧无需等待截图命令返回
+"""
+from __future__ import annotations
+
+import importlib.util
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple, BinaryIO
+
+from .lazy_import import lazy_module
+
+np = lazy_module("numpy")
+
+# PyAV，用于解码 H.264（可选依赖，启用流式截图时才真正导入）
+av = lazy_module("av") if importlib.util.find_spec("av") is not None else None
+
+from .adb_controller import CREATE_NO_WINDOW
+
+# --- 极速日志记录逻辑 ---
+def log_debug(msg):
+    try:
+        import os
+        from datetime import datetime
+        with open("error.log", "a", encoding="utf-8") as f:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{timestamp}] [PID:{os.getpid()}] [Stream] {msg}\n")
+    except:
+        pass
+
+
+class LatestFrameBuffer:
+    """最新帧环形缓冲区（线程安全），只保留最近的若干帧"""
+
+    def __init__(self, capacity: int = 2):
+        """
+        初始化缓冲区
+
+        Args:
+            capacity: 保留的帧数
+        """
+        self._frames = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._seq = 0
+
+    def put(self, frame: np.ndarray, timestamp: float):
+        """写入一帧"""
+        with self._lock:
+            self._seq += 1
+            self._frames.append((frame, timestamp, self._seq))
+            self._new_frame.notify_all()
+
+    def latest(self) -> Optional[Tuple[np.ndarray, float, int]]:
+        """
+        获取最新帧（不阻塞）
+
+        Returns:
+            (帧, 采集时间戳, 序号)，尚无帧时返回None
+        """
+        with self._lock:
+            return self._frames[-1] if self._frames else None
+
+    def wait_newer(self, seq: int, timeout: float) -> Optional[Tuple[np.ndarray, float, int]]:
+        """
+        等待序号大于 seq 的新帧
+
+        Args:
+            seq: 已处理的帧序号
+            timeout: 超时时间（秒）
+
+        Returns:
+            最新帧，超时返回None
+        """
+        with self._lock:
+            self._new_frame.wait_for(lambda: self._seq > seq, timeout=timeout)
+            if self._frames and self._frames[-1][2] > seq:
+                return self._frames[-1]
+            return None
+
+    @property
+    def seq(self) -> int:
+        """最新帧序号"""
+        return self._seq
+
+
+class ScreenRecordStream:
+    """
+    screenrecord 流式帧源
+
+    后台线程读取 `adb exec-out screenrecord --output-format=h264 -` 的输出并解码，
+    解码后的 BGR 帧写入 LatestFrameBuffer。screenrecord 单次最长录制 3 分钟，
+    流结束后自动重新启动。
+    也可以传入 H.264 文件代替 adb 输出，用于离线验证解码流程。
+    """
+
+    def __init__(
+        self,
+        adb_path: str = "adb",
+        device_id: str = "127.0.0.1:5555",
+        bit_rate: int = 8000000,
+        source_file: Optional[str] = None,
+        buffer_size: int = 2
+    ):
+        """
+        初始化流式帧源
+
+        Args:
+            adb_path: ADB可执行文件路径
+            device_id: 设备序列号
+            bit_rate: 录制码率（bit/s）
+            source_file: H.264 文件路径，指定后从文件读取而不是adb
+            buffer_size: 最新帧缓冲区容量
+        """
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self.bit_rate = bit_rate
+        self.source_file = source_file
+        self.buffer = LatestFrameBuffer(buffer_size)
+
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._process: Optional[subprocess.Popen] = None
+        self.error: Optional[str] = None
+        self._live = False  # 本次录屏已解码出画面且尚未结束
+        self.frames_decoded = 0
+        self.restarts = 0
+
+    @staticmethod
+    def is_available() -> bool:
+        """是否安装了 H.264 解码依赖 (PyAV)"""
+        return av is not None
+
+    def start(self):
+        """启动后台解码线程"""
+        if av is None:
+            raise RuntimeError("流式截图需要安装 PyAV: pip install av")
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止解码线程并结束 screenrecord 进程"""
+        self._running = False
+        self._close_process()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        """解码线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def is_live(self) -> bool:
+        """
+        录屏流是否正常输出：解码线程运行中，且本次录屏已解码出画面、尚未结束
+
+        screenrecord 只在画面变化时输出新帧，静止界面上的最新帧可能很旧但仍是当前画面；
+        录屏结束（超时重启、进程退出、解码失败）到重新解码出第一帧之前，最新帧不再可信
+        """
+        return self._live and self.is_running
+
+    def latest_frame(self) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        获取最新帧（不阻塞）
+
+        Returns:
+            (BGR帧, 采集时间戳)，尚无帧时返回None
+        """
+        item = self.buffer.latest()
+        if item is None:
+            return None
+        frame, timestamp, _ = item
+        return frame, timestamp
+
+    def _open_source(self) -> BinaryIO:
+        """打开 H.264 字节流（文件或 screenrecord 输出）"""
+        if self.source_file:
+            return open(self.source_file, "rb")
+        cmd = [
+            self.adb_path, "-s", self.device_id, "exec-out",
+            "screenrecord", "--output-format=h264",
+            f"--bit-rate={self.bit_rate}", "-"
+        ]
+        log_debug(f"启动录屏流: {' '.join(cmd)}")
+        self._process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            creationflags=CREATE_NO_WINDOW
+        )
+        return self._process.stdout
+
+    def _close_process(self):
+        """结束 screenrecord 进程"""
+        process = self._process
+        self._process = None
+        if process is not None:
+            try:
+                process.kill()
+                process.wait(timeout=2)
+            except Exception:
+                pass
+
+    def _decode(self, stream: BinaryIO):
+        """解码字节流中的所有帧，写入缓冲区"""
+        container = av.open(stream, format="h264", mode="r")
+        try:
+            for frame in container.decode(video=0):
+                if not self._running:
+                    break
+                bgr = frame.to_ndarray(format="bgr24")
+                self.buffer.put(bgr, time.time())
+                self.frames_decoded += 1
+                self._live = True
+        finally:
+            container.close()
+
+    def _run(self):
+        """后台线程：读取并解码，流结束后重启"""
+        while self._running:
+            stream = None
+            try:
+                stream = self._open_source()
+                self._decode(stream)
+            except Exception as e:
+                self.error = str(e)
+                log_debug(f"录屏流解码失败: {e}")
+            finally:
+                self._live = False
+                if stream is not None and self.source_file:
+                    stream.close()
+                self._close_process()
+
+            # 文件源读完即结束；adb 源超过录制时长后自动重启
+            if self.source_file or not self._running:
+                break
+            self.restarts += 1
+            time.sleep(0.5)
+        self._running = False
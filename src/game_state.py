@@ -0,0 +1,22 @@
+"""
+游戏状态定义
+独立于识别模块，主循环和调度逻辑无需导入 OpenCV 即可使用
+"""
+from enum import Enum, auto
+
+
+class GameState(Enum):
+    """游戏状态枚举"""
+    UNKNOWN = auto()           # 未知状态
+    LEVEL_PREPARE = auto()     # 关卡准备界面（图1）
+    CARD_SELECTION = auto()    # 卡牌选择界面（图2）
+    OBSTACLE_CONTINUE = auto() # 障碍物界面-继续按钮（图3）
+    OBSTACLE_CHOICE = auto()   # 障碍物界面-三选一（图4）
+    VICTORY = auto()           # 胜利界面（图5）
+    DEFEAT = auto()            # 失败界面
+    PURCHASE_FAILED = auto()   # 购买失败界面
+    PURCHASE = auto()          # 购买界面 (图7)
+    LEVEL_UP = auto()          # 升级界面 (图4)
+    LEVEL_UP_AFTER = auto()    # 升级后界面 (图8, 需关闭)
+    OBSTACLE_SPECIALBOX = auto() # 特殊障碍物宝箱界面
+    ARENA_OK = auto()            # 赛季结束奖励界面（竞技场OK按钮）
@@ -19,17 +19,18 @@ class GameAssistantGUI:
             automation: GameAutomation实例
         """
         self.automation = automation
-        self.automation.set_callbacks(
-            on_state_change=self._on_state_change,
-            on_log=self._on_log
-        )
         
-        # 创建主窗口
+        # 创建主窗口（先于注册回调：识别器可能在后台线程加载完成后立即输出日志）
         self.root = tk.Tk()
         self.root.title("黑曜石骑士游戏助手 V1")
         self.root.geometry("500x400")
         self.root.resizable(True, True)
         
+        self.automation.set_callbacks(
+            on_state_change=self._on_state_change,
+            on_log=self._on_log
+        )
+        
         # 设置图标（如果有的话）
         try:
             self.root.iconbitmap("icon.ico")
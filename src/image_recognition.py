@@ -7,39 +7,350 @@ import numpy as np
 from PIL import Image
 from typing import Optional, Tuple, List, Dict
 from pathlib import Path
-from enum import Enum, auto
 import time
 
+from .frame import Frame, as_bgr
+from .game_state import GameState
+from .startup_cache import startup_cache
+from .template_registry import TemplateRegistry
+from .card_index import CardTemplateIndex
+from .card_hash import CardHashIndex, card_art_region
 
-class GameState(Enum):
-    """游戏状态枚举"""
-    UNKNOWN = auto()           # 未知状态
-    LEVEL_PREPARE = auto()     # 关卡准备界面（图1）
-    CARD_SELECTION = auto()    # 卡牌选择界面（图2）
-    OBSTACLE_CONTINUE = auto() # 障碍物界面-继续按钮（图3）
-    OBSTACLE_CHOICE = auto()   # 障碍物界面-三选一（图4）
-    VICTORY = auto()           # 胜利界面（图5）
-    DEFEAT = auto()            # 失败界面
-    PURCHASE_FAILED = auto()   # 购买失败界面
-    PURCHASE = auto()          # 购买界面 (图7)
-    LEVEL_UP = auto()          # 升级界面 (图4)
-    LEVEL_UP_AFTER = auto()    # 升级后界面 (图8, 需关闭)
-    OBSTACLE_SPECIALBOX = auto() # 特殊障碍物宝箱界面
-    ARENA_OK = auto()            # 赛季结束奖励界面（竞技场OK按钮）
+
+# 金字塔匹配（find_template）：自动选择层数时，缩小后的模板短边不少于该值
+PYRAMID_MIN_SIDE = 24
+PYRAMID_MAX_LEVELS = 3
+# 原尺寸匹配位置数少于该值时不使用金字塔（搜索范围已经很小）
+PYRAMID_MIN_POSITIONS = 20000
+# 默认参数：levels 自动选择，原尺寸复核得分最高的3个候选；
+# 缩小画面上的得分低于 阈值 - slack 的候选直接放弃（缩小后的得分比原尺寸低不超过约0.05）
+PYRAMID_DEFAULTS = {"levels": "auto", "candidates": 3, "slack": 0.1}
+# 搜索窗口（find_template）：模板中心可能出现的范围向外扩展的像素数
+SEARCH_WINDOW_MARGIN = 40
+# 降分辨率识别时各 SIFT 检测允许的最大缩小倍数（参考截图实测）：
+# 特殊宝箱缩小一半后真实界面仍有 120+ 个匹配点（其他界面 <= 21，阈值30）；
+# 重投按钮缩小后卡牌界面只剩约20个匹配点（阈值30），保持原尺寸
+SIFT_MAX_SCALE = {"special_box": 2, "retry_banner": 1}
+# 赛季奖励 OK 按钮：只在右下角（行、列的起始比例）搜索，阈值必须 >= 0.85，
+# 否则卡牌界面的"重投"按钮(0.827)会误匹配
+BTN_OK_REGION = (0.6, 0.8)
+BTN_OK_THRESHOLD = 0.85
+
+
+class FrameChangeGate:
+    """
+    画面变化门限
+    
+    对抽样灰度缩略图计算与上一次完整识别时画面的平均绝对差，
+    差异低于阈值时认为画面未变化，可以直接沿用上一次的识别结果。
+    """
+    
+    def __init__(self, threshold: float = 1.5, step: int = 8, max_skips: int = 20):
+        """
+        初始化变化门限
+        
+        Args:
+            threshold: 平均绝对差阈值（灰度级，0-255），越小越敏感
+            step: 缩略图抽样步长（像素）
+            max_skips: 连续跳过的最大帧数，达到后强制完整识别一次
+        """
+        self.threshold = threshold
+        self.step = step
+        self.max_skips = max_skips
+        self._reference: Optional[np.ndarray] = None
+        self._consecutive_skips = 0
+        self.last_diff = 0.0
+    
+    def is_unchanged(self, frame: Frame) -> bool:
+        """画面是否与参考帧基本一致"""
+        thumb = frame.thumbnail(self.step)
+        reference = self._reference
+        if reference is None or reference.shape != thumb.shape or self._consecutive_skips >= self.max_skips:
+            self._accept(thumb)
+            return False
+        
+        self.last_diff = float(cv2.absdiff(thumb, reference).mean())
+        if self.last_diff < self.threshold:
+            self._consecutive_skips += 1
+            return True
+        
+        self._accept(thumb)
+        return False
+    
+    def _accept(self, thumb: np.ndarray):
+        """以当前缩略图作为新的参考帧"""
+        self._reference = thumb
+        self._consecutive_skips = 0
+    
+    def reset(self):
+        """清除参考帧"""
+        self._reference = None
+        self._consecutive_skips = 0
+
+
+def _subsampled_slice(index: slice, step: int) -> slice:
+    """原尺寸的行/列范围在按步长抽样的画面中的对应范围（抽样第 k 个像素为原 k*step）"""
+    if step <= 1:
+        return index
+    start = None if index.start is None else -(-index.start // step)
+    stop = None if index.stop is None else -(-index.stop // step)
+    return slice(start, stop)
+
+
+class CardDigitReader:
+    """
+    卡牌ID数字识别器
+
+    卡牌上方标签框中的ID是浅色数字：二值化后按轮廓切分出单个字符，
+    字符框内的灰度拉伸后居中放入固定尺寸的窗口（界面固定为1600x900，不做缩放），转换为零均值单位长度的向量，
+    与 templates/digits 中的数字样本做最近邻分类（相关系数，一次矩阵运算），
+    再按从左到右的顺序拼成ID。识别耗时与卡牌种类数量无关。
+
+    数字样本文件名以数字开头，如 7.png、7_a.png（同一数字可以有多个样本），
+    由 tools/extract_digits.py 从截图中提取。与最近的数字距离太远或区分不明显的字符不识别（返回None），
+    由调用方改用其他方式识别。
+    """
+
+    # ID标签所在的行（1600x900，所有卡牌相同）：上, 下
+    ID_ROW = (84, 116)
+    # 以卡牌点击位置为中心的水平搜索半宽（点击位置不一定在卡牌正中）
+    ID_HALF_WIDTH = 80
+    # 同一个ID中相邻字符的最大间距（像素）
+    GLYPH_MAX_GAP = 6
+    # 数字二值化阈值（灰度）
+    BINARY_THRESHOLD = 150
+    # 单个数字的高度范围（像素）
+    GLYPH_MIN_HEIGHT = 8
+    GLYPH_MAX_HEIGHT = 20
+    # 字符窗口尺寸（宽, 高）
+    GLYPH_SIZE = (12, 16)
+    # 与最近样本的距离（1 - 相关系数）超过该值时不识别
+    MAX_DISTANCE = 0.2
+    # 最近数字的距离与次近的另一个数字的距离之比超过该值时不识别：不同数字之间的距离最小只有约0.14，
+    # 只靠距离上限无法区分（用一张截图的样本识别另一张截图时，缺少对应样本的字符全部被拒绝，其余全部正确）
+    MAX_DISTANCE_RATIO = 0.6
+
+    def __init__(self, digits_dir: Path):
+        """
+        加载数字样本
+
+        Args:
+            digits_dir: 数字样本目录
+        """
+        self.digits_dir = Path(digits_dir)
+        samples, labels = [], []
+        for sample_file in sorted(self.digits_dir.glob("*.png")):
+            label = sample_file.stem[:1]
+            if not label.isdigit():
+                continue
+            glyph = cv2.imread(str(sample_file), cv2.IMREAD_GRAYSCALE)
+            if glyph is None:
+                continue
+            # 每个样本另加上下左右各平移1像素的版本，容忍切分位置的偏差
+            for shifted in self._shifted(glyph):
+                samples.append(self.normalize(shifted))
+                labels.append(label)
+
+        width, height = self.GLYPH_SIZE
+        self._samples = np.array(samples, dtype=np.float32).reshape(len(samples), width * height)
+        self._labels = np.array(labels)
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    @staticmethod
+    def _shifted(glyph: np.ndarray) -> List[np.ndarray]:
+        """原样本和上下左右各平移1像素（空出的部分补黑）的版本"""
+        height, width = glyph.shape[:2]
+        variants = [glyph]
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            matrix = np.float32([[1, 0, dx], [0, 1, dy]])
+            variants.append(cv2.warpAffine(glyph, matrix, (width, height), borderValue=0))
+        return variants
+
+    @property
+    def digits(self) -> List[str]:
+        """已有样本的数字"""
+        return sorted(set(self._labels.tolist()))
+
+    @classmethod
+    def id_region(cls, screen: np.ndarray, position: Tuple[int, int]) -> np.ndarray:
+        """截取卡牌的ID标签区域（点击位置位于区域水平中心）"""
+        x, _ = position
+        top, bottom = cls.ID_ROW
+        h, w = screen.shape[:2]
+        return screen[max(0, top):min(h, bottom), max(0, x - cls.ID_HALF_WIDTH):min(w, x + cls.ID_HALF_WIDTH)]
+
+    @classmethod
+    def tab_center(cls, screen: np.ndarray, position: Tuple[int, int]) -> int:
+        """
+        卡牌的水平中心（ID居中显示在标签框中，取数字组的中心）
+
+        点击位置不一定在卡牌正中；找不到数字时返回点击位置的 x
+        """
+        x, _ = position
+        region = cls.id_region(screen, position)
+        boxes = cls._glyph_boxes(region)
+        if not boxes:
+            return x
+        left = max(0, x - cls.ID_HALF_WIDTH)
+        return left + (boxes[0][0] + boxes[-1][0] + boxes[-1][2]) // 2
+
+    @classmethod
+    def segment(cls, region: np.ndarray) -> List[np.ndarray]:
+        """
+        按轮廓切分数字
+
+        Args:
+            region: ID区域（BGR或灰度）
+
+        Returns:
+            从左到右排列的字符窗口（GLYPH_SIZE 大小，见 _window）。
+            卡牌边框（宽大于高）和接触区域左右边缘的轮廓被忽略；
+            字符按间距分组，只保留最靠近区域中心的一组
+        """
+        if region.size == 0:
+            return []
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+        return [cls._window(gray, box) for box in cls._glyph_boxes(gray)]
+
+    @classmethod
+    def _glyph_boxes(cls, region: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """字符框 (x, y, w, h)，从左到右，只保留最靠近区域中心的一组"""
+        if region.size == 0:
+            return []
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+        _, binary = cv2.threshold(gray, cls.BINARY_THRESHOLD, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        boxes = []
+        for cnt in contours:
+            x, y, w, h = cv2.boundingRect(cnt)
+            if not cls.GLYPH_MIN_HEIGHT <= h <= cls.GLYPH_MAX_HEIGHT:
+                continue
+            if x == 0 or x + w >= binary.shape[1] or w > h:
+                continue
+            boxes.append((x, y, w, h))
+        if not boxes:
+            return []
+        boxes.sort()
+
+        groups = [[boxes[0]]]
+        for box in boxes[1:]:
+            prev = groups[-1][-1]
+            if box[0] - (prev[0] + prev[2]) <= cls.GLYPH_MAX_GAP:
+                groups[-1].append(box)
+            else:
+                groups.append([box])
+        center = binary.shape[1] / 2
+        return min(groups, key=lambda g: abs((g[0][0] + g[-1][0] + g[-1][2]) / 2 - center))
+
+
+    @classmethod
+    def _window(cls, gray: np.ndarray, box: Tuple[int, int, int, int]) -> np.ndarray:
+        """
+        字符窗口：字符框（外扩1像素）内的灰度按局部背景/笔画亮度拉伸到 0~255，
+        居中放入固定尺寸的黑色画布，去掉相邻字符、标签边框和亮度差异的影响
+        """
+        x, y, w, h = box
+        width, height = cls.GLYPH_SIZE
+        x0, y0 = max(0, x - 1), max(0, y - 1)
+        x1, y1 = min(gray.shape[1], x + w + 1), min(gray.shape[0], y + h + 1)
+        crop = gray[y0:y1, x0:x1].astype(np.float32)
+        low, high = np.percentile(crop, (10, 95))
+        crop = np.clip((crop - low) / max(high - low, 1.0) * 255, 0, 255)
+
+        window = np.zeros((height, width), dtype=np.uint8)
+        ch, cw = min(height, crop.shape[0]), min(width, crop.shape[1])
+        top, left = (height - ch) // 2, (width - cw) // 2
+        window[top:top + ch, left:left + cw] = crop[:ch, :cw]
+        return window
+
+    @classmethod
+    def normalize(cls, glyph: np.ndarray) -> np.ndarray:
+        """字符特征向量：轻微模糊（容忍1像素偏移）后减去均值并归一化为单位长度，两个向量的点积即相关系数"""
+        width, height = cls.GLYPH_SIZE
+        if glyph.shape[:2] != (height, width):
+            glyph = cv2.resize(glyph, (width, height), interpolation=cv2.INTER_AREA)
+        vector = cv2.GaussianBlur(glyph.astype(np.float32), (3, 3), 0).ravel()
+        vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def classify(self, glyphs: List[np.ndarray]) -> List[Tuple[Optional[str], float]]:
+        """
+        最近邻分类
+
+        Args:
+            glyphs: 字符窗口
+
+        Returns:
+            [(数字或None, 与最近样本的距离), ...]；距离超过 MAX_DISTANCE，
+            或与次近的另一个数字区分不明显（距离之比超过 MAX_DISTANCE_RATIO）时为None
+        """
+        if not glyphs or not len(self._labels):
+            return [(None, 1.0)] * len(glyphs)
+        queries = np.stack([self.normalize(g) for g in glyphs])
+        # 所有字符与所有样本的距离（1 - 相关系数），一次矩阵乘法
+        distances = 1.0 - queries @ self._samples.T
+        # 每个数字取其样本中的最近距离
+        digits = self.digits
+        per_digit = np.stack([distances[:, self._labels == d].min(axis=1) for d in digits], axis=1)
+        order = per_digit.argsort(axis=1)
+        results = []
+        for row, ranked in zip(per_digit, order):
+            best = float(row[ranked[0]])
+            second = float(row[ranked[1]]) if len(ranked) > 1 else 1.0
+            accepted = best <= self.MAX_DISTANCE and best <= self.MAX_DISTANCE_RATIO * second
+            results.append((digits[ranked[0]] if accepted else None, best))
+        return results
+
+    def read(self, region: np.ndarray) -> Optional[str]:
+        """
+        识别一个ID区域
+
+        Returns:
+            卡牌ID（字符串），没有数字或任一字符无法识别时返回None
+        """
+        glyphs = self.segment(region)
+        if not glyphs:
+            return None
+        digits = self.classify(glyphs)
+        if any(digit is None for digit, _ in digits):
+            return None
+        return "".join(digit for digit, _ in digits)
 
 
 class ImageRecognizer:
     """图像识别器"""
     
-    def __init__(self, templates_dir: str = "templates"):
+    def __init__(self, templates_dir: str = "templates", template_budget_mb: float = 32):
         """
         初始化图像识别器
         
         Args:
             templates_dir: 模板图片目录
+            template_budget_mb: 已解码模板的内存预算（MB），超出时按LRU淘汰
         """
         self.templates_dir = Path(templates_dir)
-        self.templates: Dict[str, np.ndarray] = {}
+        self.template_budget_mb = template_budget_mb
+        self.templates: Optional[TemplateRegistry] = None
+        self.card_index: Optional[CardTemplateIndex] = None  # 卡牌ID模板索引（首次识别卡牌时创建）
+        self.digit_reader: Optional[CardDigitReader] = None  # 卡牌ID数字识别器（首次识别卡牌时创建）
+        self.card_hashes: Optional[CardHashIndex] = None  # 卡牌图案哈希索引（首次识别卡牌时加载）
+        self.load_timings: Dict[str, float] = {}  # 初始化各步骤耗时（毫秒）
+        self.pyramid_profiles: Dict[str, dict] = {}  # 各模板的金字塔匹配参数（见 configure_pyramid）
+        # 各模板的搜索窗口 {模板名称: {"shape": [画面高, 宽], "box": [x0, y0, x1, y1], "learned": bool}}，
+        # box 为模板中心出现过/声明的范围；学习到的窗口保存在启动缓存中
+        self.search_windows: Dict[str, dict] = {
+            name: {"shape": list(window["shape"]), "box": list(window["box"]), "learned": True}
+            for name, window in startup_cache.get("search_windows", {}).items()
+        }
+        self.window_stats = {"window_hits": 0, "fallbacks": 0}
+        # 颜色像素数是否用整帧颜色类别标记图 + 积分图统计（False 时逐区域 inRange，区域少时更快）
+        self.color_class_map = False
+        # 降分辨率识别：颜色像素数在按此步长抽样的画面上统计（1=原尺寸），SIFT 检测按 SIFT_MAX_SCALE 缩小
+        self.detection_scale = 1
         
         # 初始化 SIFT 算法及特殊特征缓存
         self.sift = cv2.SIFT_create()
@@ -48,35 +359,81 @@ class ImageRecognizer:
         self._retry_banner_kp = None
         self._retry_banner_des = None
         
+        # 画面变化门限（默认关闭）
+        self.change_gate: Optional[FrameChangeGate] = None
+        self._gated_state: Optional[GameState] = None
+        self.gate_stats = {"skipped": 0, "detected": 0}
+        self.last_unchanged = False  # 上一次 detect_state 是否因画面未变化而跳过识别
+        
+        started = time.perf_counter()
         self._load_templates()
+        loaded = time.perf_counter()
         self._prepare_special_features()
+        self.load_timings = {
+            "templates_ms": (loaded - started) * 1000,
+            "features_ms": (time.perf_counter() - loaded) * 1000,
+        }
+    
+    def enable_change_gate(self, threshold: float = 1.5, max_skips: int = 20):
+        """
+        启用画面变化门限，画面未变化时 detect_state 直接返回上一次结果
+        
+        Args:
+            threshold: 平均绝对差阈值（灰度级），0 表示关闭
+            max_skips: 连续跳过的最大帧数
+        """
+        if threshold <= 0:
+            self.change_gate = None
+        else:
+            self.change_gate = FrameChangeGate(threshold=threshold, max_skips=max_skips)
+        self._gated_state = None
     
     def _load_templates(self):
-        """递归加载模板图片"""
+        """登记模板（递归扫描，包括子目录，如ui/），像素数据在第一次使用时加载"""
         if not self.templates_dir.exists():
             print(f"警告: 模板目录不存在: {self.templates_dir}")
-            return
         
-        # 递归加载所有PNG模板（包括子目录，如ui/）
-        for template_file in self.templates_dir.rglob("*.png"):
-            name = template_file.stem
-            img = cv2.imread(str(template_file), cv2.IMREAD_COLOR)
-            if img is not None:
-                self.templates[name] = img
-                print(f"已加载模板: {name} (路径: {template_file.relative_to(self.templates_dir)})")
+        self.templates = TemplateRegistry(self.templates_dir, budget_mb=self.template_budget_mb)
+        print(f"已登记模板: {len(self.templates)} 个 (按需加载)")
     
     def _prepare_special_features(self):
         """预计算特殊 UI 元素的特征点，提高识别鲁棒性"""
         if "btn_specialbox_circle" in self.templates:
-            tpl = self.templates["btn_specialbox_circle"]
             # 预先提取特征点和描述符
-            self._special_box_kp, self._special_box_des = self.sift.detectAndCompute(tpl, None)
-            print(f"✅ 已预计算特殊宝箱特征点: {len(self._special_box_kp) if self._special_box_kp else 0} 个")
+            self._special_box_kp, self._special_box_des = self._template_features("btn_specialbox_circle")
+            print(f"✅ 已预计算特殊宝箱特征点: {len(self._special_box_des) if self._special_box_des is not None else 0} 个")
             
         if "btn_retry_banner" in self.templates:
-            tpl = self.templates["btn_retry_banner"]
-            self._retry_banner_kp, self._retry_banner_des = self.sift.detectAndCompute(tpl, None)
-            print(f"✅ 已预计算重投按钮特征点: {len(self._retry_banner_kp) if self._retry_banner_kp else 0} 个")
+            self._retry_banner_kp, self._retry_banner_des = self._template_features("btn_retry_banner")
+            print(f"✅ 已预计算重投按钮特征点: {len(self._retry_banner_des) if self._retry_banner_des is not None else 0} 个")
+    
+    def _template_features(self, name: str):
+        """
+        计算模板的 SIFT 特征点和描述符
+        
+        描述符按模板文件指纹和 OpenCV 版本缓存在 cache/ 下，模板未变化时直接读取
+        （此时特征点为None，识别只用到描述符）。
+        """
+        fingerprint = self.templates.info(name).fingerprint
+        key = f"sift:{name}"
+        cached = startup_cache.get(key)
+        if fingerprint is not None and cached and cached.get("fingerprint") == fingerprint + [cv2.__version__]:
+            try:
+                return None, np.load(startup_cache.file_path(cached["file"]))
+            except (OSError, ValueError):
+                pass
+        
+        # SIFT 内部只使用灰度图，直接以灰度形式加载模板
+        kp, des = self.sift.detectAndCompute(self.templates.get(name, gray=True), None)
+        self.templates.unload(name)  # 只在预计算时需要模板像素
+        if des is not None and fingerprint is not None:
+            filename = f"sift_{name}.npy"
+            try:
+                np.save(startup_cache.file_path(filename), des)
+                startup_cache.set(key, {"fingerprint": fingerprint + [cv2.__version__], "file": filename})
+            except OSError:
+                pass
+        return kp, des
     
     def pil_to_cv2(self, pil_image: Image.Image) -> np.ndarray:
         """PIL图像转OpenCV格式"""
@@ -107,20 +464,240 @@ class ImageRecognizer:
             return None
         
         template = self.templates[template_name]
+        screen = as_bgr(screen)
+        h, w = template.shape[:2]
         
-        # 模板匹配
-        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        # 先只在搜索窗口内匹配，未找到再整屏搜索
+        window = self._search_window_bounds(template_name, screen.shape, w, h)
+        if window is not None:
+            x0, y0, x1, y1 = window
+            result = cv2.matchTemplate(screen[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if max_val >= threshold:
+                self.window_stats["window_hits"] += 1
+                return (x0 + max_loc[0] + w // 2, y0 + max_loc[1] + h // 2, max_val)
+            self.window_stats["fallbacks"] += 1
+        
+        levels, candidates, slack = self._pyramid_profile(template_name, template, screen)
+        if levels:
+            # 由粗到精：缩小的画面上找候选位置，原尺寸只匹配候选附近
+            max_val, max_loc = self._pyramid_match(
+                screen, template_name, template, levels, candidates, threshold - slack
+            )
+        else:
+            # 模板匹配
+            result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
         
-        if max_val >= threshold:
+        if max_loc is not None and max_val >= threshold:
             # 返回模板中心位置
-            h, w = template.shape[:2]
             center_x = max_loc[0] + w // 2
             center_y = max_loc[1] + h // 2
+            self._learn_search_window(template_name, screen.shape, center_x, center_y)
             return (center_x, center_y, max_val)
         
         return None
     
+    def confirm_template(
+        self,
+        screen: np.ndarray,
+        template_name: str,
+        center: Tuple[int, int],
+        threshold: float = 0.8,
+        slack: int = 2
+    ) -> Optional[Tuple[int, int, float]]:
+        """
+        确认模板仍在已知位置（只比较该位置附近的一小块画面，不做搜索）
+        
+        Args:
+            screen: 屏幕截图（OpenCV格式）
+            template_name: 模板名称
+            center: 上次匹配到的模板中心
+            threshold: 匹配阈值
+            slack: 允许的位置偏移（像素）
+            
+        Returns:
+            (x, y, confidence) 确认后的中心位置和置信度，不一致返回None
+        """
+        if template_name not in self.templates:
+            return None
+        
+        template = self.templates[template_name]
+        screen = as_bgr(screen)
+        h, w = template.shape[:2]
+        sh, sw = screen.shape[:2]
+        x0 = center[0] - w // 2 - slack
+        y0 = center[1] - h // 2 - slack
+        if x0 < 0 or y0 < 0 or x0 + w + 2 * slack > sw or y0 + h + 2 * slack > sh:
+            return None
+        
+        patch = screen[y0:y0 + h + 2 * slack, x0:x0 + w + 2 * slack]
+        result = cv2.matchTemplate(patch, template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val < threshold:
+            return None
+        return (x0 + max_loc[0] + w // 2, y0 + max_loc[1] + h // 2, max_val)
+    
+    def declare_search_window(
+        self,
+        template_name: str,
+        center: Tuple[int, int],
+        screen_size: Tuple[int, int] = (1600, 900)
+    ):
+        """
+        声明模板的搜索窗口（如配置文件中的按钮坐标）
+        
+        Args:
+            template_name: 模板名称
+            center: 模板中心的预期位置
+            screen_size: 坐标对应的画面尺寸（宽, 高），只对同尺寸的画面生效
+        """
+        x, y = int(center[0]), int(center[1])
+        window = self.search_windows.get(template_name)
+        shape = [screen_size[1], screen_size[0]]
+        if window is not None and window["shape"] == shape:
+            # 已学习到的范围保留，并包含声明的位置
+            self._extend_window(window, x, y)
+        else:
+            self.search_windows[template_name] = {"shape": shape, "box": [x, y, x, y], "learned": False}
+    
+    def _search_window_bounds(
+        self,
+        template_name: str,
+        screen_shape: Tuple[int, ...],
+        width: int,
+        height: int
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """搜索窗口在画面中的范围 (x0, y0, x1, y1)，没有窗口或画面尺寸不符时返回None"""
+        window = self.search_windows.get(template_name)
+        if window is None or list(screen_shape[:2]) != window["shape"]:
+            return None
+        sh, sw = screen_shape[:2]
+        cx0, cy0, cx1, cy1 = window["box"]
+        x0 = max(0, cx0 - width // 2 - SEARCH_WINDOW_MARGIN)
+        y0 = max(0, cy0 - height // 2 - SEARCH_WINDOW_MARGIN)
+        x1 = min(sw, cx1 - width // 2 + width + SEARCH_WINDOW_MARGIN)
+        y1 = min(sh, cy1 - height // 2 + height + SEARCH_WINDOW_MARGIN)
+        if x1 - x0 < width or y1 - y0 < height:
+            return None
+        # 窗口接近整屏时没有意义
+        if (x1 - x0) * (y1 - y0) > sw * sh // 2:
+            return None
+        return x0, y0, x1, y1
+    
+    @staticmethod
+    def _extend_window(window: dict, x: int, y: int) -> bool:
+        """把中心位置并入窗口范围，返回范围是否变化"""
+        x0, y0, x1, y1 = window["box"]
+        box = [min(x0, x), min(y0, y), max(x1, x), max(y1, y)]
+        if box == window["box"]:
+            return False
+        window["box"] = box
+        return True
+    
+    def _learn_search_window(self, template_name: str, screen_shape: Tuple[int, ...], x: int, y: int):
+        """整屏搜索命中后记录位置，下次先在该位置附近搜索"""
+        x, y = int(x), int(y)
+        shape = list(screen_shape[:2])
+        window = self.search_windows.get(template_name)
+        if window is None or window["shape"] != shape:
+            self.search_windows[template_name] = {"shape": shape, "box": [x, y, x, y], "learned": True}
+        elif not self._extend_window(window, x, y):
+            return
+        else:
+            window["learned"] = True
+        learned = {
+            name: {"shape": list(win["shape"]), "box": list(win["box"])}
+            for name, win in self.search_windows.items() if win.get("learned")
+        }
+        startup_cache.set("search_windows", learned)
+    
+    def configure_pyramid(self, profiles: Dict[str, dict]):
+        """
+        设置各模板的金字塔匹配参数
+        
+        Args:
+            profiles: {模板名称: {"levels": 层数, "candidates": 候选数, "slack": 粗筛放宽量}}，
+                      "*" 为默认值；levels 为 0 表示原尺寸匹配，为 "auto" 或缺省时按模板尺寸自动选择；
+                      candidates 越多、slack 越大越准确，但越慢
+        """
+        self.pyramid_profiles = {name: dict(profile) for name, profile in (profiles or {}).items()}
+    
+    def _pyramid_profile(
+        self,
+        template_name: str,
+        template: np.ndarray,
+        screen: np.ndarray
+    ) -> Tuple[int, int, float]:
+        """(金字塔层数, 候选数, 粗筛放宽量)；层数为 0 表示原尺寸匹配"""
+        profile = {**PYRAMID_DEFAULTS, **self.pyramid_profiles.get("*", {}), **self.pyramid_profiles.get(template_name, {})}
+        levels = profile["levels"]
+        th, tw = template.shape[:2]
+        sh, sw = screen.shape[:2]
+        if th > sh or tw > sw:
+            return 0, 0, 0.0
+        if levels in (None, "auto"):
+            # 搜索范围很小时原尺寸匹配已经足够快
+            if (sh - th + 1) * (sw - tw + 1) < PYRAMID_MIN_POSITIONS:
+                return 0, 0, 0.0
+            levels = 0
+            while levels < PYRAMID_MAX_LEVELS and min(th, tw) >> (levels + 1) >= PYRAMID_MIN_SIDE:
+                levels += 1
+        return int(levels), max(1, int(profile["candidates"])), float(profile["slack"])
+    
+    def _pyramid_match(
+        self,
+        screen: np.ndarray,
+        template_name: str,
+        template: np.ndarray,
+        levels: int,
+        candidates: int,
+        min_coarse: float = -1.0
+    ) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """
+        由粗到精的模板匹配
+        
+        在缩小 2^levels 倍的画面上匹配缩小的模板（模板各层在第一次使用时生成并缓存），
+        取得分最高的几个位置，再在原尺寸画面上只匹配这些位置附近的小窗口。
+        缩小画面上得分低于 min_coarse 的候选不再复核。
+        
+        Returns:
+            (最高得分, 左上角位置)，与原尺寸整屏匹配的 minMaxLoc 结果对应；没有候选时位置为None
+        """
+        coarse_template = self.templates.get(template_name, level=levels)
+        coarse_screen = screen
+        for _ in range(levels):
+            coarse_screen = cv2.pyrDown(coarse_screen)
+        ch, cw = coarse_template.shape[:2]
+        if ch > coarse_screen.shape[0] or cw > coarse_screen.shape[1]:
+            _, max_val, _, max_loc = cv2.minMaxLoc(cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED))
+            return max_val, max_loc
+        
+        coarse = cv2.matchTemplate(coarse_screen, coarse_template, cv2.TM_CCOEFF_NORMED)
+        coarse[~np.isfinite(coarse)] = -1.0
+        
+        scale = 1 << levels
+        margin = 2 * scale  # 覆盖缩小时的取整误差
+        th, tw = template.shape[:2]
+        sh, sw = screen.shape[:2]
+        suppress_y, suppress_x = max(1, ch // 2), max(1, cw // 2)
+        best_val, best_loc = -1.0, None
+        for _ in range(candidates):
+            _, coarse_val, _, (cx, cy) = cv2.minMaxLoc(coarse)
+            if coarse_val <= -1.0 or coarse_val < min_coarse:
+                break
+            # 候选位置附近的原尺寸窗口
+            x0, y0 = max(0, cx * scale - margin), max(0, cy * scale - margin)
+            x1, y1 = min(sw, cx * scale + margin + tw), min(sh, cy * scale + margin + th)
+            if x1 - x0 >= tw and y1 - y0 >= th:
+                result = cv2.matchTemplate(screen[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+                _, val, _, loc = cv2.minMaxLoc(result)
+                if val > best_val:
+                    best_val, best_loc = val, (x0 + loc[0], y0 + loc[1])
+            # 去掉该候选附近，取下一个候选
+            coarse[max(0, cy - suppress_y):cy + suppress_y + 1, max(0, cx - suppress_x):cx + suppress_x + 1] = -1.0
+        return best_val, best_loc
+    
     def find_all_templates(
         self,
         screen: np.ndarray,
@@ -143,150 +720,172 @@ class ImageRecognizer:
         
         template = self.templates[template_name]
         h, w = template.shape[:2]
+        screen = as_bgr(screen)
         
         result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
-        locations = np.where(result >= threshold)
-        
-        matches = []
-        for pt in zip(*locations[::-1]):  # 转换为(x, y)格式
-            center_x = pt[0] + w // 2
-            center_y = pt[1] + h // 2
-            confidence = result[pt[1], pt[0]]
-            matches.append((center_x, center_y, confidence))
+        ys, xs = np.nonzero(result >= threshold)  # 按行优先顺序，与逐点遍历一致
+        scores = result[ys, xs]
         
-        # 去除重叠的匹配（NMS）
-        return self._non_max_suppression(matches, w, h)
+        # 去除重叠的匹配（NMS），坐标转换为模板中心
+        return self._non_max_suppression(xs + w // 2, ys + h // 2, scores, w, h)
     
     def _non_max_suppression(
         self,
-        matches: List[Tuple[int, int, float]],
+        xs: np.ndarray,
+        ys: np.ndarray,
+        scores: np.ndarray,
         width: int,
         height: int
     ) -> List[Tuple[int, int, float]]:
-        """非极大值抑制，去除重叠匹配"""
-        if not matches:
+        """
+        非极大值抑制，去除重叠匹配
+        
+        按置信度从高到低（同分保持原顺序）依次保留，与已保留结果的中心距离
+        在水平/垂直方向都小于模板宽/高一半的匹配被去除。候选按网格分桶，
+        每保留一个结果只检查它周围的格子，不再两两比较。
+        """
+        if not len(scores):
             return []
         
-        # 按置信度排序
-        matches = sorted(matches, key=lambda x: x[2], reverse=True)
+        # 按置信度排序（稳定排序，同分保持原顺序）
+        order = np.argsort(-scores, kind="stable")
+        xs, ys, scores = xs[order], ys[order], scores[order]
+        
+        # 候选按 (宽/2, 高/2) 的网格分桶：与某个结果重叠的候选只可能在它周围 3x3 个格子里
+        cell_w, cell_h = max(1, -(-width // 2)), max(1, -(-height // 2))
+        cols, rows = xs // cell_w, ys // cell_h
+        n_rows = int(rows.max()) + 3
+        cell_ids = (cols + 1) * n_rows + (rows + 1)
+        by_cell = np.argsort(cell_ids, kind="stable")
+        sorted_cells = cell_ids[by_cell]
         
+        alive = np.ones(len(scores), dtype=bool)
         result = []
-        for match in matches:
-            x, y, conf = match
-            # 检查是否与已有结果重叠
-            overlap = False
-            for rx, ry, _ in result:
-                if abs(x - rx) < width * 0.5 and abs(y - ry) < height * 0.5:
-                    overlap = True
-                    break
-            
-            if not overlap:
-                result.append(match)
+        i = 0
+        while True:
+            # 剩余候选中置信度最高的一个
+            offset = int(alive[i:].argmax())
+            i += offset
+            if not alive[i]:
+                break
+            x, y = xs[i], ys[i]
+            result.append((x, y, scores[i]))
+            # 去除周围格子中与它重叠的候选（包括它自己）
+            center = cell_ids[i]
+            for column in (center - n_rows, center, center + n_rows):
+                lo, hi = np.searchsorted(sorted_cells, (column - 1, column + 2))
+                near = by_cell[lo:hi]
+                overlap = near[(np.abs(xs[near] - x) < width * 0.5) & (np.abs(ys[near] - y) < height * 0.5)]
+                alive[overlap] = False
         
         return result
     
-    def detect_state(self, screen: np.ndarray) -> GameState:
+    def detect_state(self, screen) -> GameState:
         """
         检测当前游戏状态
         
+        启用画面变化门限时，画面与上次完整识别时基本一致则跳过识别，沿用上次结果。
+        
         Args:
-            screen: 屏幕截图（OpenCV格式）
+            screen: 屏幕截图（OpenCV格式或 Frame）
             
         Returns:
             当前游戏状态
         """
-        h_img, w_img = screen.shape[:2]
+        frame = screen if isinstance(screen, Frame) else Frame.from_bgr(screen)
+        
+        gate = self.change_gate
+        self.last_unchanged = False
+        if gate is None:
+            return self._detect_state(frame)
+        
+        if self._gated_state is not None and gate.is_unchanged(frame):
+            self.gate_stats["skipped"] += 1
+            self.last_unchanged = True
+            return self._gated_state
+        
+        if self._gated_state is None:
+            # 首帧：建立参考帧
+            gate.reset()
+            gate.is_unchanged(frame)
+        self.gate_stats["detected"] += 1
+        self._gated_state = self._detect_state(frame)
+        return self._gated_state
+    
+    def _detect_state(self, frame: Frame) -> GameState:
+        """完整的状态识别流程"""
+        h_img, w_img = frame.shape[:2]
         
         # 标准化截图到 1600x900（所有硬编码坐标和模板均基于此分辨率）
         # 若截图来自不同分辨率的模拟器，自动缩放以确保识别逻辑兼容
         STANDARD_W, STANDARD_H = 1600, 900
         if w_img != STANDARD_W or h_img != STANDARD_H:
-            screen = cv2.resize(screen, (STANDARD_W, STANDARD_H))
+            frame = Frame.from_bgr(cv2.resize(frame.bgr(), (STANDARD_W, STANDARD_H)))
             h_img, w_img = STANDARD_H, STANDARD_W
         
-        hsv = cv2.cvtColor(screen, cv2.COLOR_BGR2HSV)
+        # 各检测只转换自己读取的区域（HSV/灰度按区域惰性计算并缓存）；
+        # 颜色像素数按命名的颜色类别统计（color_classes），启用 color_class_map 时用整帧标记图 + 积分图
         h, w = h_img, w_img
+        
+        # 降分辨率识别：在抽样画面上统计，像素数乘以 scale² 换算回原尺寸，阈值保持不变
+        scale = max(1, int(self.detection_scale))
+        counts_frame = frame.subsample(scale)
+        
+        def count(name: str, rows: slice, cols: slice) -> int:
+            rows, cols = _subsampled_slice(rows, scale), _subsampled_slice(cols, scale)
+            return counts_frame.count_class(name, rows, cols, integral=self.color_class_map) * scale * scale
 
         # ===== 0. 预先计算通用全局特征 (用于各状态判定和互斥校验) =====
         
         # 底部橙色像素
-        orange_mask_full = cv2.inRange(hsv, np.array([10, 150, 150]), np.array([25, 255, 255]))
-        bottom_region_orange = orange_mask_full[int(h*0.7):, :]
-        bottom_orange_pixels = cv2.countNonZero(bottom_region_orange)
+        bottom_orange_pixels = count("orange", slice(int(h*0.7), None), slice(None))
 
         # 卡牌描述区域的米色背景 (关键特征：识别卡牌界面)
-        description_region = hsv[int(h*0.5):int(h*0.75), int(w*0.1):int(w*0.9)]
-        beige_mask = cv2.inRange(description_region, np.array([15, 5, 180]), np.array([35, 80, 255]))
-        beige_pixels = cv2.countNonZero(beige_mask)
+        beige_pixels = count("beige", slice(int(h*0.5), int(h*0.75)), slice(int(w*0.1), int(w*0.9)))
         
         # 左下角属性面板 (暗色背景)
-        bottom_left_panel = screen[int(h*0.5):, :int(w*0.25)]
-        bl_hsv = cv2.cvtColor(bottom_left_panel, cv2.COLOR_BGR2HSV)
-        dark_mask = cv2.inRange(bl_hsv, np.array([0, 0, 0]), np.array([180, 255, 80]))
-        dark_pixels = cv2.countNonZero(dark_mask)
+        dark_pixels = count("dark", slice(int(h*0.5), None), slice(None, int(w*0.25)))
 
         # 顶部 UI 区域的金色与银色 (游戏主界面的核心特征)
-        top_region_hsv = hsv[int(h*0.05):int(h*0.35), int(w*0.3):int(w*0.7)]
-        gold_mask = cv2.inRange(top_region_hsv, np.array([15, 80, 80]), np.array([40, 255, 255]))
-        gold_pixels = cv2.countNonZero(gold_mask)
-        silver_mask = cv2.inRange(top_region_hsv, np.array([0, 0, 150]), np.array([180, 50, 255]))
-        silver_pixels = cv2.countNonZero(silver_mask)
+        top_rows, top_cols = slice(int(h*0.05), int(h*0.35)), slice(int(w*0.3), int(w*0.7))
+        gold_pixels = count("gold", top_rows, top_cols)
+        silver_pixels = count("silver", top_rows, top_cols)
 
         # ===== 1. 特别检测：特殊障碍物宝箱界面 (SIFT 特征匹配法 - 终极方案) =====
         # 该界面背景多变（大漠、森林等），光影动画复杂，且局部可能被干扰。
         # SIFT 具有尺度、旋转和光照不变性，是解决此类问题的最有效手段。
         if self._special_box_des is not None:
             # 限制区域在中心 [250:650, 600:1000]，减少计算并排除边角干扰
-            roi = screen[250:650, 600:1000]
-            kp_scene, des_scene = self.sift.detectAndCompute(roi, None)
+            good_matches = self._count_good_matches(
+                frame, self._special_box_des, slice(250, 650), slice(600, 1000), self._sift_scale("special_box")
+            )
             
-            if des_scene is not None:
-                # 使用 FLANN 或 BF 匹配
-                bf = cv2.BFMatcher()
-                matches = bf.knnMatch(self._special_box_des, des_scene, k=2)
-                
-                # Lowe's Ratio Test 过滤噪声 (核心步骤)
-                good_matches = []
-                for match_pair in matches:
-                    if len(match_pair) == 2:
-                        m, n = match_pair
-                        if m.distance < 0.7 * n.distance:
-                            good_matches.append(m)
-                
-                # 统计有效匹配点数量
-                # 根据测试：空界面或战斗干扰 < 10 个，真实宝箱界面 > 100 个
-                # 设置阈值 30 是极度安全且稳健的
-                if len(good_matches) >= 30:
-                    # 只有在初次检测到时才打印详细日志，避免刷屏
-                    return GameState.OBSTACLE_SPECIALBOX
+            # 统计有效匹配点数量
+            # 根据测试：空界面或战斗干扰 < 10 个，真实宝箱界面 > 100 个
+            # 设置阈值 30 是极度安全且稳健的
+            if good_matches >= 30:
+                # 只有在初次检测到时才打印详细日志，避免刷屏
+                return GameState.OBSTACLE_SPECIALBOX
 
         # ===== 2. 检测购买失败界面（阻塞性弹窗） =====
-        # 注意：购买失败弹窗会遮挡住背景，导致顶部 UI 的金色特征消失或大幅减弱。
-        # 如果检测到大量金色/银色像素，优先排除弹窗状态。
-        if gold_pixels < 5000:
-            center_text_region = screen[int(h*0.35):int(h*0.55), int(w*0.3):int(w*0.7)]
-            center_gray = cv2.cvtColor(center_text_region, cv2.COLOR_BGR2GRAY)
-            white_text_pixels = cv2.countNonZero((center_gray > 200).astype(np.uint8))
-            dark_bg_pixels = cv2.countNonZero((center_gray < 80).astype(np.uint8))
-            
-            button_check_region = hsv[int(h*0.55):int(h*0.75), int(w*0.35):int(w*0.65)]
-            orange_mask = cv2.inRange(button_check_region, np.array([10, 150, 150]), np.array([25, 255, 255]))
-            button_orange_pixels = cv2.countNonZero(orange_mask)
+        # 特征：中央深色弹窗内有白色文字，下方有橙色"确定"按钮。
+        # 注意：弹窗的木质边框本身落在金色范围内（参考截图顶部金色约 2.5 万像素），不能用金色排除。
+        center_rows, center_cols = slice(int(h*0.35), int(h*0.55)), slice(int(w*0.3), int(w*0.7))
+        white_text_pixels = count("white_text", center_rows, center_cols)
+        dark_bg_pixels = count("shadow", center_rows, center_cols)
+        
+        button_orange_pixels = count("orange", slice(int(h*0.55), int(h*0.75)), slice(int(w*0.35), int(w*0.65)))
+        
+        # 初步像素特征判断
+        if white_text_pixels > 2000 and dark_bg_pixels > 20000 and button_orange_pixels > 5000:
+            pf_x, pf_y = 800, 640
+            pf_density = count("orange_soft", slice(pf_y-30, pf_y+30), slice(pf_x-100, pf_x+100)) / (60 * 200)
             
-            # 初步像素特征判断
-            if white_text_pixels > 2000 and dark_bg_pixels > 20000 and button_orange_pixels > 5000:
-                pf_x, pf_y = 800, 640
-                pf_rect = hsv[pf_y-30:pf_y+30, pf_x-100:pf_x+100]
-                pf_orange_mask = cv2.inRange(pf_rect, np.array([10, 120, 120]), np.array([25, 255, 255]))
-                pf_density = cv2.countNonZero(pf_orange_mask) / (pf_rect.size/3)
-                
-                if 0.5 < pf_density < 0.9:
-                    # 像素特征符合，使用模板匹配进行二次确认（提高鲁棒性）
-                    if self.find_template(screen, "purchase_failed", threshold=0.6):
-                        return GameState.PURCHASE_FAILED
-                    else:
-                        # 如果没有找到模板，但在调试日志中看到频繁触发，可能需要记录
-                        pass
+            if 0.5 < pf_density < 0.9:
+                # 像素特征符合，在弹窗标题区域匹配"购买失败"标题进行二次确认
+                title_roi = frame.bgr(slice(int(h*0.25), int(h*0.5)), slice(int(w*0.3), int(w*0.7)))
+                if self.find_template(title_roi, "purchase_failed_title", threshold=0.6):
+                    return GameState.PURCHASE_FAILED
 
         # 0. 检测卡牌选择界面 (特征：SIFT 匹配右下角“重投”按钮 OR 大量米色描述背景)
 
@@ -297,27 +896,21 @@ class ImageRecognizer:
         # 注意：阈值必须 >= 0.85，否则卡牌界面的"重投"按钮(0.827)会误匹配。
         if "btn_ok" in self.templates and beige_pixels < 50000:
             # 只在右下角区域搜索 OK 按钮，减少误判风险
-            ok_roi = screen[int(h*0.6):, int(w*0.8):]
-            ok_match = self.find_template(ok_roi, "btn_ok", threshold=0.85)
+            ok_roi = frame.bgr(slice(int(h*BTN_OK_REGION[0]), None), slice(int(w*BTN_OK_REGION[1]), None))
+            ok_match = self.find_template(ok_roi, "btn_ok", threshold=BTN_OK_THRESHOLD)
             if ok_match:
                 # 排斥条件：如果右下角有"重投"按钮 SIFT 特征，说明是卡牌界面
                 is_card_screen = False
                 if self._retry_banner_des is not None:
-                    retry_roi = screen[700:, 1100:]
-                    if retry_roi.size > 0 and retry_roi.shape[0] >= 10 and retry_roi.shape[1] >= 10:
-                        kp_r, des_r = self.sift.detectAndCompute(retry_roi, None)
-                        if des_r is not None:
-                            bf = cv2.BFMatcher()
-                            matches = bf.knnMatch(self._retry_banner_des, des_r, k=2)
-                            good_retry = [m for m_pair in matches if len(m_pair) == 2 for m, n in [m_pair] if m.distance < 0.7 * n.distance]
-                            if len(good_retry) >= 15:
-                                is_card_screen = True
+                    good_retry = self._count_good_matches(
+                        frame, self._retry_banner_des, slice(700, None), slice(1100, None), self._sift_scale("retry_banner")
+                    )
+                    if good_retry >= 15:
+                        is_card_screen = True
 
                 if not is_card_screen:
                     # 二次确认：底部应有深色奖励面板（排除战斗界面等偶发匹配）
-                    bottom_panel = screen[int(h*0.55):int(h*0.7), int(w*0.1):int(w*0.9)]
-                    bp_gray = cv2.cvtColor(bottom_panel, cv2.COLOR_BGR2GRAY)
-                    bp_dark = cv2.countNonZero((bp_gray < 80).astype(np.uint8))
+                    bp_dark = count("shadow", slice(int(h*0.55), int(h*0.7)), slice(int(w*0.1), int(w*0.9)))
                     # 底部面板应有大量深色像素（深色奖励栏背景）
                     if bp_dark > 10000:
                         return GameState.ARENA_OK
@@ -328,36 +921,19 @@ class ImageRecognizer:
         
         # A. SIFT 结构匹配 (核心方案：适配所有光影和稀有度)
         if self._retry_banner_des is not None:
-            # 限制在右下角区域 [700:, 1100:] 以提高速度并减少干扰
-            retry_roi = screen[700:, 1100:]
-            if retry_roi.size == 0 or retry_roi.shape[0] < 10 or retry_roi.shape[1] < 10:
-                kp_r, des_r = None, None
-            else:
-                kp_r, des_r = self.sift.detectAndCompute(retry_roi, None)
+            # 限制在右下角区域 [700:, 1100:] 以提高速度并减少干扰（ARENA_OK 检测中已计算过时直接复用）
+            good_retry = self._count_good_matches(
+                frame, self._retry_banner_des, slice(700, None), slice(1100, None), self._sift_scale("retry_banner")
+            )
             
-            if des_r is not None:
-                bf = cv2.BFMatcher()
-                matches = bf.knnMatch(self._retry_banner_des, des_r, k=2)
-                good_retry = []
-                for m_pair in matches:
-                    if len(m_pair) == 2:
-                        m, n = m_pair
-                        if m.distance < 0.7 * n.distance:
-                            good_retry.append(m)
-                
-                # 经过实测：真实界面匹配点 > 40，其他界面 < 10
-                if len(good_retry) >= 30:
-                    return GameState.CARD_SELECTION
+            # 经过实测：真实界面匹配点 > 40，其他界面 < 10
+            if good_retry >= 30:
+                return GameState.CARD_SELECTION
 
         # B. 标准模式兜底：米色描述背景
         if beige_pixels > 50000:
-            top_left_region = hsv[:int(h*0.3), :int(w*0.3)]
-            english_btn_mask_orange = cv2.inRange(top_left_region, np.array([10, 100, 100]), np.array([25, 255, 255]))
-            english_pixels = cv2.countNonZero(english_btn_mask_orange)
-            
-            bottom_right_region = hsv[int(h*0.7):, int(w*0.7):]
-            retry_btn_mask = cv2.inRange(bottom_right_region, np.array([10, 150, 150]), np.array([25, 255, 255]))
-            retry_pixels = cv2.countNonZero(retry_btn_mask)
+            english_pixels = count("orange_light", slice(None, int(h*0.3)), slice(None, int(w*0.3)))
+            retry_pixels = count("orange", slice(int(h*0.7), None), slice(int(w*0.7), None))
             
             if (english_pixels > 5000 or retry_pixels > 5000) and english_pixels < 50000:
                 return GameState.CARD_SELECTION
@@ -366,11 +942,7 @@ class ImageRecognizer:
 
         # 1. 检测胜利界面的绿色"胜利"横幅
         if bottom_orange_pixels > 3000:
-            victory_region = hsv[int(h*0.05):int(h*0.35), int(w*0.3):int(w*0.7)]
-            green_lower = np.array([35, 80, 80])
-            green_upper = np.array([85, 255, 255])
-            green_mask = cv2.inRange(victory_region, green_lower, green_upper)
-            green_pixels = cv2.countNonZero(green_mask)
+            green_pixels = count("green", top_rows, top_cols)
             
             # 只有当绿色足够多且没有大量米色背景时，才认为是胜利
             if green_pixels > 8000 and beige_pixels < 5000:
@@ -378,40 +950,31 @@ class ImageRecognizer:
         
         # 2. 检测关卡准备界面的 "Best time" 区域 (特征非常稳定)
         # 左下角会有固定位置的深色矩形框 + "Best time" 白色文字
-        best_time_region = screen[int(h*0.85):int(h*0.95), :int(w*0.15)]
-        bt_gray = cv2.cvtColor(best_time_region, cv2.COLOR_BGR2GRAY)
-        white_text = cv2.countNonZero((bt_gray > 200).astype(np.uint8))
-        dark_bg = cv2.countNonZero((bt_gray < 60).astype(np.uint8))
+        bt_rows, bt_cols = slice(int(h*0.85), int(h*0.95)), slice(None, int(w*0.15))
+        white_text = count("white_text", bt_rows, bt_cols)
+        dark_bg = count("black", bt_rows, bt_cols)
         
         # Best time区域应该有显著的深色背景和白色文字对比，且绝对不能有米色背景（排除卡牌界面）
         is_level_prepare_feature = white_text > 150 and dark_bg > 300 and white_text < dark_bg and beige_pixels < 10000
         
         if is_level_prepare_feature:
             # A. 真正的关卡准备界面：有Start按钮 (底部中间黄色)
-            start_btn_region = hsv[int(h*0.8):int(h*0.95), int(w*0.4):int(w*0.6)]
-            start_btn_mask = cv2.inRange(start_btn_region, np.array([15, 100, 100]), np.array([40, 255, 255]))
-            start_btn_pixels = cv2.countNonZero(start_btn_mask)
+            start_btn_pixels = count("yellow", slice(int(h*0.8), int(h*0.95)), slice(int(w*0.4), int(w*0.6)))
             
             if start_btn_pixels > 1000:
                 return GameState.LEVEL_PREPARE
                 
             # B. 升级后界面：有Close按钮 (右上角红色) 且无Start按钮
             # 按钮位置 [1520, 80], 检测区域 [1480:1560, 40:120]
-            cancel_btn_region = hsv[40:120, 1480:1560]
-            red_mask1 = cv2.inRange(cancel_btn_region, np.array([0, 100, 100]), np.array([10, 255, 255]))
-            red_mask2 = cv2.inRange(cancel_btn_region, np.array([160, 100, 100]), np.array([180, 255, 255]))
-            cancel_btn_pixels = cv2.countNonZero(red_mask1) + cv2.countNonZero(red_mask2)
+            cancel_btn_pixels = count("red", slice(40, 120), slice(1480, 1560))
             
             if cancel_btn_pixels > 1000:
                 return GameState.LEVEL_UP_AFTER
 
         # 3. 检测购买界面（弹窗，特征明显）
         # 特征：右上角有红色关闭按钮
-        # 按钮位置 [1520, 80], 检测区域 [1480:1560, 40:120]
-        cancel_btn_region = hsv[40:120, 1480:1560]
-        red_mask1 = cv2.inRange(cancel_btn_region, np.array([0, 100, 100]), np.array([10, 255, 255]))
-        red_mask2 = cv2.inRange(cancel_btn_region, np.array([160, 100, 100]), np.array([180, 255, 255]))
-        cancel_btn_pixels = cv2.countNonZero(red_mask1) + cv2.countNonZero(red_mask2)
+        # 按钮位置 [1520, 80], 检测区域 [1480:1560, 40:120]（LEVEL_UP_AFTER 检测中已计算过时直接复用）
+        cancel_btn_pixels = count("red", slice(40, 120), slice(1480, 1560))
         
         # 提高购买界面阈值，避免胜利界面误判 (709 -> 1200)
         # 并且要求没有Best Time特征（避免level_prepare误判）
@@ -421,9 +984,7 @@ class ImageRecognizer:
         # 4. 检测升级界面 (特征：底部中间有橙色按钮 + 顶部有金色)
         if bottom_orange_pixels > 3000:
             # 检测区域 [740:820, 700:900]
-            level_up_btn_region = hsv[740:820, 700:900]
-            level_up_orange_mask = cv2.inRange(level_up_btn_region, np.array([10, 150, 150]), np.array([25, 255, 255]))
-            level_up_pixels = cv2.countNonZero(level_up_orange_mask)
+            level_up_pixels = count("orange", slice(740, 820), slice(700, 900))
             
             if level_up_pixels > 8000 and gold_pixels > 10000:
                 return GameState.LEVEL_UP
@@ -434,12 +995,11 @@ class ImageRecognizer:
             
         # 6. 最后兜底检测障碍物继续界面
         # 特征：右侧中心区域有明显的按钮 (橙色/红色系)
-        btn_roi_hsv = hsv[int(h*0.3):int(h*0.6), int(w*0.8):]
-        btn_mask = cv2.inRange(btn_roi_hsv, np.array([0, 100, 100]), np.array([25, 255, 255]))
-        btn_pixels = cv2.countNonZero(btn_mask)
+        btn_rows, btn_cols = slice(int(h*0.3), int(h*0.6)), slice(int(w*0.8), None)
+        btn_pixels = count("warm", btn_rows, btn_cols)
         
         # 辅助参考特征：右侧灰色/边缘
-        right_gray_pixels = cv2.countNonZero(cv2.inRange(btn_roi_hsv, np.array([0, 0, 50]), np.array([180, 50, 200])))
+        right_gray_pixels = count("grayish", btn_rows, btn_cols)
         
         # 如果检测到右侧有明显的按钮特征
         # 备注：不再强依赖 gold_pixels > 80000，因为背景多变
@@ -448,26 +1008,90 @@ class ImageRecognizer:
             
         return GameState.UNKNOWN
     
+    def _sift_scale(self, detector: str) -> int:
+        """SIFT 检测使用的缩小倍数：不超过降分辨率识别的倍数和该检测允许的最大倍数"""
+        return max(1, min(int(self.detection_scale), SIFT_MAX_SCALE.get(detector, 1)))
+    
+    def _count_good_matches(
+        self,
+        frame: Frame,
+        template_des: np.ndarray,
+        rows: slice,
+        cols: slice,
+        scale: int = 1
+    ) -> int:
+        """
+        区域与模板 SIFT 描述符通过比值检验（Lowe's Ratio Test）的匹配数
+        
+        区域的 SIFT 特征点按帧和缩小倍数缓存，同一帧中多个检测使用同一区域时只计算一次；
+        scale > 1 时区域先缩小再提取特征点（模板描述符不变，依靠 SIFT 的尺度不变性匹配）
+        """
+        roi = frame.bgr(rows, cols)
+        if roi.size == 0 or roi.shape[0] < 10 * scale or roi.shape[1] < 10 * scale:
+            return 0
+        
+        def compute(region: np.ndarray):
+            if scale > 1:
+                size = (region.shape[1] // scale, region.shape[0] // scale)
+                region = cv2.resize(region, size, interpolation=cv2.INTER_AREA)
+            return self.sift.detectAndCompute(region, None)
+        
+        _, des_scene = frame.features(f"sift@{scale}", rows, cols, compute)
+        if des_scene is None:
+            return 0
+        matches = cv2.BFMatcher().knnMatch(template_des, des_scene, k=2)
+        return sum(1 for pair in matches if len(pair) == 2 and pair[0].distance < 0.7 * pair[1].distance)
+    
     def detect_card_ids(
         self,
         screen: np.ndarray,
         card_positions: List[Tuple[int, int]],
-        card_weights: dict
+        card_weights: dict,
+        save_unknown: bool = False
     ) -> List[Optional[str]]:
         """
-        识别卡牌ID (通过极速模板匹配)
+        识别卡牌ID (数字识别 + 图案哈希 + 整体模板匹配)
+        
+        先用 CardDigitReader 切分并识别ID标签中的数字，读不出的再查卡牌图案的感知哈希索引
+        （两者都与卡牌种类数量无关）；仍然识别不了的卡牌最后用整体ID模板匹配：模板常驻内存（CardTemplateIndex），
+        目录中新增模板时自动增量加载，先在缩小的灰度图上粗筛，只对候选模板做原尺寸匹配。
         
         Args:
             screen: 屏幕截图
             card_positions: 卡牌中心位置列表
             card_weights: 已知权重的ID列表 (用于优先匹配)
+            save_unknown: 是否把无法识别的卡牌ID标签区域保存到工作目录（debug_unknown_card_*.png）
             
         Returns:
             卡牌ID(字符串)列表，无法识别的为None
         """
-        results = []
+        screen = as_bgr(screen)
+        
+        if self.digit_reader is None:
+            self.digit_reader = CardDigitReader(self.templates_dir / "digits")
+        results: List[Optional[str]] = [
+            self.digit_reader.read(CardDigitReader.id_region(screen, position))
+            for position in card_positions
+        ]
+        missing = [i for i, card_id in enumerate(results) if card_id is None]
+        if missing:
+            art_results = self.identify_cards_by_art(screen, [card_positions[i] for i in missing])
+            for i, (card_id, _) in zip(missing, art_results):
+                results[i] = card_id
+            missing = [i for i in missing if results[i] is None]
+        if not missing:
+            return results
         
-        for i, (x, y) in enumerate(card_positions):
+        # 获取所有卡牌 ID 模板
+        if self.card_index is None:
+            card_template_dir = self.templates_dir / "cards"
+            if not card_template_dir.exists():
+                card_template_dir.mkdir(parents=True, exist_ok=True)
+            self.card_index = CardTemplateIndex(card_template_dir)
+        
+        id_regions = []
+        for i in missing:
+            x, y = card_positions[i]
             # 截取ID区域 (根据1600x900适配)
             # ID在卡牌上方，适当扩大区域以确保模板能放入 (200x100 搜索框)
             left, top = x - 100, y - 460
@@ -477,39 +1101,48 @@ class ImageRecognizer:
             left, top = max(0, left), max(0, top)
             right, bottom = min(screen.shape[1], right), min(screen.shape[0], bottom)
             
-            id_region = screen[top:bottom, left:right]
-            
-            # 尝试在 templates/cards 目录中匹配已知 ID
-            found_id = None
-            max_val = 0
-            
-            # 获取所有卡牌 ID 模板
-            card_template_dir = self.templates_dir / "cards"
-            if not card_template_dir.exists():
-                card_template_dir.mkdir(parents=True, exist_ok=True)
-            
-            for template_file in card_template_dir.glob("*.png"):
-                id_name = template_file.stem
-                templ = cv2.imread(str(template_file), cv2.IMREAD_COLOR)
-                if templ is None: continue
-                
-                res = cv2.matchTemplate(id_region, templ, cv2.TM_CCOEFF_NORMED)
-                _, val, _, _ = cv2.minMaxLoc(res)
-                
-                if val > 0.85 and val > max_val:
-                    max_val = val
-                    found_id = id_name
-            
+            id_regions.append(screen[top:bottom, left:right])
+        
+        for i, (found_id, _) in zip(missing, self.card_index.match(id_regions)):
             if found_id:
-                results.append(found_id)
-            else:
-                # 如果没找到，保存该区域以便用户以后手动添加模板
+                results[i] = found_id
+            elif save_unknown:
+                # 如果没找到，保存ID标签区域以便用户以后提取数字样本或添加模板
                 debug_path = f"debug_unknown_card_{int(time.time())}_{i}.png"
-                cv2.imwrite(debug_path, id_region)
-                results.append(None)
+                cv2.imwrite(debug_path, CardDigitReader.id_region(screen, card_positions[i]))
                 
         return results
     
+    def identify_cards_by_art(
+        self,
+        screen,
+        card_positions: List[Tuple[int, int]],
+        max_distance: int = 10
+    ) -> List[Tuple[Optional[str], int]]:
+        """
+        按卡牌图案的感知哈希识别卡牌 (templates/card_art_index.json，由 tools/build_card_hash_index.py 生成)
+        
+        Args:
+            screen: 屏幕截图
+            card_positions: 卡牌中心位置列表
+            max_distance: 最大汉明距离
+            
+        Returns:
+            [(卡牌ID或None, 汉明距离), ...]
+        """
+        if self.card_hashes is None:
+            self.card_hashes = CardHashIndex(self.templates_dir / "card_art_index.json")
+        if not len(self.card_hashes):
+            return [(None, -1)] * len(card_positions)
+        
+        screen = as_bgr(screen)
+        return [
+            self.card_hashes.lookup(
+                card_art_region(screen, CardDigitReader.tab_center(screen, position)), max_distance
+            )
+            for position in card_positions
+        ]
+    
     def get_card_positions(self, screen: np.ndarray) -> List[Tuple[int, int]]:
         """
         获取屏幕上所有卡牌的位置
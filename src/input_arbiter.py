@@ -0,0 +1,270 @@
+"""
+输入仲裁模块
+由单一线程独占设备输入：处理逻辑的点击意图和周期性的“继续”点击按优先级排队执行，
+冗余（同一目标短时间内重复）和冲突（处理逻辑刚点击过）的点击直接丢弃
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .adb_controller import ADBController
+
+# --- 极速日志记录逻辑 ---
+def log_debug(msg):
+    try:
+        import os
+        from datetime import datetime
+        with open("error.log", "a", encoding="utf-8") as f:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{timestamp}] [PID:{os.getpid()}] [Input] {msg}\n")
+    except:
+        pass
+
+
+# 优先级：数值越小越先执行
+PRIORITY_HANDLER = 0      # 状态处理逻辑的点击
+PRIORITY_BACKGROUND = 10  # 周期性的后台点击（继续按钮）
+
+
+class _Intent:
+    """一次输入意图"""
+
+    def __init__(self, action: Callable[[], bool], targets: List[Tuple[int, int]], priority: int, source: str):
+        self.action = action
+        self.targets = targets
+        self.priority = priority
+        self.source = source
+        self.done = threading.Event()
+        self.result = False
+
+
+class _Periodic:
+    """周期性点击"""
+
+    def __init__(self, x: int, y: int, interval: float, priority: int):
+        self.x = x
+        self.y = y
+        self.interval = interval
+        self.priority = priority
+        self.enabled = True
+        self.next_due = time.perf_counter() + interval
+
+
+class InputArbiter:
+    """
+    输入仲裁器
+
+    - tap()/run() 提交的意图在仲裁线程中按优先级执行，调用方阻塞到执行完毕
+    - 同一目标（按 target_radius 网格划分）在 min_interval 内重复点击视为冗余，直接丢弃
+    - 后台意图在处理逻辑点击后的 quiet 时间内、或有处理逻辑意图排队时丢弃，避免点击冲突
+    - 仲裁线程未启动时直接在调用线程执行（兼容单独调用处理逻辑的场景）
+    - 仲裁线程中的点击本来就是串行的，不经过控制器的合并队列（input_batch_window_ms），避免白白等待合并窗口
+    """
+
+    def __init__(
+        self,
+        adb: ADBController,
+        min_interval_ms: int = 300,
+        quiet_ms: int = 800,
+        target_radius: int = 30
+    ):
+        """
+        初始化输入仲裁器
+
+        Args:
+            adb: 设备控制器
+            min_interval_ms: 同一目标两次点击的最小间隔（毫秒）
+            quiet_ms: 处理逻辑点击后，后台点击暂停的时间（毫秒）
+            target_radius: 视为同一目标的坐标范围（像素）
+        """
+        self.adb = adb
+        self.min_interval = min_interval_ms / 1000.0
+        self.quiet = quiet_ms / 1000.0
+        self.target_radius = max(1, target_radius)
+
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int, _Intent]] = []
+        self._seq = itertools.count()
+        self._periodic: Dict[str, _Periodic] = {}
+        self._paused = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._last_tap: Dict[Tuple[int, int], float] = {}
+        self._last_foreground = 0.0
+        self.stats = {"executed": 0, "redundant": 0, "conflict": 0}
+
+    # ===== 生命周期 =====
+
+    def start(self):
+        """启动仲裁线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            now = time.perf_counter()
+            for periodic in self._periodic.values():
+                periodic.next_due = now + periodic.interval
+        self._thread = threading.Thread(target=self._worker, name="input-arbiter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止仲裁线程，未执行的意图以失败返回"""
+        with self._cond:
+            self._running = False
+            pending, self._queue = self._queue, []
+            self._cond.notify_all()
+        for _, _, intent in pending:
+            intent.done.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def pause(self):
+        """暂停周期性点击（处理逻辑的点击不受影响）"""
+        with self._cond:
+            self._paused = True
+
+    def resume(self):
+        """恢复周期性点击"""
+        with self._cond:
+            self._paused = False
+            self._cond.notify_all()
+
+    # ===== 提交意图 =====
+
+    def tap(self, x: int, y: int, priority: int = PRIORITY_HANDLER, source: str = "handler") -> bool:
+        """
+        提交点击意图并等待执行
+
+        Returns:
+            是否成功（因冗余被丢弃时返回True，目标刚被点击过）
+        """
+        return self.run(lambda: self._send_tap(x, y), [(x, y)], priority, source)
+
+    def run(
+        self,
+        action: Callable[[], bool],
+        targets: List[Tuple[int, int]],
+        priority: int = PRIORITY_HANDLER,
+        source: str = "handler"
+    ) -> bool:
+        """
+        提交任意输入动作（如批量点击）并等待执行
+
+        Args:
+            action: 在仲裁线程中执行的输入动作
+            targets: 动作涉及的点击坐标，用于去重和限速
+            priority: 优先级
+            source: 来源名称（日志用）
+
+        Returns:
+            动作返回值
+        """
+        intent = _Intent(action, targets, priority, source)
+        with self._cond:
+            running = self._running and self._thread is not threading.current_thread()
+            if running:
+                heapq.heappush(self._queue, (priority, next(self._seq), intent))
+                self._cond.notify_all()
+        if not running:
+            self._execute(intent)
+            return intent.result
+        intent.done.wait()
+        return intent.result
+
+    def add_periodic(self, name: str, x: int, y: int, interval: float, priority: int = PRIORITY_BACKGROUND):
+        """注册周期性点击"""
+        with self._cond:
+            self._periodic[name] = _Periodic(x, y, interval, priority)
+            self._cond.notify_all()
+
+    def set_periodic_enabled(self, name: str, enabled: bool):
+        """启用/停用周期性点击"""
+        with self._cond:
+            periodic = self._periodic.get(name)
+            if periodic is not None and periodic.enabled != enabled:
+                periodic.enabled = enabled
+                periodic.next_due = time.perf_counter() + periodic.interval
+                self._cond.notify_all()
+
+    # ===== 仲裁线程 =====
+
+    def _target_key(self, x: int, y: int) -> Tuple[int, int]:
+        """按坐标网格划分目标"""
+        return x // self.target_radius, y // self.target_radius
+
+    def _next_intent(self) -> Optional[_Intent]:
+        """取出下一个意图：排队的意图优先，其次是到期的周期性点击"""
+        with self._cond:
+            while self._running:
+                if self._queue:
+                    return heapq.heappop(self._queue)[2]
+
+                now = time.perf_counter()
+                timeout = None
+                if not self._paused:
+                    for periodic in self._periodic.values():
+                        if not periodic.enabled:
+                            continue
+                        if periodic.next_due <= now:
+                            periodic.next_due = now + periodic.interval
+                            x, y = periodic.x, periodic.y
+                            return _Intent(lambda: self._send_tap(x, y), [(x, y)], periodic.priority, "periodic")
+                        wait = periodic.next_due - now
+                        timeout = wait if timeout is None else min(timeout, wait)
+                self._cond.wait(timeout)
+        return None
+
+    def _send_tap(self, x: int, y: int) -> bool:
+        """发送点击：仲裁线程中直接发送，未启动仲裁线程时经过控制器（可能被合并）"""
+        if threading.current_thread() is self._thread:
+            return self.adb.batch().tap(x, y).commit()
+        return self.adb.tap(x, y)
+
+    def _worker(self):
+        """仲裁线程主循环"""
+        while True:
+            intent = self._next_intent()
+            if intent is None:
+                return
+            self._execute(intent)
+
+    def _execute(self, intent: _Intent):
+        """执行或丢弃一个意图"""
+        try:
+            now = time.perf_counter()
+            keys = [self._target_key(x, y) for x, y in intent.targets]
+
+            if intent.priority > PRIORITY_HANDLER:
+                # 后台点击：处理逻辑刚点击过或正有点击排队时让路
+                with self._cond:
+                    busy = bool(self._queue)
+                if busy or now - self._last_foreground < self.quiet:
+                    self.stats["conflict"] += 1
+                    return
+
+            if keys and all(now - self._last_tap.get(key, 0.0) < self.min_interval for key in keys):
+                # 所有目标都刚点击过，冗余点击
+                self.stats["redundant"] += 1
+                log_debug(f"丢弃冗余点击 ({intent.source}): {intent.targets}")
+                intent.result = True
+                return
+
+            intent.result = intent.action()
+            self.stats["executed"] += 1
+
+            now = time.perf_counter()
+            for key in keys:
+                self._last_tap[key] = now
+            if intent.priority <= PRIORITY_HANDLER:
+                self._last_foreground = now
+            if len(self._last_tap) > 64:
+                self._last_tap = {k: t for k, t in self._last_tap.items() if now - t < self.min_interval}
+        except Exception as e:
+            log_debug(f"输入执行失败 ({intent.source}): {e}")
+            intent.result = False
+        finally:
+            intent.done.set()
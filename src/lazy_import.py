@@ -0,0 +1,53 @@
+"""
+延迟导入模块
+cv2 / numpy / PIL 导入耗时较长，用代理对象推迟到第一次使用时再导入，
+让界面先显示出来
+"""
+import importlib
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    模块代理
+
+    第一次访问属性时导入真正的模块，并把其属性复制到代理上，
+    之后的属性访问与直接使用模块没有区别。
+    """
+
+    _import_lock = threading.Lock()
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_target"] = name
+        self.__dict__["_lazy_loaded"] = False
+
+    def _load(self):
+        """导入真正的模块"""
+        with LazyModule._import_lock:
+            if not self.__dict__["_lazy_loaded"]:
+                module = importlib.import_module(self.__dict__["_lazy_target"])
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_loaded"] = True
+
+    def __getattr__(self, attr: str):
+        # 只有代理上还没有的属性才会进入这里
+        if self.__dict__["_lazy_loaded"]:
+            raise AttributeError(f"module '{self.__dict__['_lazy_target']}' has no attribute '{attr}'")
+        self._load()
+        return getattr(self, attr)
+
+
+def lazy_module(name: str) -> types.ModuleType:
+    """
+    获取模块的延迟导入代理（已导入的模块直接返回）
+
+    Args:
+        name: 模块全名，如 "cv2"、"PIL.Image"
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
@@ -0,0 +1,330 @@
+"""
+流水线自动化模块
+截图、识别、点击处理分别在独立线程中运行，通过“只保留最新”的有界队列衔接：
+截图不再等待识别完成，识别总是处理最新的一帧，过时的帧直接丢弃
+"""
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional, Any, Dict
+
+from .adb_controller import ADBController
+from .config_loader import Config
+from .state_machine import GameAutomation, log_debug
+
+
+class LatestQueue:
+    """
+    最新优先的有界队列（线程安全）
+
+    队列满时丢弃最旧的元素，消费者总是拿到最新的数据；
+    记录队列深度、丢弃数量和元素在队列中的等待时间。
+    """
+
+    def __init__(self, capacity: int = 1):
+        """
+        初始化队列
+
+        Args:
+            capacity: 最多保留的元素数
+        """
+        self._items = deque(maxlen=max(1, capacity))
+        self._cond = threading.Condition()
+        self._closed = False
+        self.puts = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.wait_ms_total = 0.0
+        self.gets = 0
+
+    def put(self, item: Any):
+        """放入元素，队列满时丢弃最旧的元素"""
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append((item, time.perf_counter()))
+            self.puts += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        取出最新的元素，较旧的元素计为丢弃
+
+        Args:
+            timeout: 超时时间（秒），None 表示一直等待
+
+        Returns:
+            元素，超时或队列已关闭返回None
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout=timeout)
+            if not self._items:
+                return None
+            item, queued_at = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            self.gets += 1
+            self.wait_ms_total += (time.perf_counter() - queued_at) * 1000
+            return item
+
+    def close(self):
+        """关闭队列，唤醒所有等待的消费者"""
+        with self._cond:
+            self._closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+    @property
+    def depth(self) -> int:
+        """当前队列深度"""
+        with self._cond:
+            return len(self._items)
+
+    def stats(self) -> Dict[str, float]:
+        """队列统计"""
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "max_depth": self.max_depth,
+                "puts": self.puts,
+                "dropped": self.dropped,
+                "avg_wait_ms": self.wait_ms_total / self.gets if self.gets else 0.0,
+            }
+
+
+class StageTimer:
+    """单个流水线阶段的耗时统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.started_at = time.perf_counter()
+
+    def record(self, elapsed_ms: float):
+        """记录一次处理耗时"""
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.last_ms = elapsed_ms
+
+    def stats(self) -> Dict[str, float]:
+        """阶段统计：处理次数、平均/最近耗时、吞吐（次/秒）"""
+        with self._lock:
+            elapsed = time.perf_counter() - self.started_at
+            return {
+                "count": self.count,
+                "avg_ms": self.total_ms / self.count if self.count else 0.0,
+                "last_ms": self.last_ms,
+                "fps": self.count / elapsed if elapsed > 0 else 0.0,
+            }
+
+
+class LockedRecognizer:
+    """
+    识别器的加锁代理
+
+    方法调用期间持有锁（识别器内部的缓存与特征提取对象不宜并发使用），
+    属性读取直接转发；锁为可重入锁，调用方可以在外层再持有同一把锁
+    """
+
+    def __init__(self, recognizer, lock: threading.RLock):
+        self._recognizer = recognizer
+        self._lock = lock
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._recognizer, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
+class PipelinedGameAutomation(GameAutomation):
+    """
+    流水线游戏自动化控制器
+
+    - 截图线程：按轮询间隔持续截图，放入帧队列
+    - 识别线程：取最新帧执行 detect_state，结果放入动作队列
+    - 动作线程：执行状态处理（点击、等待）
+
+    处理逻辑点击后画面会变化，此前开始截取的帧全部作废（按“动作序号”判断），
+    保证不会用点击前的画面做第二次判断。识别器的每次调用都持有同一把锁，
+    处理逻辑在点击、等待期间不占用锁，识别线程可以继续识别新帧。
+    """
+
+    def __init__(
+        self,
+        config_dir: str = "config",
+        templates_dir: str = "templates",
+        adb: Optional[ADBController] = None,
+        config: Optional[Config] = None
+    ):
+        super().__init__(config_dir, templates_dir, adb, config)
+        self._frame_queue = LatestQueue(capacity=1)
+        self._action_queue = LatestQueue(capacity=1)
+        self._stage_timers = {name: StageTimer() for name in ("capture", "recognize", "action")}
+        self._end_to_end = StageTimer()
+        self._recognizer_lock = threading.RLock()
+        self._locked_recognizer: Optional[LockedRecognizer] = None
+        self._action_epoch = 0  # 每次点击处理后递增，旧序号的帧作废
+        self._capture_delay = self.config.loop_delay_ms / 1000.0
+
+    def start(self):
+        """开始自动化（截图在调用线程中运行，识别与处理各一个线程）"""
+        self._frame_queue = LatestQueue(capacity=1)
+        self._action_queue = LatestQueue(capacity=1)
+        self._stage_timers = {name: StageTimer() for name in ("capture", "recognize", "action")}
+        self._end_to_end = StageTimer()
+        self._action_epoch = 0
+        self._capture_delay = self.config.loop_delay_ms / 1000.0
+        super().start()
+
+    @property
+    def recognizer(self):
+        """图像识别器（加锁代理，识别线程与动作线程共用）"""
+        recognizer = super().recognizer
+        if self._locked_recognizer is None or self._locked_recognizer._recognizer is not recognizer:
+            self._locked_recognizer = LockedRecognizer(recognizer, self._recognizer_lock)
+        return self._locked_recognizer
+
+    def stop(self):
+        """停止自动化，关闭各阶段队列并输出流水线统计"""
+        self._running = False
+        self._frame_queue.close()
+        self._action_queue.close()
+        self._log_pipeline_stats()
+        super().stop()
+
+    def get_pipeline_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        获取各阶段统计
+
+        Returns:
+            {阶段名: {count, avg_ms, last_ms, fps}, "frame_queue"/"action_queue": 队列统计,
+             "end_to_end": 截图到处理完成的延迟}
+        """
+        stats = {name: timer.stats() for name, timer in self._stage_timers.items()}
+        stats["frame_queue"] = self._frame_queue.stats()
+        stats["action_queue"] = self._action_queue.stats()
+        stats["end_to_end"] = self._end_to_end.stats()
+        return stats
+
+    def _log_pipeline_stats(self):
+        """输出流水线统计"""
+        stats = self.get_pipeline_stats()
+        if not stats["recognize"]["count"]:
+            return
+        self._log(
+            "  流水线统计: "
+            + ", ".join(
+                f"{name} {stats[name]['fps']:.1f} fps / {stats[name]['avg_ms']:.0f} ms"
+                for name in ("capture", "recognize", "action")
+            )
+        )
+        self._log(
+            f"  帧队列丢弃 {stats['frame_queue']['dropped']} 帧, "
+            f"动作队列丢弃 {stats['action_queue']['dropped']} 个, "
+            f"端到端延迟 {stats['end_to_end']['avg_ms']:.0f} ms"
+        )
+
+    def _main_loop(self):
+        """启动识别与动作线程，在当前线程运行截图阶段"""
+        workers = [
+            threading.Thread(target=self._recognize_loop, name="recognize", daemon=True),
+            threading.Thread(target=self._action_loop, name="action", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            self._capture_loop()
+        finally:
+            self._frame_queue.close()
+            self._action_queue.close()
+            for worker in workers:
+                worker.join(timeout=2)
+
+    def _capture_loop(self):
+        """截图阶段：间隔按截图开始时间计算，不等待识别"""
+        timer = self._stage_timers["capture"]
+        while self._running:
+            if self._paused:
+                self._wait(0.1)
+                continue
+
+            started = time.perf_counter()
+            epoch = self._action_epoch
+            try:
+                log_debug("正在请求截图...")
+                screen = self._grab_frame()
+            except Exception as e:
+                self._log(f"错误: {e}")
+                self._log(traceback.format_exc())
+                screen = None
+            if screen is None:
+                log_debug("警告: 截图失败")
+                if self.config.debug:
+                    self._log("警告: 截图失败，重试中...")
+                self._wait(1)
+                continue
+            timer.record((time.perf_counter() - started) * 1000)
+            self._frame_queue.put((screen, epoch, started))
+
+            self._wait(max(0.0, started + self._capture_delay - time.perf_counter()))
+
+    def _recognize_loop(self):
+        """识别阶段：只识别最新的有效帧"""
+        timer = self._stage_timers["recognize"]
+        while self._running:
+            item = self._frame_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            screen, epoch, captured = item
+            if epoch != self._action_epoch:
+                continue  # 点击前开始截取的帧
+            started = time.perf_counter()
+            with self._recognizer_lock:
+                if epoch != self._action_epoch:
+                    continue
+                try:
+                    state = self.recognizer.detect_state(screen)
+                    unchanged = self.recognizer.last_unchanged
+                except Exception as e:
+                    self._log(f"错误: {e}")
+                    self._log(traceback.format_exc())
+                    continue
+            timer.record((time.perf_counter() - started) * 1000)
+            log_debug(f"检测到状态: {state.name}")
+            self._action_queue.put((state, unchanged, screen, epoch, captured))
+
+    def _action_loop(self):
+        """动作阶段：执行状态处理，点击后作废之前截取的帧"""
+        timer = self._stage_timers["action"]
+        while self._running:
+            item = self._action_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            state, unchanged, screen, epoch, captured = item
+            if epoch != self._action_epoch or self._paused:
+                continue
+            started = time.perf_counter()
+            try:
+                handled = self._process_state(state, screen)
+                if handled:
+                    self._action_epoch += 1
+                self._capture_delay = self._next_poll_delay(state, handled, unchanged)
+            except Exception as e:
+                self._log(f"错误: {e}")
+                self._log(traceback.format_exc())
+                self._action_epoch += 1
+                self._wait(1)
+                continue
+            now = time.perf_counter()
+            timer.record((now - started) * 1000)
+            self._end_to_end.record((now - captured) * 1000)
@@ -0,0 +1,72 @@
+"""
+轮询调度模块
+根据当前状态决定下一次截图前的等待时间：
+战斗中（UNKNOWN）或画面静止时指数退避，点击之后短时间内快速连拍
+"""
+from .game_state import GameState
+
+
+class PollingScheduler:
+    """按状态自适应的轮询间隔"""
+
+    def __init__(
+        self,
+        base_delay_ms: int = 200,
+        max_delay_ms: int = 1500,
+        backoff_factor: float = 1.5,
+        burst_count: int = 3,
+        burst_delay_ms: int = 50
+    ):
+        """
+        初始化调度器
+
+        Args:
+            base_delay_ms: 有界面需要处理时的常规间隔（毫秒）
+            max_delay_ms: 退避的最大间隔（毫秒）
+            backoff_factor: 每次未知/静止画面后间隔的放大倍数
+            burst_count: 点击后快速连拍的次数
+            burst_delay_ms: 快速连拍的间隔（毫秒）
+        """
+        self.base_delay = base_delay_ms / 1000.0
+        self.max_delay = max(max_delay_ms, base_delay_ms) / 1000.0
+        self.backoff_factor = max(1.0, backoff_factor)
+        self.burst_count = burst_count
+        self.burst_delay = burst_delay_ms / 1000.0
+
+        self._idle_delay = self.base_delay
+        self._burst_left = 0
+
+    def next_delay(self, state: GameState, handled: bool, unchanged: bool = False) -> float:
+        """
+        计算下一次截图前的等待时间
+
+        Args:
+            state: 本帧识别到的状态
+            handled: 本帧是否执行了点击处理（界面即将切换）
+            unchanged: 画面是否与上一帧基本相同
+
+        Returns:
+            等待秒数
+        """
+        if handled:
+            # 点击后界面即将变化，连续快速截图以尽快响应下一个界面
+            self._burst_left = self.burst_count
+            self._idle_delay = self.base_delay
+            return self.burst_delay
+
+        if self._burst_left > 0:
+            self._burst_left -= 1
+            return self.burst_delay
+
+        if state == GameState.UNKNOWN or unchanged:
+            delay = self._idle_delay
+            self._idle_delay = min(self.max_delay, self._idle_delay * self.backoff_factor)
+            return delay
+
+        self._idle_delay = self.base_delay
+        return self.base_delay
+
+    def reset(self):
+        """恢复到常规间隔"""
+        self._idle_delay = self.base_delay
+        self._burst_left = 0
@@ -0,0 +1,306 @@
+"""
+游戏模拟器模块
+实现 ADBController 接口的模拟设备：用 templates/ui 中的参考截图作为画面，
+点击落在配置的按钮区域内时推进脚本化的游戏流程，并注入截图/点击延迟，
+无需雷电模拟器即可离线测量每小时轮次和各状态的响应时间
+"""
+from __future__ import annotations
+
+import gzip
+import random
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+from .adb_controller import ADBController
+from .config_loader import Config
+from .lazy_import import lazy_module
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+
+
+# 每个界面对应的参考截图（templates/ui 下的文件名）
+SCREEN_IMAGES = {
+    "level_prepare": "level_prepare",
+    "card_selection": "card_selection",
+    "card_selection_multiple": "card_selection_multiple",
+    "obstacle_continue": "obstacle_continue",
+    "obstacle_choice": "obstacle_choice",
+    "obstacle_specialbox": "obstacle_specialbox",
+    "level_up": "level_up",
+    "level_up_after": "level_up_after",
+    "purchase": "purchase",
+    "purchase_failed": "purchase_failed",
+    "victory": "victory",
+}
+
+# 一轮关卡中依次出现的事件界面，事件之间为战斗（识别为 UNKNOWN）
+DEFAULT_SCRIPT = [
+    "card_selection",
+    "obstacle_continue",
+    "card_selection_multiple",
+    "obstacle_choice",
+    "level_up",
+    "obstacle_specialbox",
+    "purchase",
+    "purchase_failed",
+    "victory",
+]
+
+
+class SimulatedDevice(ADBController):
+    """
+    模拟设备
+
+    复用 ADBController 的截图格式、批量输入和统计逻辑，只替换最底层的
+    `_exec_out`（返回当前画面）和 `_run_shell_command`（解析 input/sleep 命令）。
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        templates_dir: str = "templates",
+        script: Optional[List[str]] = None,
+        battle_seconds: float = 2.0,
+        capture_latency_ms: float = 120,
+        tap_latency_ms: float = 60,
+        jitter: float = 0.2,
+        button_radius: int = 60,
+        capture_format: str = "raw",
+        **kwargs
+    ):
+        """
+        初始化模拟设备
+
+        Args:
+            config: 配置（按钮坐标）
+            templates_dir: 模板目录（读取 ui/ 下的参考截图）
+            script: 一轮中依次出现的事件界面
+            battle_seconds: 事件之间的战斗时长（秒）
+            capture_latency_ms: 截图延迟（毫秒）
+            tap_latency_ms: 每次shell往返的延迟（毫秒）
+            jitter: 延迟随机抖动比例
+            button_radius: 按钮判定区域半径（像素）
+            capture_format: 截图格式（raw / raw_gzip / png）
+        """
+        self.config = config
+        self.templates_dir = Path(templates_dir)
+        self.script = list(script or DEFAULT_SCRIPT)
+        self.battle_seconds = battle_seconds
+        self.capture_latency = capture_latency_ms / 1000.0
+        self.tap_latency = tap_latency_ms / 1000.0
+        self.jitter = jitter
+        self.button_radius = button_radius
+
+        super().__init__(host="simulator", port=0, adb_path="simulator", capture_format=capture_format, **kwargs)
+        self.device_id = "simulator"
+
+        self._lock = threading.Lock()
+        self._images: Dict[str, np.ndarray] = {}
+        self._encoded: Dict[Tuple[str, str], bytes] = {}
+
+        # 游戏流程状态
+        self._screen = "level_prepare"
+        self._screen_since = time.time()
+        self._script_index = 0
+        self._battle_until = 0.0
+        self._pending_picks = 0
+
+        # 统计
+        self.runs = 0
+        self.started_at = time.time()
+        self.taps = 0
+        self.missed_taps = 0
+        self.continue_taps = 0  # 未推进流程的继续按钮点击（输入仲裁的周期点击），不计入未命中
+        self.reaction_times: Dict[str, List[float]] = {}
+
+    # ===== 延迟与画面 =====
+
+    def _delay(self, seconds: float):
+        """注入带抖动的延迟"""
+        if seconds > 0:
+            time.sleep(seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def _load_image(self, screen: str) -> np.ndarray:
+        """加载并缩放参考截图到 1600x900"""
+        image = self._images.get(screen)
+        if image is None:
+            if screen == "battle":
+                # 战斗画面：压暗的障碍物界面，识别为 UNKNOWN
+                base = self._load_image("obstacle_continue")
+                image = (base * 0.35).astype(np.uint8)
+            else:
+                path = self.templates_dir / "ui" / f"{SCREEN_IMAGES[screen]}.png"
+                loaded = cv2.imread(str(path), cv2.IMREAD_COLOR)
+                if loaded is None:
+                    raise FileNotFoundError(f"缺少参考截图: {path}")
+                image = cv2.resize(loaded, (1600, 900))
+            self._images[screen] = image
+        return image
+
+    def _encode(self, screen: str, capture_format: str) -> bytes:
+        """按截图格式编码画面（结果缓存）"""
+        key = (screen, capture_format)
+        data = self._encoded.get(key)
+        if data is None:
+            image = self._load_image(screen)
+            if capture_format == "png":
+                data = cv2.imencode(".png", image)[1].tobytes()
+            else:
+                h, w = image.shape[:2]
+                data = struct.pack("<3I", w, h, 1) + cv2.cvtColor(image, cv2.COLOR_BGR2RGBA).tobytes()
+                if capture_format == "raw_gzip":
+                    data = gzip.compress(data, compresslevel=1)
+            self._encoded[key] = data
+        return data
+
+    def _enter(self, screen: str):
+        """切换到新界面"""
+        self._screen = screen
+        self._screen_since = time.time()
+        self._pending_picks = 2 if screen == "card_selection_multiple" else 1
+
+    def _advance_time(self):
+        """战斗结束时进入下一个事件界面"""
+        if self._screen == "battle" and time.time() >= self._battle_until:
+            self._enter(self.script[self._script_index])
+            self._script_index = (self._script_index + 1) % len(self.script)
+
+    def _start_battle(self):
+        """进入战斗"""
+        self._enter("battle")
+        self._battle_until = time.time() + self.battle_seconds
+
+    @property
+    def screen(self) -> str:
+        """当前界面名"""
+        with self._lock:
+            self._advance_time()
+            return self._screen
+
+    # ===== 点击判定 =====
+
+    def _hit(self, x: int, y: int, positions) -> bool:
+        """点击是否落在任一按钮区域内"""
+        r = self.button_radius
+        return any(abs(x - px) <= r and abs(y - py) <= r for px, py in positions)
+
+    def _buttons(self, screen: str) -> Tuple[list, Optional[str]]:
+        """界面上可推进流程的按钮坐标及点击后的下一界面（None 表示进入战斗）"""
+        cfg = self.config
+        table = {
+            "level_prepare": ([cfg.btn_start_pos], None),
+            "card_selection": (cfg.card_positions, None),
+            "card_selection_multiple": (cfg.card_positions, None),
+            "obstacle_continue": ([cfg.btn_continue_pos], None),
+            "obstacle_choice": (cfg.choice_positions, None),
+            "obstacle_specialbox": ([cfg.btn_open_chest_pos], None),
+            "level_up": ([cfg.btn_level_up_pos], "level_up_after"),
+            "level_up_after": ([cfg.btn_cancel_purchase_pos], None),
+            "purchase": ([cfg.btn_cancel_purchase_pos], None),
+            "purchase_failed": ([cfg.btn_purchase_confirm_pos], None),
+            "victory": ([cfg.btn_retry_pos], "level_prepare"),
+        }
+        return table.get(screen, ([], None))
+
+    def _on_tap(self, x: int, y: int):
+        """处理一次点击，推进游戏流程"""
+        with self._lock:
+            self._advance_time()
+            self.taps += 1
+            screen = self._screen
+            positions, next_screen = self._buttons(screen)
+            if not self._hit(x, y, positions):
+                if self._hit(x, y, [self.config.btn_continue_pos]):
+                    self.continue_taps += 1
+                else:
+                    self.missed_taps += 1
+                return
+
+            self._pending_picks -= 1
+            if self._pending_picks > 0:
+                return
+
+            self.reaction_times.setdefault(screen, []).append(time.time() - self._screen_since)
+            if screen == "victory":
+                self.runs += 1
+            if next_screen is None:
+                self._start_battle()
+            else:
+                self._enter(next_screen)
+
+    # ===== ADBController 接口 =====
+
+    def _find_adb(self) -> str:
+        return "simulator"
+
+    def connect(self) -> bool:
+        self._connected = True
+        return True
+
+    def disconnect(self) -> bool:
+        self._connected = False
+        return True
+
+    def is_connected(self) -> bool:
+        return True
+
+    def _exec_out(self, args: list, timeout: int = 10) -> Optional[bytes]:
+        """返回当前画面的 screencap 输出"""
+        self._delay(self.capture_latency)
+        command = " ".join(args)
+        if "gzip" in command:
+            capture_format = "raw_gzip"
+        elif "-p" in args:
+            capture_format = "png"
+        else:
+            capture_format = "raw"
+        with self._lock:
+            self._advance_time()
+            screen = self._screen
+        return self._encode(screen, capture_format)
+
+    def _run_shell_command(self, command: str) -> bool:
+        """解析并执行 input tap / sleep 命令序列"""
+        self._delay(self.tap_latency)
+        for part in command.split(";"):
+            tokens = part.split()
+            if not tokens:
+                continue
+            if tokens[0] == "sleep":
+                time.sleep(float(tokens[1]))
+            elif tokens[:2] == ["input", "tap"]:
+                self._on_tap(int(tokens[2]), int(tokens[3]))
+            elif tokens[:2] == ["input", "swipe"]:
+                self._on_tap(int(tokens[4]), int(tokens[5]))
+        return True
+
+    # ===== 统计 =====
+
+    def report(self) -> Dict[str, object]:
+        """
+        汇总模拟结果
+
+        Returns:
+            runs: 完成轮次, runs_per_hour: 每小时轮次, taps/missed_taps: 点击次数/未命中次数,
+            continue_taps: 未推进流程的继续按钮周期点击次数（不计入未命中）,
+            reaction_ms: {界面: 平均响应毫秒}
+        """
+        elapsed = time.time() - self.started_at
+        with self._lock:
+            reaction = {
+                screen: sum(times) / len(times) * 1000
+                for screen, times in self.reaction_times.items()
+            }
+            return {
+                "elapsed_s": elapsed,
+                "runs": self.runs,
+                "runs_per_hour": self.runs / elapsed * 3600 if elapsed > 0 else 0.0,
+                "taps": self.taps,
+                "missed_taps": self.missed_taps,
+                "continue_taps": self.continue_taps,
+                "reaction_ms": reaction,
+            }
@@ -0,0 +1,79 @@
+"""
+启动缓存模块
+在两次运行之间保存启动时需要探测/计算的结果（ADB路径、模板特征点等），
+加快程序启动
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+# 缓存目录（相对于程序工作目录）
+CACHE_DIR = Path("cache")
+
+
+class StartupCache:
+    """
+    启动缓存
+
+    键值保存在 cache/startup_cache.json 中，大块二进制数据（如特征描述符）
+    由调用方保存到 file_path() 返回的文件。读写失败时静默忽略，只影响启动速度。
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self._path = self.cache_dir / "startup_cache.json"
+        self._lock = threading.Lock()
+        self._data: Optional[dict] = None
+
+    def _load(self) -> dict:
+        """读取缓存文件（只读一次）"""
+        if self._data is None:
+            try:
+                with open(self._path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取缓存值"""
+        with self._lock:
+            return self._load().get(key, default)
+
+    def set(self, key: str, value: Any):
+        """写入缓存值并保存到文件"""
+        with self._lock:
+            data = self._load()
+            if data.get(key) == value:
+                return
+            data[key] = value
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = self._path.with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                tmp_path.replace(self._path)
+            except OSError:
+                pass
+
+    def file_path(self, name: str) -> Path:
+        """缓存目录下的文件路径（会创建目录）"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass
+        return self.cache_dir / name
+
+
+def file_fingerprint(path: Path) -> Optional[list]:
+    """文件指纹 [修改时间, 大小]，文件不存在返回None"""
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+# 全局启动缓存
+startup_cache = StartupCache()
@@ -4,12 +4,24 @@
 """
 import time
 import random
-from typing import Optional, Callable, List
+from typing import Optional, Callable, Dict, List, Tuple
 import threading  # 新增：多线程支持
 
 from .adb_controller import ADBController
-from .image_recognition import ImageRecognizer, GameState
+from .adb_native import NativeADBController
+from .game_state import GameState
 from .config_loader import Config
+from .frame_stream import ScreenRecordStream
+from .frame import Frame
+from .polling import PollingScheduler
+from .input_arbiter import InputArbiter, PRIORITY_BACKGROUND
+
+# 点击后等待界面切换：缩略图抽样步长，以及超时相对原固定等待时间的倍数
+TRANSITION_THUMB_STEP = 8
+TRANSITION_TIMEOUT_SCALE = 2.0
+
+# 继续按钮周期点击意图的名称
+CONTINUE_INTENT = "continue"
 
 # --- 极速日志记录逻辑 ---
 def log_debug(msg):
@@ -26,35 +38,66 @@ def log_debug(msg):
 class GameAutomation:
     """游戏自动化控制器"""
     
-    def __init__(self, config_dir: str = "config", templates_dir: str = "templates"):
+    def __init__(
+        self,
+        config_dir: str = "config",
+        templates_dir: str = "templates",
+        adb: Optional[ADBController] = None,
+        config: Optional[Config] = None
+    ):
         """
         初始化游戏自动化
         
         Args:
             config_dir: 配置目录
             templates_dir: 模板图片目录
+            adb: 外部提供的设备控制器（如模拟设备），为None时按配置创建
+            config: 已加载的配置（如入口处为选择主循环已读取），为None时从 config_dir 加载
         """
         # 加载配置
-        self.config = Config(config_dir)
+        self.config = config if config is not None else Config(config_dir)
         
         # 初始化ADB控制器
-        self.adb = ADBController(
-            host=self.config.adb_host,
-            port=self.config.adb_port,
-            adb_path=self.config.adb_path
-        )
-        
-        # 初始化图像识别器
-        self.recognizer = ImageRecognizer(templates_dir)
+        self.adb = adb if adb is not None else self._create_adb()
+        
+        # 初始化图像识别器（fast_start 时在后台线程构建，界面可以先显示出来）
+        self._recognizer = None
+        self._recognizer_error: Optional[Exception] = None
+        self._recognizer_ready = threading.Event()
+        if self.config.fast_start:
+            threading.Thread(
+                target=self._build_recognizer, args=(templates_dir,), name="recognizer-warmup", daemon=True
+            ).start()
+        else:
+            self._build_recognizer(templates_dir)
         
         # 运行状态
         self._running = False
         self._paused = False
+        self._stop_event = threading.Event()  # stop() 时唤醒所有等待
         
-        # 继续按钮自动点击线程
-        self._continue_thread = None
-        self._continue_running = False
-        self._continue_paused = False  # 胜利/开始界面时暂停点击
+        # 输入仲裁：处理逻辑的点击与周期性的继续按钮点击统一由仲裁线程执行
+        self.input = InputArbiter(
+            self.adb,
+            min_interval_ms=self.config.input_min_interval_ms,
+            quiet_ms=self.config.input_quiet_ms
+        )
+        continue_x, continue_y = self.config.btn_continue_pos
+        self.input.add_periodic(CONTINUE_INTENT, continue_x, continue_y, interval=1.0, priority=PRIORITY_BACKGROUND)
+        
+        # 流式帧源（screenrecord），未启用时为None
+        self._frame_stream: Optional[ScreenRecordStream] = None
+        
+        # 自适应轮询调度（未启用时为None，使用固定的 loop_delay_ms）
+        self._poll_scheduler: Optional[PollingScheduler] = None
+        if self.config.adaptive_polling:
+            self._poll_scheduler = PollingScheduler(
+                base_delay_ms=self.config.loop_delay_ms,
+                max_delay_ms=self.config.poll_max_delay_ms,
+                backoff_factor=self.config.poll_backoff_factor,
+                burst_count=self.config.poll_burst_count,
+                burst_delay_ms=self.config.poll_burst_delay_ms
+            )
         
         # 统计信息
         self.stats = {
@@ -63,6 +106,12 @@ class GameAutomation:
             "obstacles": 0       # 遇到的障碍物数量
         }
         
+        # 当前卡牌选择界面的卡牌ID (ID标签行的缩略图, ID列表)，同一界面重复处理时直接沿用
+        self._card_ids_cache: Optional[Tuple[object, List[Optional[str]]]] = None
+        
+        # 本次运行中按模板匹配到的按钮位置 {模板名称: (x, y)}，之后只在该位置确认
+        self._tap_targets: Dict[str, Tuple[int, int]] = {}
+        
         # 上一次的状态，用于检测状态变化
         self._last_state = None
         
@@ -70,6 +119,59 @@ class GameAutomation:
         self._on_state_change = None
         self._on_log = None
     
+    def _create_adb(self) -> ADBController:
+        """根据配置创建ADB控制器（subprocess: 调用adb可执行文件；native: 直接与adb server通信）"""
+        adb_class = NativeADBController if self.config.adb_backend == "native" else ADBController
+        return adb_class(
+            host=self.config.adb_host,
+            port=self.config.adb_port,
+            adb_path=self.config.adb_path,
+            persistent_shell=self.config.adb_persistent_shell,
+            capture_format=self.config.capture_format,
+            input_batch_window_ms=self.config.input_batch_window_ms,
+            input_batch_gap_ms=self.config.input_batch_gap_ms
+        )
+    
+    def _build_recognizer(self, templates_dir: str):
+        """导入 OpenCV 并构建图像识别器，记录各步骤耗时"""
+        try:
+            started = time.perf_counter()
+            from .image_recognition import ImageRecognizer
+            imported = time.perf_counter()
+            recognizer = ImageRecognizer(templates_dir, template_budget_mb=self.config.template_cache_mb)
+            recognizer.configure_pyramid(self.config.template_pyramid)
+            recognizer.color_class_map = self.config.color_class_map
+            recognizer.detection_scale = self.config.detection_scale
+            # 配置文件中的按钮坐标作为对应模板的搜索窗口
+            recognizer.declare_search_window("btn_start", self.config.btn_start_pos)
+            recognizer.declare_search_window("btn_retry", self.config.btn_retry_pos)
+            recognizer.declare_search_window("btn_ok", self.config.btn_ok_pos)
+            if self.config.frame_gate_threshold > 0:
+                recognizer.enable_change_gate(self.config.frame_gate_threshold)
+            self._recognizer = recognizer
+            
+            timings = recognizer.load_timings
+            total_ms = (time.perf_counter() - started) * 1000
+            message = (
+                f"✓ 图像识别器就绪 ({total_ms:.0f} ms: 导入OpenCV {(imported - started) * 1000:.0f} ms, "
+                f"加载模板 {timings.get('templates_ms', 0):.0f} ms, 特征点 {timings.get('features_ms', 0):.0f} ms)"
+            )
+            log_debug(message)
+            self._log(message)
+        except Exception as e:
+            self._recognizer_error = e
+            self._log(f"✗ 图像识别器初始化失败: {e}")
+        finally:
+            self._recognizer_ready.set()
+    
+    @property
+    def recognizer(self):
+        """图像识别器（后台构建尚未完成时等待）"""
+        self._recognizer_ready.wait()
+        if self._recognizer is None:
+            raise RuntimeError(f"图像识别器初始化失败: {self._recognizer_error}")
+        return self._recognizer
+    
     def set_callbacks(self, on_state_change=None, on_log=None):
         """设置回调函数"""
         self._on_state_change = on_state_change
@@ -81,6 +183,10 @@ class GameAutomation:
         if self._on_log:
             self._on_log(message)
     
+    def log(self, message: str):
+        """输出日志（控制台与界面），供自动化之外的调用方使用"""
+        self._log(message)
+    
     def _notify_state(self, state: str):
         """通知状态变化"""
         if self._on_state_change:
@@ -100,20 +206,49 @@ class GameAutomation:
         """开始自动化"""
         self._running = True
         self._paused = False
+        self._stop_event.clear()
+        if self._poll_scheduler is not None:
+            self._poll_scheduler.reset()
+        self._tap_targets.clear()
         self._log("▶ 开始自动化")
         self._notify_state("运行中")
         
-        # 启动继续按钮自动点击线程
-        self._start_continue_clicker()
+        # 启动输入仲裁（含继续按钮自动点击）
+        self._start_input_arbiter()
+        
+        # 启动流式截图
+        if self.config.capture_stream:
+            self._start_frame_stream()
         
         self._main_loop()
     
     def stop(self):
         """停止自动化"""
         self._running = False
+        self._stop_event.set()
+        
+        # 停止输入仲裁
+        self._stop_input_arbiter()
+        
+        # 停止流式截图
+        self._stop_frame_stream()
         
-        # 停止继续按钮线程
-        self._stop_continue_clicker()
+        # 输出画面未变化而跳过的识别次数（识别器仍在后台构建或构建失败时跳过，不等待）
+        recognizer = self._recognizer
+        if recognizer is not None and recognizer.change_gate is not None and recognizer.gate_stats["skipped"]:
+            gate_stats = recognizer.gate_stats
+            self._log(f"  识别统计: 完整识别 {gate_stats['detected']} 次，画面未变化跳过 {gate_stats['skipped']} 次")
+        
+        # 输出点击往返统计
+        input_stats = self.adb.get_input_stats()
+        if input_stats["round_trips"]:
+            self._log(
+                f"  点击统计: {input_stats['commands']} 条命令 / {input_stats['round_trips']} 次往返 "
+                f"(合并节省 {input_stats['saved']} 次, 平均 {input_stats['avg_ms']:.0f} ms/次)"
+            )
+        
+        # 释放长驻shell会话
+        self.adb.close_shell()
         
         self._log("⏹ 停止自动化")
         self._notify_state("已停止")
@@ -121,50 +256,223 @@ class GameAutomation:
     def pause(self):
         """暂停自动化"""
         self._paused = True
+        self.input.pause()
         self._log("⏸ 暂停自动化")
         self._notify_state("已暂停")
     
     def resume(self):
         """恢复自动化"""
         self._paused = False
+        self.input.resume()
         self._log("▶ 恢复自动化")
         self._notify_state("运行中")
     
-    def _start_continue_clicker(self):
-        """启动继续按钮自动点击线程"""
-        if self._continue_thread and self._continue_thread.is_alive():
-            return  # 线程已在运行
-        
-        self._continue_running = True
-        self._continue_thread = threading.Thread(target=self._continue_click_loop, daemon=True)
-        self._continue_thread.start()
-        self._log("  ✓ 继续按钮自动点击线程已启动（每0.5秒）")
-    
-    def _stop_continue_clicker(self):
-        """停止继续按钮自动点击线程"""
-        self._continue_running = False
-        if self._continue_thread:
-            self._continue_thread.join(timeout=1)
-            self._continue_thread = None
-    
-    def _continue_click_loop(self):
-        """继续按钮点击循环（后台线程）"""
-        while self._continue_running:
-            try:
-                # 只要自动化在运行，且不在暂停状态，且不在胜利/准备等非持续点击状态
-                if not self._paused and not self._continue_paused:
-                    continue_x, continue_y = self.config.btn_continue_pos
-                    self.adb.tap(continue_x, continue_y)
-                else:
-                    if self._continue_paused:
-                        # log_debug("继续按钮点击已暂停 (当前界面不需要持续点击)")
-                        pass
-            except Exception as e:
-                pass  # 静默失败，不影响主流程
+    def _wait(self, seconds: float) -> bool:
+        """
+        可中断的等待，调用 stop() 时立即返回
+        
+        Returns:
+            是否完整等待（False 表示被停止打断）
+        """
+        return not self._stop_event.wait(seconds)
+    
+    def _change_thumbnail(self, frame: Frame, region=None):
+        """画面（或区域）的抽样灰度缩略图，用于廉价的变化判断"""
+        if region is None:
+            return frame.thumbnail(TRANSITION_THUMB_STEP)
+        rows, cols = region
+        return frame.gray(rows, cols)[::TRANSITION_THUMB_STEP // 2, ::TRANSITION_THUMB_STEP // 2]
+    
+    def wait_for_change(self, reference, timeout: float, region=None, poll_interval: float = 0.05) -> Optional[Frame]:
+        """
+        轮询截图，直到画面（或指定区域）与参考画面不同
+        
+        Args:
+            reference: 参考画面（点击前的截图，Frame 或 BGR 数组）
+            timeout: 最长等待时间（秒）
+            region: (行切片, 列切片)，为None时比较整个画面
+            poll_interval: 两次截图之间的间隔（秒）
             
-            time.sleep(0.5)  # 每0.5秒点击一次
+        Returns:
+            变化后的画面，超时或被停止返回None
+        """
+        import cv2
+        
+        if not isinstance(reference, Frame):
+            reference = Frame.from_bgr(reference)
+        reference_thumb = self._change_thumbnail(reference, region)
+        threshold = self.config.transition_threshold
+        deadline = time.perf_counter() + timeout
+        
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not self._wait(min(poll_interval, remaining)):
+                return None
+            frame = self._grab_frame()
+            if frame is None:
+                continue
+            thumb = self._change_thumbnail(frame, region)
+            if thumb.shape == reference_thumb.shape and cv2.absdiff(thumb, reference_thumb).mean() >= threshold:
+                return frame
+    
+    def wait_for_transition(self, from_state: Optional[GameState], timeout: float, reference=None) -> bool:
+        """
+        点击后等待界面离开 from_state
+        
+        先用缩略图差异廉价地等到画面变化，再识别一次确认状态已改变；
+        同一界面内的动画（状态未变）会更新参考画面并继续等待。
+        
+        Args:
+            from_state: 点击前的状态，为None时只要画面变化即返回
+            timeout: 最长等待时间（秒）
+            reference: 点击前的画面，为None时立即截取一帧作为参考
             
-            time.sleep(0.5)  # 每0.5秒点击一次
+        Returns:
+            是否在超时前发生了切换
+        """
+        deadline = time.perf_counter() + timeout
+        if reference is None:
+            reference = self._grab_frame()
+            if reference is None:
+                self._wait(timeout)
+                return False
+        
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            frame = self.wait_for_change(reference, remaining)
+            if frame is None:
+                return False
+            if from_state is None or self.recognizer.detect_state(frame) != from_state:
+                log_debug(f"界面已切换 (用时 {timeout - (deadline - time.perf_counter()):.2f}s)")
+                return True
+            reference = frame
+    
+    def _wait_after_tap(self, screen, seconds: float):
+        """
+        点击后的等待：启用 transition_wait 时等到界面切换为止（最长为原等待时间的两倍），
+        否则固定等待 seconds 秒
+        """
+        if not self.config.transition_wait:
+            self._wait(seconds)
+            return
+        self.wait_for_transition(self._last_state, seconds * TRANSITION_TIMEOUT_SCALE, reference=screen)
+    
+    def _start_input_arbiter(self):
+        """启动输入仲裁线程"""
+        self.input.resume()
+        self._set_continue_paused(False)
+        self.input.start()
+        self._log("  ✓ 输入仲裁已启动（继续按钮每秒点击）")
+    
+    def _stop_input_arbiter(self):
+        """停止输入仲裁线程，输出丢弃的冗余/冲突点击数"""
+        self.input.stop()
+        stats = self.input.stats
+        if stats["redundant"] or stats["conflict"]:
+            self._log(f"  输入仲裁: 执行 {stats['executed']} 次，丢弃冗余 {stats['redundant']} 次、冲突 {stats['conflict']} 次")
+    
+    def _set_continue_paused(self, paused: bool):
+        """暂停/恢复继续按钮的周期点击（胜利/开始界面时暂停）"""
+        self.input.set_periodic_enabled(CONTINUE_INTENT, not paused)
+    
+    def _tap(self, x: int, y: int) -> bool:
+        """通过输入仲裁点击"""
+        return self.input.tap(x, y)
+    
+    def _locate_button(
+        self,
+        screen,
+        template_name: str,
+        default_pos: Tuple[int, int],
+        threshold: float = 0.8,
+        region: Optional[Tuple[float, float]] = None
+    ) -> Tuple[int, int]:
+        """
+        按钮的点击位置
+        
+        已记录位置时先在该位置做一次小块比较确认，确认失败才重新匹配；
+        匹配也失败时使用配置文件中的坐标
+        
+        Args:
+            threshold: 匹配阈值（与状态识别中该按钮的阈值一致）
+            region: 只在 (行起始比例, 列起始比例) 以右下的区域中匹配，为None时整屏匹配
+        """
+        pinned = self._tap_targets.get(template_name)
+        if pinned is not None:
+            result = self.recognizer.confirm_template(screen, template_name, pinned, threshold=threshold)
+            if result:
+                self._tap_targets[template_name] = (result[0], result[1])
+                return result[0], result[1]
+        
+        if region is None:
+            result = self.recognizer.find_template(screen, template_name, threshold=threshold)
+        else:
+            h, w = screen.shape[:2]
+            top, left = int(h * region[0]), int(w * region[1])
+            if isinstance(screen, Frame):
+                roi = screen.bgr(slice(top, None), slice(left, None))
+            else:
+                roi = screen[top:, left:]
+            result = self.recognizer.find_template(roi, template_name, threshold=threshold)
+            if result:
+                result = (result[0] + left, result[1] + top, result[2])
+        if result:
+            x, y, _ = result
+            if pinned != (x, y):
+                self._log(f"📍 {template_name} 位置: ({x}, {y})")
+            self._tap_targets[template_name] = (x, y)
+            return x, y
+        
+        # 使用配置文件中的坐标
+        return default_pos
+    
+    def _start_frame_stream(self):
+        """启动 screenrecord 流式帧源"""
+        if not ScreenRecordStream.is_available():
+            self._log("  ⚠ 未安装 PyAV (pip install av)，流式截图不可用，使用普通截图")
+            return
+        
+        self._frame_stream = ScreenRecordStream(
+            adb_path=self.adb.adb_path,
+            device_id=self.adb.device_id
+        )
+        self._frame_stream.start()
+        self._log("  ✓ 流式截图已启动")
+    
+    def _stop_frame_stream(self):
+        """停止流式帧源"""
+        if self._frame_stream:
+            self._frame_stream.stop()
+            self._frame_stream = None
+    
+    def _stream_frame(self) -> Optional[Frame]:
+        """
+        流式帧源的最新帧（不阻塞）
+        
+        录屏流正常输出时最新帧就是当前画面（静止界面不会产生新帧，不按帧龄判断）；
+        录屏重启期间缓冲区中的帧已不代表当前画面，返回None由调用方直接截图
+        """
+        stream = self._frame_stream
+        if stream is None or not stream.is_live:
+            return None
+        latest = stream.latest_frame()
+        if latest is None:
+            return None
+        image, timestamp = latest
+        return Frame.from_bgr(image, timestamp)
+    
+    def _grab_frame(self):
+        """
+        获取当前画面：优先读取流式帧源的最新帧，不可用或已过时则直接截图
+        
+        返回惰性 Frame，识别逻辑只转换实际读取的区域
+        """
+        frame = self._stream_frame()
+        if frame is not None:
+            return frame
+        return self.adb.capture_frame(lazy=True)
     
     @property
     def is_running(self) -> bool:
@@ -180,7 +488,7 @@ class GameAutomation:
         """处理购买界面（点击右上角关闭）"""
         self._notify_state("取消购买")
         self._log("💰 发现购买弹窗 - 点击关闭")
-        self._continue_paused = True
+        self._set_continue_paused(True)
         
         # 使用配置文件中的取消购买按钮坐标
         if hasattr(self.config, 'btn_cancel_purchase_pos'):
@@ -188,8 +496,8 @@ class GameAutomation:
         else:
             x, y = (1520, 80) # 默认值
             
-        self.adb.tap(x, y)
-        time.sleep(1)
+        self._tap(x, y)
+        self._wait_after_tap(screen, 1)
         
     def _handle_level_up(self, screen):
         """处理升级界面（点击升级按钮）"""
@@ -202,8 +510,8 @@ class GameAutomation:
         else:
             x, y = (800, 780) # 默认值
             
-        self.adb.tap(x, y)
-        time.sleep(1)
+        self._tap(x, y)
+        self._wait_after_tap(screen, 1)
         
     def _handle_level_up_after(self, screen):
         """处理升级后界面（点击右上角关闭）"""
@@ -212,70 +520,88 @@ class GameAutomation:
         # 逻辑同购买取消，点击右上角
         self._handle_purchase(screen)
         
+    def _next_poll_delay(self, state: GameState, handled: bool, unchanged: Optional[bool] = None) -> float:
+        """下一次截图前的等待时间（秒），unchanged 为None时取识别器最近一次的结果"""
+        if self._poll_scheduler is None:
+            return self.config.loop_delay_ms / 1000.0
+        if unchanged is None:
+            unchanged = self.recognizer.last_unchanged
+        return self._poll_scheduler.next_delay(state, handled, unchanged)
+    
     def _main_loop(self):
         """主循环"""
         while self._running:
             # 暂停检查
             if self._paused:
-                time.sleep(0.1)
+                self._wait(0.1)
                 continue
             
+            delay = self.config.loop_delay_ms / 1000.0
             try:
-                # 截图
+                # 截图（惰性画面帧）
                 log_debug("正在请求截图...")
-                screenshot = self.adb.screenshot()
-                if screenshot is None:
+                screen = self._grab_frame()
+                if screen is None:
                     log_debug("警告: 截图失败")
                     if self.config.debug:
                         self._log("警告: 截图失败，重试中...")
-                    time.sleep(1)
+                    self._wait(1)
                     continue
                 
-                # 转换为OpenCV格式
-                screen = self.recognizer.pil_to_cv2(screenshot)
-                
                 # 检测当前状态
                 state = self.recognizer.detect_state(screen)
                 log_debug(f"检测到状态: {state.name}")
                 
-                # 状态切换检测
-                state_changed = (state != self._last_state)
-                
-                if state_changed:
-                    if state != GameState.UNKNOWN:
-                        self._log(f"[状态切换] {state.name}")
-                    self._last_state = state
-                
-                # 需要重复处理的状态（应对游戏卡顿）
-                repeat_states = [
-                    GameState.PURCHASE_FAILED,    # 购买失败（优先处理）
-                    GameState.LEVEL_PREPARE,      # 开始界面
-                    GameState.CARD_SELECTION,     # 卡牌选择
-                    GameState.OBSTACLE_CHOICE,    # 障碍物选择
-                    GameState.OBSTACLE_SPECIALBOX, # 特殊障碍物宝箱
-                    GameState.VICTORY,            # 胜利界面
-                    GameState.PURCHASE,           # 购买弹窗
-                    GameState.LEVEL_UP,           # 升级界面
-                    GameState.LEVEL_UP_AFTER,     # 升级后确认界面
-                    GameState.ARENA_OK            # 赛季结束奖励界面
-                ]
-                
-                # 状态切换时处理，或特定状态重复处理
-                if state_changed or state in repeat_states:
-                    log_debug(f"准备执行处理逻辑 (state={state.name}, changed={state_changed})")
-                    self._handle_state(state, screen, is_repeat=not state_changed)
-                else:
-                    if state == GameState.UNKNOWN:
-                        log_debug("未知状态，跳过处理")
+                handled = self._process_state(state, screen)
+                delay = self._next_poll_delay(state, handled)
                 
             except Exception as e:
                 import traceback
                 self._log(f"错误: {e}")
                 self._log(traceback.format_exc())
-                time.sleep(1)
+                self._wait(1)
             
             # 循环间隔
-            time.sleep(self.config.loop_delay_ms / 1000.0)
+            self._wait(delay)
+    
+    def _process_state(self, state: GameState, screen) -> bool:
+        """
+        状态切换检测，并按需分发到对应的处理逻辑
+        
+        Returns:
+            是否执行了处理逻辑
+        """
+        # 状态切换检测
+        state_changed = (state != self._last_state)
+        
+        if state_changed:
+            if state != GameState.UNKNOWN:
+                self._log(f"[状态切换] {state.name}")
+            self._last_state = state
+        
+        # 需要重复处理的状态（应对游戏卡顿）
+        repeat_states = [
+            GameState.PURCHASE_FAILED,    # 购买失败（优先处理）
+            GameState.LEVEL_PREPARE,      # 开始界面
+            GameState.CARD_SELECTION,     # 卡牌选择
+            GameState.OBSTACLE_CHOICE,    # 障碍物选择
+            GameState.OBSTACLE_SPECIALBOX, # 特殊障碍物宝箱
+            GameState.VICTORY,            # 胜利界面
+            GameState.PURCHASE,           # 购买弹窗
+            GameState.LEVEL_UP,           # 升级界面
+            GameState.LEVEL_UP_AFTER,     # 升级后确认界面
+            GameState.ARENA_OK            # 赛季结束奖励界面
+        ]
+        
+        # 状态切换时处理，或特定状态重复处理
+        if state_changed or state in repeat_states:
+            log_debug(f"准备执行处理逻辑 (state={state.name}, changed={state_changed})")
+            self._handle_state(state, screen, is_repeat=not state_changed)
+            return state != GameState.UNKNOWN
+        
+        if state == GameState.UNKNOWN:
+            log_debug("未知状态，跳过处理")
+        return False
     
     def _handle_state(self, state: GameState, screen, is_repeat: bool = False):
         """处理游戏状态"""
@@ -329,25 +655,19 @@ class GameAutomation:
         self._notify_state("关卡准备")
         
         # 暂停继续按钮点击，避免在胜利→开始界面切换时循环卡住
-        self._continue_paused = True
+        self._set_continue_paused(True)
         
         # 查找开始按钮
-        result = self.recognizer.find_template(screen, "btn_start")
-        if result:
-            x, y, _ = result
-            self.adb.tap(x, y)
-        else:
-            # 使用配置文件中的坐标
-            x, y = self.config.btn_start_pos
-            self.adb.tap(x, y)
+        x, y = self._locate_button(screen, "btn_start", self.config.btn_start_pos)
+        self._tap(x, y)
         
-        time.sleep(1)  # 等待游戏加载
+        self._wait_after_tap(screen, 1)  # 等待游戏加载
     
     def _handle_card_selection(self, screen, is_repeat: bool = False):
         """处理卡牌选择界面"""
         if not is_repeat:
             self._notify_state("选择卡牌")
-            self._continue_paused = False
+            self._set_continue_paused(False)
         
         # 无论是不是重复，进入此函数说明画面还在卡牌界面，根据需要执行点击
         # 注意：卡牌选择如果要防重点，可以加个短冷却
@@ -355,14 +675,14 @@ class GameAutomation:
         need_double_select = False
         try:
             # 检测是否需要选择2次（左下角蓝色"选择2个！"图标）
-            import cv2
-            import numpy as np
-            h, w = screen.shape[:2]
-            bottom_left_icon = screen[int(h*0.7):int(h*0.85), :int(w*0.15)]
-            icon_hsv = cv2.cvtColor(bottom_left_icon, cv2.COLOR_BGR2HSV)
+            # 使用识别时的同一帧，该区域的 HSV 在状态识别中已转换过时直接复用
+            frame = screen if isinstance(screen, Frame) else Frame.from_bgr(screen)
+            h, w = frame.shape[:2]
             # 检测蓝色（H: 100-130, S: 100-255, V: 100-255）
-            blue_mask = cv2.inRange(icon_hsv, np.array([100, 100, 100]), np.array([130, 255, 255]))
-            blue_pixels = cv2.countNonZero(blue_mask)
+            blue_pixels = frame.count_class(
+                "blue", slice(int(h*0.7), int(h*0.85)), slice(None, int(w*0.15)),
+                integral=self.recognizer.color_class_map
+            )
             
             need_double_select = blue_pixels > 1000  # 如果有蓝色图标，需要选择2次
             
@@ -372,8 +692,14 @@ class GameAutomation:
             self._log(f"  检测'选择2个'标志失败: {e}，默认单选")
             need_double_select = False
         
-        # TODO: 实现卡牌ID识别，暂时随机选择
-        card_ids = [None, None, None]
+        # 识别卡牌ID（ID标签数字识别，读不出的再用整体ID模板），未开启或失败时随机选择
+        card_ids = [None] * len(self.config.card_positions)
+        if self.config.card_weight_selection:
+            try:
+                card_ids = self._card_ids(screen)
+            except Exception as e:
+                self._log(f"  卡牌ID识别失败: {e}，随机选择")
+                card_ids = [None] * len(self.config.card_positions)
         
         # 第一次选择
         best_index = self._select_best_card(card_ids)
@@ -381,27 +707,62 @@ class GameAutomation:
             self._log(f"🃏 选择卡牌 #{best_index + 1}")
         
         x, y = self.config.card_positions[best_index]
-        self.adb.tap(x, y)
         
         if not is_repeat:
             self.stats["cards"] += 1
         
         if need_double_select:
-            # 需要选择第二次
-            time.sleep(0.3)  # 短暂等待第一张卡消失
-            
             # 第二次选择（避免选同一张）
             second_index = self._select_best_card(card_ids, exclude_index=best_index)
             if not is_repeat:
                 self._log(f"🃏 选择卡牌 #{second_index + 1} (第2次)")
             
             x2, y2 = self.config.card_positions[second_index]
-            self.adb.tap(x2, y2)               
+            if self.config.transition_wait:
+                # 等第一张卡所在区域变化（被选走）后立即选第二张
+                self._tap(x, y)
+                card_region = (slice(max(0, y - 100), y + 100), slice(max(0, x - 100), x + 100))
+                self.wait_for_change(screen, 0.6, region=card_region)
+                self._tap(x2, y2)
+            else:
+                # 两次点击合并为一次shell往返，间隔在设备端等待第一张卡消失
+                def double_pick():
+                    with self.adb.batch() as batch:
+                        batch.tap(x, y).sleep(0.3).tap(x2, y2)
+                    return True
+                self.input.run(double_pick, [(x, y), (x2, y2)])
             if not is_repeat:
                 self.stats["cards"] += 1
-            time.sleep(0.5)
         else:
-            time.sleep(0.5)
+            self._tap(x, y)
+        
+        self._wait_after_tap(screen, 0.5)
+    
+    def _card_ids(self, screen) -> List[Optional[str]]:
+        """
+        当前卡牌选择界面的卡牌ID
+        
+        ID标签行与上次识别时基本相同（同一界面的重复帧）时沿用上次的结果；
+        只有识别新界面时才会在 debug 模式下保存无法识别的ID区域
+        """
+        import cv2
+        from .image_recognition import CardDigitReader
+        
+        frame = screen if isinstance(screen, Frame) else Frame.from_bgr(screen)
+        top, bottom = CardDigitReader.ID_ROW
+        thumb = self._change_thumbnail(frame, (slice(top, bottom), slice(None)))
+        if self._card_ids_cache is not None:
+            cached_thumb, cached_ids = self._card_ids_cache
+            if cached_thumb.shape == thumb.shape and \
+                    cv2.absdiff(cached_thumb, thumb).mean() < self.config.transition_threshold:
+                return list(cached_ids)
+        
+        card_ids = self.recognizer.detect_card_ids(
+            frame, self.config.card_positions, self.config.card_weights, save_unknown=self.config.debug
+        )
+        self._card_ids_cache = (thumb.copy(), list(card_ids))
+        self._log(f"  卡牌ID: {', '.join(card_id or '?' for card_id in card_ids)}")
+        return card_ids
     
     def _select_best_card(self, card_ids: List[Optional[str]], exclude_index: Optional[int] = None) -> int:
         """
@@ -447,14 +808,14 @@ class GameAutomation:
         self._notify_state("障碍物")
         
         # 核心修复：进入障碍物界面说明已经脱离了胜利/准备阶段，恢复背景点击
-        self._continue_paused = False
+        self._set_continue_paused(False)
         
         # 除了依靠后台线程，这里主动点一次，增加响应速度
         x, y = self.config.btn_continue_pos
-        self.adb.tap(x, y)
+        self._tap(x, y)
         
         self.stats["obstacles"] += 1
-        time.sleep(0.5)
+        self._wait_after_tap(screen, 0.5)
     
     def _handle_obstacle_choice(self, screen, is_repeat: bool = False):
         """处理障碍物界面（三选一）"""
@@ -463,7 +824,7 @@ class GameAutomation:
         if not is_repeat:
             self._notify_state("选择奖励")
             # 进入游戏，恢复继续按钮点击
-            self._continue_paused = False
+            self._set_continue_paused(False)
             # 打印详细信息
             self._log(f"🔥 障碍物选择 - 第{choice}个")
         
@@ -472,11 +833,11 @@ class GameAutomation:
         
         if len(positions) >= choice:
             x, y = positions[choice - 1]  # 转为0索引
-            self.adb.tap(x, y)
+            self._tap(x, y)
         
         if not is_repeat:
             self.stats["obstacles"] += 1
-        time.sleep(0.8)
+        self._wait_after_tap(screen, 0.8)
     
     def _handle_obstacle_specialbox(self, screen, is_repeat: bool = False):
         """处理特殊障碍物宝箱界面"""
@@ -486,45 +847,39 @@ class GameAutomation:
         
         # 使用配置文件中的坐标
         x, y = self.config.btn_open_chest_pos
-        self.adb.tap(x, y)
+        self._tap(x, y)
         
         if not is_repeat:
             self.stats["obstacles"] += 1
-        time.sleep(1)
+        self._wait_after_tap(screen, 1)
     
     def _handle_victory(self, screen, is_repeat: bool = False):
         """处理胜利界面"""
         if not is_repeat:
             self._notify_state("胜利")
             # 暂停继续按钮点击，避免在胜利→开始界面切换时循环卡住
-            self._continue_paused = True
+            self._set_continue_paused(True)
             # 更新统计
             self.stats["runs"] += 1
             self._log(f"🏆 胜利! 完成第 {self.stats['runs']} 轮")
         
         # 查找重试按钮并点击（每次检测到都会尝试点击，直到界面消失）
-        result = self.recognizer.find_template(screen, "btn_retry")
-        if result:
-            x, y, _ = result
-            self.adb.tap(x, y)
-        else:
-            # 使用配置文件中的坐标
-            x, y = self.config.btn_retry_pos
-            self.adb.tap(x, y)
+        x, y = self._locate_button(screen, "btn_retry", self.config.btn_retry_pos)
+        self._tap(x, y)
         
-        time.sleep(1)
+        self._wait_after_tap(screen, 1)
     
     def _handle_defeat(self, screen):
         """处理失败界面"""
         self._log("💀 失败 - 点击继续")
         self._notify_state("失败")
-        self._continue_paused = True
+        self._set_continue_paused(True)
         
         # 使用重试按钮坐标（失败界面也是这个位置）
         x, y = self.config.btn_retry_pos
-        self.adb.tap(x, y)
+        self._tap(x, y)
         
-        time.sleep(1)
+        self._wait_after_tap(screen, 1)
     
     def _handle_purchase_failed(self, screen):
         """处理购买失败界面"""
@@ -533,21 +888,25 @@ class GameAutomation:
         
         # 点击确认按钮关闭弹窗
         x, y = self.config.btn_purchase_confirm_pos
-        self.adb.tap(x, y)
+        self._tap(x, y)
         
-        time.sleep(2)  # 增加等待时间，确保弹窗完全关闭（容错处理）
+        self._wait_after_tap(screen, 2)  # 增加等待时间，确保弹窗完全关闭（容错处理）
 
     def _handle_arena_ok(self, screen):
         """处理赛季结束奖励界面（点击 OK 按钮）"""
+        from .image_recognition import BTN_OK_REGION, BTN_OK_THRESHOLD
+        
         self._notify_state("赛季奖励")
-        self._continue_paused = True
+        self._set_continue_paused(True)
         
-        # 使用配置文件中的 OK 按钮坐标
-        x, y = self.config.btn_ok_pos
+        # 与状态识别相同：只在右下角以 0.85 阈值查找 OK 按钮，未找到时使用配置文件中的坐标
+        x, y = self._locate_button(
+            screen, "btn_ok", self.config.btn_ok_pos, threshold=BTN_OK_THRESHOLD, region=BTN_OK_REGION
+        )
         self._log(f"🏆 发现赛季结束奖励界面 - 点击 OK 坐标({x}, {y})")
-        result = self.adb.tap(x, y)
+        result = self._tap(x, y)
         self._log(f"  tap 结果: {result}")
-        time.sleep(1)
+        self._wait_after_tap(screen, 1)
 
 
 # 测试代码
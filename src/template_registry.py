@@ -0,0 +1,170 @@
+"""
+模板注册表模块
+启动时只登记模板文件的元数据（路径、尺寸、指纹），像素数据在第一次使用时才解码，
+并在内存预算内按最近最少使用（LRU）顺序淘汰
+"""
+from __future__ import annotations
+
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from .lazy_import import lazy_module
+from .startup_cache import file_fingerprint
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+
+
+class TemplateInfo:
+    """模板元数据"""
+
+    def __init__(self, name: str, path: Path, width: int, height: int):
+        self.name = name
+        self.path = path
+        self.width = width
+        self.height = height
+
+    @property
+    def fingerprint(self) -> Optional[list]:
+        """文件指纹 [修改时间, 大小]"""
+        return file_fingerprint(self.path)
+
+
+def read_png_size(path: Path) -> Tuple[int, int]:
+    """从 PNG 文件头读取宽高（不解码像素），失败返回 (0, 0)"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(24)
+        if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", header[16:24])
+            return width, height
+    except OSError:
+        pass
+    return 0, 0
+
+
+class TemplateRegistry:
+    """
+    惰性模板注册表
+
+    - registry[name] / get(name) 返回 BGR 模板（第一次访问时解码）
+    - get(name, gray=True) 返回灰度模板（只给允许灰度输入的算法使用，如 SIFT）
+    - get(name, level=n) 返回金字塔第 n 层（cv2.pyrDown n 次，边长约为 1/2^n），供由粗到精匹配使用
+    - 已解码的数据总量超过 budget_bytes 时淘汰最久未使用的模板，下次访问重新解码
+    """
+
+    def __init__(self, templates_dir: Path, budget_mb: float = 32):
+        """
+        扫描模板目录并登记元数据
+
+        Args:
+            templates_dir: 模板目录（递归扫描 *.png）
+            budget_mb: 已解码模板的内存预算（MB）
+        """
+        self.templates_dir = Path(templates_dir)
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._info: Dict[str, TemplateInfo] = {}
+        self._cache: "OrderedDict[Tuple[str, bool, int], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.stats = {"loads": 0, "hits": 0, "evictions": 0}
+
+        if self.templates_dir.exists():
+            for template_file in sorted(self.templates_dir.rglob("*.png")):
+                width, height = read_png_size(template_file)
+                self._info[template_file.stem] = TemplateInfo(template_file.stem, template_file, width, height)
+
+    # ===== 元数据 =====
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._info
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._info)
+
+    def __len__(self) -> int:
+        return len(self._info)
+
+    def info(self, name: str) -> Optional[TemplateInfo]:
+        """模板元数据，不存在返回None"""
+        return self._info.get(name)
+
+    # ===== 像素数据 =====
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        template = self.get(name)
+        if template is None:
+            raise KeyError(name)
+        return template
+
+    def get(self, name: str, gray: bool = False, level: int = 0) -> Optional[np.ndarray]:
+        """
+        获取模板像素
+
+        Args:
+            name: 模板名称（文件名，不含扩展名）
+            gray: 是否返回灰度图
+            level: 金字塔层数（0 为原图）
+
+        Returns:
+            模板图像，不存在或无法解码返回None
+        """
+        info = self._info.get(name)
+        if info is None:
+            return None
+
+        key = (name, gray, level)
+        with self._lock:
+            template = self._cache.get(key)
+            if template is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return template
+
+        if level > 0:
+            # 由上一层缩小得到（上一层同样进入缓存）
+            template = self.get(name, gray, level - 1)
+            if template is None:
+                return None
+            template = cv2.pyrDown(template)
+        else:
+            template = self._decode(info, gray)
+            if template is None:
+                return None
+
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = template
+                self.resident_bytes += template.nbytes
+                self.stats["loads"] += 1
+                self._evict(keep=key)
+        return template
+
+    def _decode(self, info: TemplateInfo, gray: bool) -> Optional[np.ndarray]:
+        """解码模板文件；灰度图由 BGR 转换得到，与 OpenCV 算法内部的转换一致"""
+        image = cv2.imread(str(info.path), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        print(f"已加载模板: {info.name} (路径: {info.path.relative_to(self.templates_dir)})")
+        if gray:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return image
+
+    def _evict(self, keep: Tuple[str, bool, int]):
+        """超出预算时按 LRU 顺序淘汰（刚加载的模板保留）"""
+        while self.resident_bytes > self.budget_bytes and len(self._cache) > 1:
+            key, template = next(iter(self._cache.items()))
+            if key == keep:
+                break
+            del self._cache[key]
+            self.resident_bytes -= template.nbytes
+            self.stats["evictions"] += 1
+
+    def unload(self, name: Optional[str] = None):
+        """释放指定模板（None 表示全部）的像素数据"""
+        with self._lock:
+            for key in [k for k in self._cache if name is None or k[0] == name]:
+                self.resident_bytes -= self._cache.pop(key).nbytes
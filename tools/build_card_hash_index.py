@@ -0,0 +1,80 @@
+"""
+从带标注的卡牌选择界面截图生成卡牌图案哈希索引（templates/card_art_index.json）
+使用方法：python tools/build_card_hash_index.py 截图.png 卡牌1ID 卡牌2ID 卡牌3ID
+          python tools/build_card_hash_index.py 截图目录/ [--phash]
+目录模式下文件名即标注，如 65_109_37.png；不需要的卡牌用 - 代替，如 65_-_37.png
+截图会被缩放到 1600x900；已有索引时追加（同一张卡可以有多个哈希）
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import time
+import random
+
+import cv2
+
+from src.config_loader import Config
+from src.card_hash import CardHashIndex, card_art_region, hamming
+from src.image_recognition import CardDigitReader
+
+INDEX_PATH = os.path.join("templates", "card_art_index.json")
+
+
+def labelled_screenshots(args):
+    """(截图路径, [卡牌ID, ...]) 列表"""
+    if os.path.isdir(args[0]):
+        for name in sorted(os.listdir(args[0])):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() == ".png":
+                yield os.path.join(args[0], name), stem.split("_")
+    else:
+        yield args[0], args[1:]
+
+
+def build_index():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print(__doc__)
+        return
+
+    config = Config("config")
+    index = CardHashIndex(INDEX_PATH, kind="phash" if "--phash" in sys.argv else "dhash")
+
+    for path, card_ids in labelled_screenshots(args):
+        img = cv2.imread(path)
+        if img is None:
+            print(f"无法读取截图: {path}")
+            continue
+        if img.shape[:2] != (900, 1600):
+            img = cv2.resize(img, (1600, 900), interpolation=cv2.INTER_AREA)
+
+        for card_id, position in zip(card_ids, config.card_positions):
+            if card_id == "-":
+                continue
+            center_x = CardDigitReader.tab_center(img, position)
+            value = index.add(card_id, card_art_region(img, center_x))
+            print(f"{os.path.basename(path)}: {card_id} -> {value:016x} (中心 x={center_x})")
+
+    index.save()
+    stats = index.stats()
+    print(f"索引已保存: {INDEX_PATH} ({stats['entries']} 个哈希, {stats['cards']} 张卡, {index.kind})")
+
+    # 不同卡牌之间的最小距离（过小说明图案区域或哈希不足以区分）
+    entries = index.entries
+    closest = min(
+        (hamming(a, b), ia, ib) for i, (ia, a) in enumerate(entries) for ib, b in entries[i + 1:] if ia != ib
+    ) if len({card_id for card_id, _ in entries}) > 1 else None
+    if closest:
+        print(f"不同卡牌的最小汉明距离: {closest[0]} ({closest[1]} / {closest[2]})")
+
+    # 查找耗时（随机查询）
+    queries = 1000
+    started = time.perf_counter()
+    for _ in range(queries):
+        index.lookup_hash(random.getrandbits(index.hash_size * index.hash_size))
+    print(f"平均查找耗时: {(time.perf_counter() - started) / queries * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    build_index()
@@ -1,44 +1,52 @@
-import cv2
-import numpy as np
+"""
+从卡牌选择界面截图中提取ID数字样本，保存到 templates/digits（供 CardDigitReader 使用）
+使用方法：python tools/extract_digits.py 截图.png 卡牌1ID 卡牌2ID 卡牌3ID
+例如：    python tools/extract_digits.py debug_screenshot.png 65 109 37
+截图会被缩放到 1600x900；某张卡的ID不需要时用 - 代替
+"""
+import sys
 import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import cv2
+
+from src.config_loader import Config
+from src.image_recognition import CardDigitReader
+
 
 def extract_and_save():
-    img = cv2.imread("debug_screenshot.png")
-    if img is None: return
-    
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    _, binary = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)
-    
-    # 区域范围 (y: 100-120 左右是ID数字的顶端)
-    # y=550是中心, y-440=110
-    roi_y_start, roi_y_end = 100, 140
-    rois = [
-        (525, 645), # Card 1
-        (840, 960), # Card 2
-        (1140, 1260) # Card 3
-    ]
-    
-    os.makedirs("templates/digits", exist_ok=True)
-    
-    for i, (x1, x2) in enumerate(rois):
-        roi = binary[roi_y_start:roi_y_end, x1:x2]
-        cv2.imwrite(f"debug_roi_{i}.png", roi)
-        
-        # 寻找轮廓
-        contours, _ = cv2.findContours(roi, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        # 按x排序
-        digit_boxes = []
-        for cnt in contours:
-            x, y, w, h = cv2.boundingRect(cnt)
-            if h > 10 and w > 2: # 过滤杂色
-                digit_boxes.append((x, y, w, h))
-        
-        digit_boxes.sort()
-        
-        for j, (x, y, w, h) in enumerate(digit_boxes):
-            digit_img = roi[y:y+h, x:x+w]
-            cv2.imwrite(f"templates/digits/temp_{i}_{j}.png", digit_img)
-            print(f"Saved: templates/digits/temp_{i}_{j}.png (Size: {w}x{h})")
+    if len(sys.argv) < 3:
+        print(__doc__)
+        return
+
+    img = cv2.imread(sys.argv[1])
+    if img is None:
+        print(f"无法读取截图: {sys.argv[1]}")
+        return
+    if img.shape[:2] != (900, 1600):
+        img = cv2.resize(img, (1600, 900), interpolation=cv2.INTER_AREA)
+
+    config = Config("config")
+    digits_dir = os.path.join("templates", "digits")
+    os.makedirs(digits_dir, exist_ok=True)
+    source = os.path.splitext(os.path.basename(sys.argv[1]))[0]
+
+    for i, (card_id, position) in enumerate(zip(sys.argv[2:], config.card_positions)):
+        if card_id == "-":
+            continue
+        region = CardDigitReader.id_region(img, position)
+        glyphs = CardDigitReader.segment(region)
+        if len(glyphs) != len(card_id):
+            # 切分结果与ID位数不一致，保存区域方便检查阈值/位置
+            cv2.imwrite(f"debug_roi_{i}.png", region)
+            print(f"卡牌 #{i + 1}: 切分出 {len(glyphs)} 个字符，与ID {card_id} 不一致，已保存 debug_roi_{i}.png")
+            continue
+
+        for j, (digit, glyph) in enumerate(zip(card_id, glyphs)):
+            path = os.path.join(digits_dir, f"{digit}_{source}_{i}{j}.png")
+            cv2.imwrite(path, glyph)
+            print(f"Saved: {path} (Size: {glyph.shape[1]}x{glyph.shape[0]})")
+
 
 if __name__ == "__main__":
     extract_and_save()
@@ -0,0 +1,54 @@
+"""
+离线吞吐测试：用模拟设备代替雷电模拟器运行 GameAutomation
+统计每小时轮次、各界面的响应时间和点击命中情况
+使用方法：python tools/simulate_throughput.py [运行秒数] [--async | --pipeline]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import threading
+import time
+
+from src.config_loader import Config
+from src.simulator import SimulatedDevice
+from src.state_machine import GameAutomation
+from src.async_automation import AsyncGameAutomation
+from src.pipeline import PipelinedGameAutomation
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 and not sys.argv[1].startswith("--") else 60.0
+    use_async = "--async" in sys.argv
+    use_pipeline = "--pipeline" in sys.argv
+
+    config = Config("config")
+    device = SimulatedDevice(config, templates_dir="templates", battle_seconds=2.0)
+    if use_async:
+        automation_class, mode = AsyncGameAutomation, "异步"
+    elif use_pipeline:
+        automation_class, mode = PipelinedGameAutomation, "流水线"
+    else:
+        automation_class, mode = GameAutomation, "同步"
+    automation = automation_class(config_dir="config", templates_dir="templates", adb=device, config=config)
+    automation.connect()
+
+    print(f"开始模拟 {duration:.0f} 秒 ({mode}主循环)...")
+    worker = threading.Thread(target=automation.start, daemon=True)
+    worker.start()
+    time.sleep(duration)
+    automation.stop()
+    worker.join(timeout=5)
+
+    report = device.report()
+    print("\n=== 模拟结果 ===")
+    print(f"运行时间: {report['elapsed_s']:.1f} 秒")
+    print(f"完成轮次: {report['runs']}  (每小时 {report['runs_per_hour']:.1f} 轮)")
+    print(f"点击次数: {report['taps']}  未命中: {report['missed_taps']}  后台继续点击: {report['continue_taps']}")
+    print("各界面平均响应时间:")
+    for screen, ms in sorted(report["reaction_ms"].items()):
+        print(f"  {screen:24s} {ms:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+测试脚本：离线验证流式截图解码
+将 templates/ui 下的参考截图编码为 H.264 文件，代替 screenrecord 输出喂给
+ScreenRecordStream，检查解码帧数、最新帧尺寸和识别结果
+使用方法：python tools/test_frame_stream.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import time
+from pathlib import Path
+
+import cv2
+
+from src.frame_stream import ScreenRecordStream, av
+from src.image_recognition import ImageRecognizer
+
+SCREENS = ["level_prepare", "card_selection", "obstacle_choice", "victory"]
+STREAM_FILE = "debug_stream.h264"
+
+
+def build_stream_file(path: str, repeat: int = 5):
+    """把参考截图编码为裸 H.264 流"""
+    frames = [cv2.resize(cv2.imread(f"templates/ui/{name}.png"), (1600, 900)) for name in SCREENS]
+    with av.open(path, mode="w", format="h264") as container:
+        video = container.add_stream("libx264", rate=30)
+        video.width, video.height = 1600, 900
+        video.pix_fmt = "yuv420p"
+        for img in frames:
+            for _ in range(repeat):
+                frame = av.VideoFrame.from_ndarray(img, format="bgr24")
+                for packet in video.encode(frame):
+                    container.mux(packet)
+        for packet in video.encode():
+            container.mux(packet)
+    return len(frames) * repeat
+
+
+def main():
+    if not ScreenRecordStream.is_available():
+        print("跳过: 流式截图需要安装 PyAV (pip install av)")
+        return
+    expected = build_stream_file(STREAM_FILE)
+    print(f"已生成测试流: {STREAM_FILE} ({expected} 帧, {Path(STREAM_FILE).stat().st_size // 1024} KB)")
+
+    stream = ScreenRecordStream(source_file=STREAM_FILE)
+    start = time.perf_counter()
+    stream.start()
+    while stream.is_running:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    print(f"解码帧数: {stream.frames_decoded}/{expected}  耗时 {elapsed * 1000:.0f} ms")
+    if stream.error:
+        print(f"解码错误: {stream.error}")
+
+    latest = stream.latest_frame()
+    if latest is None:
+        print("✗ 未获取到任何帧")
+        return
+    frame, timestamp = latest
+    recognizer = ImageRecognizer()
+    print(f"最新帧: {frame.shape}  距今 {(time.time() - timestamp) * 1000:.0f} ms")
+    print(f"最新帧识别结果: {recognizer.detect_state(frame).name} (期望: {SCREENS[-1].upper()})")
+
+
+if __name__ == "__main__":
+    main()